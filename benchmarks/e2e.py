@@ -0,0 +1,252 @@
+"""
+End-to-end benchmark against a local GitHub/LLM stand-in.
+
+For every corpus size a synthetic fixture (or a recorded one, `--fixture`) is
+served by `StandInGitHub`, and a fresh worker process with empty caches runs
+three scenarios through the real pipeline:
+
+    single-cold   recommend one issue on empty caches (full PR sync and indexing)
+    single-warm   recommend another issue right after (incremental sync)
+    batch         list the open issues and triage `--batch-issues` of them
+
+Each scenario reports wall time, time per stage (the spans of
+`source/metrics.py`: inclusive, so nested stages are counted in their parent
+too, and summed over threads, so they can add up to more than the wall time),
+cache lookups, requests and bytes per endpoint as seen by the stand-in, and
+the worker's peak RSS (process-wide, so it only grows from one scenario to
+the next). With `--deadline`, the single-issue scenarios run in the anytime
+mode of `recommend_issue`, and the stages that fell back are listed.
+The client-side search pacing is switched off in the worker, as the
+stand-in enforces no rate limits.
+
+    python benchmarks/e2e.py [--sizes 500,5000,20000,100000] [--latency-ms 0]
+                             [--out results.json] [--baseline old.json]
+
+With `--baseline`, the run fails if wall time, request count, bytes or peak
+RSS of any scenario regressed by more than `--tolerance`.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+
+DEFAULT_SIZES = "500,5000,20000,100000"
+SCENARIOS = ["single-cold", "single-warm", "batch"]
+# relative regressions below these absolute amounts are noise
+MIN_SLACK = {"wall_s": 0.05, "requests": 0, "bytes": 4096, "peak_rss_mb": 8}
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _server_call(api_url, path, method="GET"):
+    request = urllib.request.Request(api_url + path, data=b"" if method == "POST" else None, method=method)
+    with urllib.request.urlopen(request) as response:
+        return json.loads(response.read())
+
+
+def run_worker(args):
+    """Run the scenarios in this (fresh) process and write their measurements to `args.worker`."""
+    sys.path.insert(0, ROOT)
+    sys.path.insert(0, BENCH_DIR)
+    from stand_in import StubModel
+
+    import source.keyword_extraction as keyword_extraction
+    from source import metrics
+    from source.batch import triage_issues
+    from source.extraction_engine import DEFAULT_MODEL, ExtractionEngine, RequestLimiter
+    from source.github import list_github_issues
+    from source.rate_limit import DEFAULT_LIMITS
+    from source.recommend import recommend_issue
+
+    # the stand-in has no rate limits; waiting out GitHub's search window would only measure sleeps
+    for limits in DEFAULT_LIMITS.values():
+        limits["per_minute"] = None
+    model = StubModel(latency=args.llm_latency_ms / 1000)
+    keyword_extraction._models[DEFAULT_MODEL] = model
+    metrics.enable()
+
+    owner, repo = args.repo.split("/", 1)
+    token = os.getenv("GITHUB_TOKEN")
+    api_url = os.environ["GITHUB_API_URL"]
+    first, second = args.issue_numbers
+
+    def single(number):
+        result = recommend_issue(owner, repo, token, number, pr_count=args.pr_count, deadline=args.deadline)
+        degraded.extend(result["degraded"])
+
+    def batch():
+        issues = list_github_issues(owner, repo, token)[:args.batch_issues]
+        engine = ExtractionEngine(client=model, limiter=RequestLimiter(rpm=10 ** 6, tpm=10 ** 9))
+        triage_issues(owner, repo, token, issues, "batch_results.jsonl", pr_count=args.pr_count, engine=engine)
+
+    runs = {"single-cold": lambda: single(first), "single-warm": lambda: single(second), "batch": batch}
+    results = []
+    degraded = []
+    for scenario in args.scenarios:
+        degraded.clear()
+        _server_call(api_url, "/_reset", method="POST")
+        metrics.reset()
+        caches_before = metrics.snapshot()["caches"]
+        llm_calls = model.calls
+        start = time.perf_counter()
+        runs[scenario]()
+        wall = time.perf_counter() - start
+        data = metrics.snapshot()
+        results.append({
+            "scenario": scenario,
+            "wall_s": wall,
+            "stages": {name: {"seconds": span["seconds"], "calls": span["calls"]} for name, span in data["spans"].items()},
+            "caches": {name: {k: v - caches_before.get(name, {}).get(k, 0) for k, v in stats.items() if k != "hit_rate"}
+                       for name, stats in data["caches"].items()},
+            "endpoints": _server_call(api_url, "/_stats"),
+            "llm_calls": model.calls - llm_calls,
+            "degraded": list(degraded),
+            "peak_rss_mb": peak_rss_mb(),
+        })
+
+    with open(args.worker, "w", encoding="utf-8") as f:
+        json.dump(results, f)
+
+
+def run_size(fixture, size, args):
+    """Serve `fixture` and run the scenarios in a fresh worker process; returns their results."""
+    from stand_in import StandInGitHub
+
+    server = StandInGitHub(fixture, latency=args.latency_ms / 1000, max_per_page=args.max_per_page).start()
+    open_issues = [i["number"] for i in fixture["issues"] if i["state"] == "open"]
+    try:
+        with tempfile.TemporaryDirectory(prefix="git-recommend-bench-") as workdir:
+            results_path = os.path.join(workdir, "results.json")
+            env = {
+                **os.environ,
+                "PYTHONPATH": os.pathsep.join([ROOT, BENCH_DIR]),
+                "GITHUB_API_URL": server.url,
+                "GITHUB_TOKEN": "benchmark",
+                "GITHUB_TOKENS": "",
+                "GIT_RECOMMEND_BACKEND": args.backend,
+                "GIT_RECOMMEND_RANKER": args.ranker,
+            }
+            # every cache, store and index lives under the working directory by default
+            command = [sys.executable, os.path.abspath(__file__), "--worker", results_path,
+                       "--repo", fixture["repo"], "--pr-count", str(size),
+                       "--issue-numbers", str(open_issues[0]), str(open_issues[1]),
+                       "--batch-issues", str(args.batch_issues), "--llm-latency-ms", str(args.llm_latency_ms),
+                       "--scenarios", *args.scenarios]
+            if args.deadline is not None:
+                command += ["--deadline", str(args.deadline)]
+            subprocess.run(command, cwd=workdir, env=env, check=True,
+                           stdout=None if args.verbose else subprocess.DEVNULL)
+            with open(results_path, encoding="utf-8") as f:
+                results = json.load(f)
+    finally:
+        server.stop()
+
+    for result in results:
+        endpoints = result["endpoints"]
+        result["size"] = size
+        result["requests"] = sum(e["requests"] for e in endpoints.values())
+        result["bytes"] = sum(e["bytes_in"] + e["bytes_out"] for e in endpoints.values())
+    return results
+
+
+def print_header():
+    print(f"{'PRs':>7} {'scenario':12} {'wall s':>8} {'requests':>9} {'MB':>8} {'RSS MB':>7}  stages (s)")
+
+
+def print_results(results):
+    for r in results:
+        stages = sorted(r["stages"].items(), key=lambda kv: -kv[1]["seconds"])
+        stage_text = ", ".join(f"{name} {s['seconds']:.2f}" for name, s in stages if s["seconds"] >= 0.005)
+        print(f"{r['size']:>7} {r['scenario']:12} {r['wall_s']:8.2f} {r['requests']:9} "
+              f"{r['bytes'] / 2 ** 20:8.2f} {r['peak_rss_mb']:7.0f}  {stage_text}")
+        if r.get("degraded"):
+            print(f"{'':29}degraded: {', '.join(r['degraded'])}")
+
+
+def compare(results, baseline, tolerance):
+    """Regressions of `results` against `baseline`, as readable lines."""
+    previous = {(r["size"], r["scenario"]): r for r in baseline}
+    regressions = []
+    for r in results:
+        old = previous.get((r["size"], r["scenario"]))
+        if old is None:
+            continue
+        for metric, slack in MIN_SLACK.items():
+            limit = max(old[metric] * (1 + tolerance), old[metric] + slack)
+            if r[metric] > limit:
+                regressions.append(f"{r['size']} PRs {r['scenario']}: {metric} {old[metric]:.2f} -> {r[metric]:.2f}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="comma-separated closed-PR corpus sizes")
+    parser.add_argument("--issues", type=int, default=200, help="issues in each synthetic fixture")
+    parser.add_argument("--batch-issues", type=int, default=50)
+    parser.add_argument("--scenarios", nargs="+", default=SCENARIOS, choices=SCENARIOS)
+    parser.add_argument("--fixture", help="replay this recorded fixture instead of synthetic ones (ignores --sizes)")
+    parser.add_argument("--save-fixtures", metavar="DIR", help="also write each synthetic fixture to DIR")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="added to every GitHub response")
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0, help="added to every LLM answer")
+    parser.add_argument("--max-per-page", type=int, default=100, help="largest page the stand-in serves")
+    parser.add_argument("--backend", default="auto", choices=["auto", "graphql", "rest"],
+                        help="GIT_RECOMMEND_BACKEND for the worker")
+    parser.add_argument("--ranker", default="bm25", choices=["bm25", "profiles"],
+                        help="GIT_RECOMMEND_RANKER for the worker")
+    parser.add_argument("--deadline", type=float, help="run the single-issue scenarios with this --deadline (seconds)")
+    parser.add_argument("--out", help="write the results as JSON")
+    parser.add_argument("--baseline", help="results JSON of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative regression")
+    parser.add_argument("--verbose", action="store_true", help="show the pipeline's own output")
+    # internal: run the scenarios in this process
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("--repo", help=argparse.SUPPRESS)
+    parser.add_argument("--pr-count", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--issue-numbers", type=int, nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        return run_worker(args)
+
+    sys.path.insert(0, BENCH_DIR)
+    from stand_in import load_fixture, save_fixture, synthetic_fixture
+
+    print_header()
+    results = []
+    if args.fixture:
+        fixture = load_fixture(args.fixture)
+        results += run_size(fixture, len(fixture["pulls"]), args)
+        print_results(results)
+    else:
+        for size in (int(s) for s in args.sizes.split(",")):
+            fixture = synthetic_fixture(size, issue_count=args.issues)
+            if args.save_fixtures:
+                os.makedirs(args.save_fixtures, exist_ok=True)
+                save_fixture(fixture, os.path.join(args.save_fixtures, f"synthetic_{size}.json"))
+            results += run_size(fixture, size, args)
+            print_results(results[-len(args.scenarios):])
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
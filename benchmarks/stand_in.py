@@ -0,0 +1,413 @@
+"""
+Local stand-in for the GitHub API and the Gemini client, used by the benchmarks.
+
+`StandInGitHub` replays a fixture (see `synthetic_fixture`) over HTTP: the REST
+endpoints the recommender uses (`/issues`, `/issues/{n}`, `/pulls`,
+`/commits`, `/commits/{sha}`, `/search/code`) and the two GraphQL queries. It adds a fixed
+latency to every response, caps `per_page`, answers conditional requests
+with 304 and counts requests and bytes per endpoint. `StubModel` stands in
+for `genai.GenerativeModel`.
+
+A fixture is a JSON object:
+
+    {"repo": "owner/name",
+     "issues":  [REST issue objects],
+     "pulls":   [REST pull request objects, closed],
+     "commits": {path: [REST commit objects]},
+     "files":   {path: file contents, searched by /search/code}}
+"""
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlparse
+
+PACKAGES = ["core", "parser", "network", "storage", "cli", "auth", "cache", "render", "plugins", "config"]
+MODULES = ["client", "server", "session", "tokenizer", "scheduler", "loader", "registry", "handler",
+           "encoder", "decoder", "validator", "resolver", "builder", "manager", "adapter", "monitor"]
+SUFFIXES = ["Error", "Manager", "Handler", "Factory", "Config", "Context"]
+VERBS = ["Fix", "Handle", "Refactor", "Speed up", "Add support for", "Guard against", "Clean up"]
+PROBLEMS = ["a crash", "a memory leak", "a race condition", "wrong results", "a timeout", "a deadlock"]
+FILLER = ("the when with after before this that on in for from and is not if then which during "
+          "while every each only also still again because").split()
+
+START = datetime(2020, 1, 1, tzinfo=timezone.utc)
+
+
+def _iso(moment):
+    return moment.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _camel(word):
+    return word[:1].upper() + word[1:]
+
+
+def synthetic_fixture(pr_count, issue_count=200, seed=0, repo="bench/synthetic"):
+    """
+    Deterministic fixture with `pr_count` closed PRs and `issue_count` issues
+    (two thirds open) over a synthetic code base of packages, modules and
+    classes. Authors follow a long-tailed distribution (their number grows
+    with the square root of the corpus) and a few PRs come from bots.
+    """
+    rng = random.Random(seed)
+    files = {}
+    symbols = []
+    for package in PACKAGES:
+        for module in MODULES:
+            classes = [f"{_camel(module)}{rng.choice(SUFFIXES)}", f"{_camel(package)}{_camel(module)}"]
+            functions = [f"{verb}_{module}" for verb in ("load", "parse", "close", "flush")]
+            path = f"src/{package}/{module}.py"
+            files[path] = "\n".join([f"class {name}:\n    pass\n" for name in classes] +
+                                    [f"def {name}(value):\n    return value\n" for name in functions])
+            symbols.append((path, classes + functions))
+
+    author_count = max(10, int(pr_count ** 0.5) * 2)
+    authors = [f"dev{i:04d}" for i in range(author_count)]
+    weights = [1.0 / (i + 1) for i in range(author_count)]
+    bots = ["dependabot[bot]", "renovate[bot]"]
+
+    def sentence(path, names, words=12):
+        picked = rng.sample(names, 2)
+        text = [rng.choice(FILLER) for _ in range(words)]
+        text[rng.randrange(words)] = picked[0]
+        text[rng.randrange(words)] = path.rsplit("/", 1)[1]
+        return " ".join(text), picked
+
+    span = timedelta(days=5 * 365)
+    pulls = []
+    for i in range(pr_count):
+        path, names = rng.choice(symbols)
+        updated = START + span * (i + 1) / (pr_count + 1)
+        if rng.random() < 0.02:
+            login, user_type = rng.choice(bots), "Bot"
+            title, body = f"Bump dependency {rng.randrange(100)}", None
+        else:
+            login, user_type = rng.choices(authors, weights)[0], "User"
+            text, picked = sentence(path, names)
+            title = f"{rng.choice(VERBS)} {picked[1]} in {path.rsplit('/', 1)[1]}"
+            body = f"{text}. {rng.choice(PROBLEMS)} in {picked[0]}." if rng.random() < 0.8 else None
+        pulls.append({
+            "number": 2 * i + 1,
+            "state": "closed",
+            "title": title,
+            "body": body,
+            "user": {"login": login, "type": user_type},
+            "created_at": _iso(updated - timedelta(days=2)),
+            "updated_at": _iso(updated),
+            "head": {"ref": f"topic-{i}", "repo": {"full_name": repo}},
+            "base": {"ref": "main", "repo": {"full_name": repo}},
+        })
+
+    commits = {}
+    for path, _ in symbols:
+        owners = rng.sample(authors[:max(3, author_count // 4)], 3)
+        history = []
+        for j in range(rng.randrange(20, 120)):
+            login = rng.choice(owners) if rng.random() < 0.7 else rng.choice(authors)
+            moment = START + span * rng.random()
+            history.append({
+                "sha": hashlib.sha1(f"{path}:{j}".encode()).hexdigest(),
+                "author": {"login": login} if rng.random() < 0.9 else None,
+                "commit": {"author": {"name": login.replace("dev", "Developer "), "date": _iso(moment)},
+                           "message": f"Update {path}"},
+            })
+        history.sort(key=lambda c: c["commit"]["author"]["date"], reverse=True)
+        commits[path] = history
+
+    issues = []
+    for i in range(issue_count):
+        path, names = rng.choice(symbols)
+        text, picked = sentence(path, names, words=30)
+        created = START + span + timedelta(hours=i)
+        issues.append({
+            "number": 2 * i + 2,
+            "state": "closed" if i % 3 == 0 else "open",
+            "title": f"{_camel(rng.choice(PROBLEMS)[2:])} in {picked[0]} ({path.rsplit('/', 1)[1]})",
+            "body": f"{text}. Seen with {picked[1]}.",
+            "user": {"login": rng.choice(authors), "type": "User"},
+            "labels": [{"name": rng.choice(["bug", "enhancement", "performance"])}],
+            "created_at": _iso(created),
+            "updated_at": _iso(created + timedelta(hours=1)),
+        })
+
+    return {"repo": repo, "issues": issues, "pulls": pulls, "commits": commits, "files": files}
+
+
+def load_fixture(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_fixture(fixture, path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(fixture, f)
+
+
+def _search_terms(query):
+    """Alternatives of a code search query, without qualifiers like `repo:` or `in:`."""
+    terms = re.findall(r'"([^"]+)"|(\S+)', query)
+    return [(phrase or word).lower() for phrase, word in terms
+            if phrase or (word != "OR" and ":" not in word)]
+
+
+def _graphql_commit(c):
+    author = c["commit"]["author"]
+    return {"oid": c["sha"], "messageHeadline": c["commit"]["message"].split("\n", 1)[0],
+            "author": {"name": author["name"], "date": author["date"], "user": c["author"]}}
+
+
+def _graphql_pull(pr):
+    return {"number": pr["number"], "title": pr["title"], "body": pr["body"], "updatedAt": pr["updated_at"],
+            "author": {"login": pr["user"]["login"], "__typename": pr["user"]["type"]}}
+
+
+class StandInGitHub:
+    """
+    Threaded HTTP server replaying `fixture` as the GitHub API.
+
+    :param latency:       Seconds added to every response
+    :param max_per_page:  Largest page size served (`per_page` and GraphQL
+                          `first` above it are capped), to exercise pagination
+    """
+
+    def __init__(self, fixture, latency=0.0, max_per_page=100, address=("127.0.0.1", 0)):
+        self.fixture = fixture
+        self.latency = latency
+        self.max_per_page = max_per_page
+        self.issues = sorted(fixture["issues"], key=lambda i: i["number"], reverse=True)
+        self.issue_numbers = {i["number"]: i for i in fixture["issues"]}
+        self.pulls = sorted(fixture["pulls"], key=lambda p: p["updated_at"], reverse=True)
+        self.pull_numbers = {p["number"]: p for p in fixture["pulls"]}
+        self.commit_shas = {c["sha"]: c for history in fixture["commits"].values() for c in history}
+        self.files = {path: content.lower() for path, content in fixture.get("files", {}).items()}
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+        handler = type("Handler", (_Handler,), {"stand_in": self})
+        self.server = ThreadingHTTPServer(address, handler)
+        self.server.daemon_threads = True
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def reset_stats(self):
+        with self._lock:
+            self._stats = {}
+
+    def stats(self):
+        """Per endpoint: `{"requests", "not_modified", "bytes_in", "bytes_out"}`."""
+        with self._lock:
+            return {endpoint: dict(counts) for endpoint, counts in self._stats.items()}
+
+    def record(self, endpoint, status, bytes_in, bytes_out):
+        with self._lock:
+            counts = self._stats.setdefault(endpoint, {"requests": 0, "not_modified": 0, "bytes_in": 0, "bytes_out": 0})
+            counts["requests"] += 1
+            counts["not_modified"] += status == 304
+            counts["bytes_in"] += bytes_in
+            counts["bytes_out"] += bytes_out
+
+    def _page(self, items, query):
+        per_page = min(int(query.get("per_page", 30)), self.max_per_page)
+        page = int(query.get("page", 1))
+        last = max(1, -(-len(items) // per_page))
+        return items[(page - 1) * per_page: page * per_page], last
+
+    # REST endpoints; each returns (endpoint, status, body, last page or None)
+
+    def list_issues(self, query):
+        items = self.issues
+        if query.get("state", "open") != "all":
+            items = [i for i in items if i["state"] == query.get("state", "open")]
+        if "since" in query:
+            items = sorted((i for i in items if i["updated_at"] >= query["since"]),
+                           key=lambda i: i["updated_at"], reverse=query.get("direction") != "asc")
+        body, last = self._page(items, query)
+        return "issues", 200, body, last
+
+    def get_issue(self, number):
+        item = self.issue_numbers.get(number)
+        if item is None and number in self.pull_numbers:
+            item = {**self.pull_numbers[number], "pull_request": {}}
+        if item is None:
+            return "issue", 404, {"message": "Not Found"}, None
+        return "issue", 200, item, None
+
+    def list_pulls(self, query):
+        body, last = self._page(self.pulls, query)
+        return "pulls", 200, body, last
+
+    def list_commits(self, query):
+        items = self.fixture["commits"].get(query.get("path"), [])
+        if "since" in query:
+            items = [c for c in items if c["commit"]["author"]["date"] >= query["since"]]
+        body, last = self._page(items, query)
+        return "commits", 200, body, last
+
+    def get_commit(self, sha):
+        item = self.commit_shas.get(sha)
+        if item is None:
+            return "commit", 422, {"message": "No commit found for SHA"}, None
+        return "commit", 200, item, None
+
+    def search_code(self, query, text_match):
+        terms = _search_terms(query.get("q", ""))
+        items = []
+        for path, content in self.files.items():
+            hits = [t for t in terms if t in path.lower() or t in content]
+            if not hits:
+                continue
+            item = {"name": path.rsplit("/", 1)[1], "path": path, "score": float(len(hits))}
+            if text_match:
+                item["text_matches"] = [{"property": "content", "fragment": hit} for hit in hits]
+            items.append(item)
+        items.sort(key=lambda item: (-item["score"], item["path"]))
+        body, _ = self._page(items, query)
+        return "search", 200, {"total_count": len(items), "incomplete_results": False, "items": body}, None
+
+    def graphql(self, request):
+        variables = request["variables"]
+        if "pullRequests" in request["query"]:
+            first = min(variables["first"], self.max_per_page)
+            start = int(variables.get("after") or 0)
+            page = self.pulls[start:start + first]
+            connection = {"nodes": [_graphql_pull(pr) for pr in page],
+                          "pageInfo": {"hasNextPage": start + first < len(self.pulls), "endCursor": str(start + first)}}
+            return "graphql:pulls", 200, {"data": {"repository": {"pullRequests": connection}}}, None
+
+        target = {}
+        i = 0
+        while f"path{i}" in variables:
+            history = self.fixture["commits"].get(variables[f"path{i}"], [])
+            since = variables.get(f"since{i}")
+            if since:
+                history = [c for c in history if c["commit"]["author"]["date"] >= since]
+            first = min(variables[f"first{i}"], self.max_per_page)
+            target[f"p{i}"] = {"nodes": [_graphql_commit(c) for c in history[:first]]}
+            i += 1
+        return "graphql:history", 200, {"data": {"repository": {"defaultBranchRef": {"target": target}}}}, None
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # headers and body go out in separate writes; without this, kept-alive
+    # connections wait for a delayed ACK on every response
+    disable_nagle_algorithm = True
+    stand_in = None
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        path = url.path
+        stand_in = self.stand_in
+
+        if path == "/_stats":
+            return self._send("_stats", 200, stand_in.stats(), count=False)
+        if re.fullmatch(r"/repos/[^/]+/[^/]+/issues", path):
+            answer = stand_in.list_issues(query)
+        elif re.fullmatch(r"/repos/[^/]+/[^/]+/issues/\d+", path):
+            answer = stand_in.get_issue(int(path.rsplit("/", 1)[1]))
+        elif re.fullmatch(r"/repos/[^/]+/[^/]+/pulls", path):
+            answer = stand_in.list_pulls(query)
+        elif re.fullmatch(r"/repos/[^/]+/[^/]+/commits", path):
+            answer = stand_in.list_commits(query)
+        elif re.fullmatch(r"/repos/[^/]+/[^/]+/commits/[0-9a-f]+", path):
+            answer = stand_in.get_commit(path.rsplit("/", 1)[1])
+        elif path == "/search/code":
+            answer = stand_in.search_code(query, "text-match" in self.headers.get("Accept", ""))
+        else:
+            answer = ("other", 404, {"message": "Not Found"}, None)
+        self._send(*answer, query=query)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        raw = self.rfile.read(length)
+        if self.path == "/_reset":
+            self.stand_in.reset_stats()
+            return self._send("_reset", 200, {}, count=False)
+        if self.path != "/graphql":
+            return self._send("other", 404, {"message": "Not Found"}, bytes_in=length)
+        self._send(*self.stand_in.graphql(json.loads(raw)), bytes_in=length)
+
+    def _send(self, endpoint, status, body, last=None, query=None, bytes_in=0, count=True):
+        data = json.dumps(body).encode("utf-8")
+        etag = '"%s"' % hashlib.md5(data).hexdigest()
+        if status == 200 and self.command == "GET" and self.headers.get("If-None-Match") == etag:
+            status, data = 304, b""
+
+        if count:
+            time.sleep(self.stand_in.latency)
+            self.stand_in.record(endpoint, status, bytes_in, len(data))
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("ETag", etag)
+        resource = "code_search" if endpoint == "search" else "graphql" if endpoint.startswith("graphql") else "core"
+        self.send_header("X-RateLimit-Resource", resource)
+        self.send_header("X-RateLimit-Remaining", "4999")
+        self.send_header("X-RateLimit-Reset", str(int(time.time()) + 3600))
+        if last and last > 1:
+            path = urlparse(self.path).path
+            page = int(query.get("page", 1))
+
+            def link(to, rel):
+                return f'<http://{self.headers.get("Host")}{path}?{urlencode({**query, "page": to})}>; rel="{rel}"'
+            links = [link(page + 1, "next")] if page < last else []
+            self.send_header("Link", ", ".join(links + [link(last, "last")]))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _Response:
+    def __init__(self, text):
+        self.text = text
+
+
+class StubModel:
+    """
+    Stand-in for `genai.GenerativeModel`: answers single- and multi-issue
+    prompts after `latency` seconds, with the identifier-like words of each
+    issue's title and description as keywords.
+    """
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _keywords(block):
+        text = " ".join(re.findall(r"(?:Title|Description): (.*)", block))
+        words = re.findall(r"[A-Za-z_][\w.]*[\w]", text)
+        technical = [w for w in words if "_" in w or "." in w or re.search(r"[a-z][A-Z]", w)]
+        return list(dict.fromkeys(technical))[:8]
+
+    def generate_content(self, prompt):
+        time.sleep(self.latency)
+        with self._lock:
+            self.calls += 1
+        tail = prompt.rsplit("**Now process", 1)[-1]
+        blocks = re.split(r"### Issue (\d+)", tail)
+        if len(blocks) == 1:
+            answer = {"keywords": self._keywords(tail), "summary": "Synthetic summary."}
+            return _Response("```json\n%s\n```" % json.dumps(answer))
+        answers = [{"issue_number": int(number), "keywords": self._keywords(block), "summary": "Synthetic summary."}
+                   for number, block in zip(blocks[1::2], blocks[2::2])]
+        return _Response("```json\n%s\n```" % json.dumps(answers))
@@ -0,0 +1,62 @@
+"""
+CLI start-up budget check.
+
+Runs `main.py --help` and a thin-client start-up (the imports a single-issue
+run needs before it asks the daemon) under `python -X importtime`, and fails
+if the imports take longer than the budget or pull in one of the heavy stage
+dependencies.
+
+    python benchmarks/startup.py [--budget-ms 150] [--runs 5]
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# must not be imported before a stage actually runs
+HEAVY_MODULES = ["google.generativeai", "numpy", "scipy", "requests", "prettytable"]
+
+SCENARIOS = {
+    "help": [os.path.join(ROOT, "main.py"), "--help"],
+    "thin-client": ["-c", "import main, source.server_client, source.utils"],
+}
+
+
+def import_profile(args):
+    """`(total import microseconds, imported module names)` of one run."""
+    result = subprocess.run([sys.executable, "-X", "importtime", *args], cwd=ROOT,
+                            capture_output=True, text=True)
+    total, modules = 0, set()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        modules.add(name.strip())
+        # top-level imports are the unindented ones; their cumulative times add up to the total
+        if not name.startswith("  "):
+            total += int(cumulative)
+    return total, modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("GIT_RECOMMEND_STARTUP_BUDGET_MS", "150")))
+    parser.add_argument("--runs", type=int, default=5, help="best of this many runs is compared to the budget")
+    args = parser.parse_args()
+
+    failed = False
+    for scenario, command in SCENARIOS.items():
+        profiles = [import_profile(command) for _ in range(args.runs)]
+        best = min(total for total, _ in profiles) / 1000
+        heavy = sorted(m for m in HEAVY_MODULES if any(m in modules for _, modules in profiles))
+        ok = best <= args.budget_ms and not heavy
+        failed |= not ok
+        print(f"{scenario:12} {best:8.1f} ms  (budget {args.budget_ms:.0f} ms)  "
+              f"{'ok' if ok else 'FAIL'}{'  heavy imports: ' + ', '.join(heavy) if heavy else ''}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,64 @@
 import os
+import sys
 import argparse
-from dotenv import load_dotenv
-
-from source.fuse_contributors import fuse_contributors
-from source.get_contributor_from_file_changes import find_contributors_from_file_data
-from source.github import list_github_issues
-from source.get_contributors_BM25 import find_contributors
-from source.utils import create_link_in_print, filter_human_users, parse_full_repo_name, parse_github_url, save_issues_to_file
-from source.keyword_extraction import process_single_issue, load_issues
+
 from source.print_colors import bcolors
 
+# The stages (and their dependencies: requests, numpy/scipy, google.generativeai,
+# prettytable) are imported inside the functions that run them, so `--help`,
+# argument errors and requests answered by the daemon don't pay for them.
+
+def parse_issue_numbers(value):
+    try:
+        return [int(n) for n in value.split(",") if n.strip()]
+    except ValueError:
+        raise argparse.ArgumentTypeError("expected comma-separated issue numbers, e.g. 12,34,56")
+
+
+def run_batch(owner, repo, token, issues, issue_numbers=None, llm_batch_size=1):
+    """Triage all given open issues (an `IssueFile`, or only `issue_numbers` of it) in one pass."""
+    from source.batch import triage_issues
+
+    # `issues` stays lazy: each issue is parsed only when the extraction engine gets to it
+    if issue_numbers is not None:
+        missing = [n for n in issue_numbers if n not in issues]
+        if missing:
+            print(f"{bcolors.WARNING}Skipping closed or unknown issues: {', '.join(f'#{n}' for n in missing)}{bcolors.ENDC}\n")
+        issues = issues.select(issue_numbers)
+
+    output_filename = f"{os.getcwd()}/outputs/{repo}_triage.jsonl"
+    print(f"{bcolors.OKCYAN}Processing {len(issues)} issues from {owner}/{repo}...{bcolors.ENDC}\n")
+    results = triage_issues(owner, repo, token, issues, output_filename, llm_batch_size=llm_batch_size)
+    print(f"\n{bcolors.WARNING}Saved recommendations for {len(results)} issues to '{output_filename}'{bcolors.ENDC}")
+
+
+def report_metrics(profile, metrics_out, metrics_format=None):
+    """Print the per-stage profile (`--profile`) and/or write the metrics file (`--metrics-out`)."""
+    from source import metrics
+
+    if profile:
+        print(f"\n{bcolors.OKCYAN}Profile:{bcolors.ENDC}\n{metrics.format_summary(metrics.snapshot())}", file=sys.stderr)
+    if metrics_out:
+        metrics.write(metrics_out, metrics_format)
+        print(f"{bcolors.WARNING}Metrics written to '{metrics_out}'{bcolors.ENDC}", file=sys.stderr)
+
+
+def serve_main(argv):
+    """`git-recommend serve [--address HOST:PORT]`: run the recommender daemon."""
+    from dotenv import load_dotenv
+    from source.server import serve
+
+    parser = argparse.ArgumentParser(prog="git-recommend serve", description="Run the git-recommend daemon")
+    parser.add_argument("--address", help="HOST:PORT to listen on (default: $GIT_RECOMMEND_SERVER or 127.0.0.1:8765)")
+    parser.add_argument("--metrics", action="store_true", help="Collect metrics and serve them at GET /metrics (Prometheus text)")
+    args = parser.parse_args(argv)
+    load_dotenv()
+    serve(args.address, token=os.getenv("GITHUB_TOKEN"), metrics_enabled=args.metrics)
+
+
 def main():
+    if sys.argv[1:2] == ["serve"]:
+        return serve_main(sys.argv[2:])
 
     parser = argparse.ArgumentParser(
         prog="git-recommend",
@@ -18,11 +66,32 @@ def main():
     )
 
     parser.add_argument("full_repo_name", help="GitHub repository name with owner (e.g. owner/repo)")
-    parser.add_argument("issue_number", type=int, help="Issue number to process")
+    parser.add_argument("issue_number", type=int, nargs="?", help="Issue number to process")
+    parser.add_argument("--all-open", action="store_true", help="Process every open issue of the repository")
+    parser.add_argument("--issues", type=parse_issue_numbers, help="Comma-separated issue numbers to process (e.g. 12,34,56)")
+    parser.add_argument("--no-server", action="store_true", help="Don't use a running `git-recommend serve` daemon")
+    parser.add_argument("--llm-batch-size", type=int, default=1, help="With --all-open/--issues: issues sent to the LLM per prompt (default: 1)")
+    parser.add_argument("--deadline", type=float, metavar="SECONDS", help="Answer a single issue within SECONDS, falling back to approximate stages when GitHub or the LLM are slow")
+    parser.add_argument("--profile", action="store_true", help="Print time per stage, GitHub requests and cache hit rates at the end")
+    parser.add_argument("--metrics-out", metavar="FILE", help="Write the run's metrics to FILE (Prometheus text for .prom/.txt, JSON otherwise)")
+    parser.add_argument("--metrics-format", choices=["json", "prometheus"], help="Format of --metrics-out, overriding the file extension")
     args = parser.parse_args()
 
+    if sum([args.issue_number is not None, args.all_open, args.issues is not None]) != 1:
+        parser.error("give exactly one of: issue_number, --all-open, --issues")
+    if args.deadline is not None and (args.issue_number is None or args.deadline <= 0):
+        parser.error("--deadline takes a positive number of seconds and a single issue_number")
+
+    from dotenv import load_dotenv
+    from source.server_client import request_recommendation
+    from source.utils import create_link_in_print, parse_full_repo_name, parse_github_url, print_issue_pretty
+
     load_dotenv()
     token = os.getenv("GITHUB_TOKEN")
+    collect_metrics = args.profile or args.metrics_out
+    if collect_metrics:
+        from source import metrics
+        metrics.enable()
     # repo_url = input("Enter GitHub repo URL to fetch issues from: ")
 
     full_repo_name = args.full_repo_name       # now comes from CLI
@@ -32,66 +101,81 @@ def main():
     output_dir = os.path.join(os.getcwd(), "outputs")
     os.makedirs(output_dir, exist_ok=True)
 
+    failed = False
     try:
         # owner, repo = parse_github_url(repo_url)
         repo_url, owner, repo = parse_full_repo_name(full_repo_name)
-        issues = list_github_issues(owner, repo, token=token)
+        if issue_number is None:
+            from source.github import iter_github_issues
+            from source.issue_file import IssueFile, write_issues_jsonl
+
+            # only the batch modes list the open issues: streamed to disk as they are read,
+            # then opened lazily so only the issues used get parsed
+            filename = f"{os.getcwd()}/outputs/{repo}_issues.jsonl"
+            count = write_issues_jsonl(iter_github_issues(owner, repo, token=token), filename)
+            issues = IssueFile(filename)
+            print(f"{bcolors.WARNING}Saved {count} issues to '{filename}'{bcolors.ENDC}\n")
+            run_batch(owner, repo, token, issues, args.issues, llm_batch_size=args.llm_batch_size)
+            return
 
-        filename = f"{os.getcwd()}/outputs/{repo}_issues.json"
-        save_issues_to_file(issues, filename)
-        print(f"{bcolors.WARNING}Saved {len(issues)} issues to '{filename}'{bcolors.ENDC}\n")
-
-        issues = load_issues(filename)
         output_filename = f"{os.getcwd()}/outputs/{repo}_issues_with_keywords.json"
         
         print(f"{bcolors.OKCYAN}Processing issue #{issue_number} from {owner}/{repo}...{bcolors.ENDC}\n")
-        process_single_issue(issues, issue_number, output_filename)
 
-        print(f"{bcolors.OKCYAN}Finding contributors...{bcolors.ENDC}\n")
+        # a running `git-recommend serve` daemon answers from warm indexes; otherwise run in-process,
+        # fetching only this issue however many open issues the repository has
+        result = None if args.no_server else request_recommendation(full_repo_name, issue_number,
+                                                                    deadline=args.deadline)
+        if result is None:
+            from source.recommend import recommend_issue
 
-        # find contributors based on PR
-        user_list_1 = find_contributors(
-            owner,
-            repo,
-            token,
-            keywords_file=output_filename,
-            pr_count=500,
-            top_n=5
-        )
-        top_users_based_on_prs = filter_human_users(user_list_1)
+            result = recommend_issue(owner, repo, token, issue_number, output_path=output_filename,
+                                     deadline=args.deadline)
+            print_issue_pretty(result, wrap_width=100)
+            print(f"{bcolors.WARNING}Results saved to {output_filename}{bcolors.ENDC}\n")
+        else:
+            print_issue_pretty(result, wrap_width=100)
 
         print(f"{bcolors.OKBLUE}Top contributors based on who raised related PRs:{bcolors.ENDC}")
-        for i, user in enumerate(top_users_based_on_prs, start=1):
+        for i, user in enumerate(result["contributors_by_prs"], start=1):
             print(f"{i}. {user}")
 
         print()
 
-        # find contributors from related file changes
-        user_list_2 = find_contributors_from_file_data(
-            token,
-            output_filename,
-            owner,
-            repo)
-        top_users_based_on_files_changed = filter_human_users(user_list_2)
-
         print(f"{bcolors.OKBLUE}Top contributors based on who worked on related code:{bcolors.ENDC}")
-        for i, user in enumerate(top_users_based_on_files_changed, start=1):
+        for i, user in enumerate(result["contributors_by_files"], start=1):
             print(f"{i}. {user}")
 
         print()
 
         # rank contributors from both lists (via Reciprocal Rank Fusion)
-        top_contributors = fuse_contributors(top_users_based_on_prs, top_users_based_on_files_changed)
         print(f"{bcolors.OKGREEN}{bcolors.BOLD}Most likely users to contribute to this issue are:{bcolors.ENDC}")
-        for i, user in enumerate(top_contributors, start=1):
+        for i, user in enumerate(result["recommended"], start=1):
             # create a hyperlink to the users profile as well
             print(f"{bcolors.OKGREEN}{i}. {create_link_in_print(f'https://www.github.com/{user}', user)}")
 
+        degraded = result.get("degraded")
+        if degraded:
+            print(f"\n{bcolors.WARNING}Approximate answer: these stages fell back or ran out of time: "
+                  f"{', '.join(degraded)}{bcolors.ENDC}")
 
         # else:
         #     print("Keyword extraction skipped.")
     except Exception as e:
+        failed = True
         print(f"{bcolors.FAIL}Error: {e}{bcolors.ENDC}")
+    finally:
+        if collect_metrics:
+            report_metrics(args.profile, args.metrics_out, args.metrics_format)
+
+    if args.deadline is not None:
+        # stages given up on (a PR sync, a code search) may still be running: don't wait for them.
+        # os._exit skips atexit handlers, so save what they would have
+        from source.bot_classifier import save_default_classifier
+        save_default_classifier()
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os._exit(1 if failed else 0)
 
 if __name__ == "__main__":
     main()
@@ -14,7 +14,8 @@ setup(
         # any dependencies, e.g. "requests>=2.0"
         "google-generativeai",
         "python-dotenv",
-        "rank_bm25",
-        "prettytable"
+        "prettytable",
+        "numpy",
+        "scipy"
     ],
 )
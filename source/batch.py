@@ -0,0 +1,115 @@
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from source import metrics
+from source.batch_scoring import BatchScorer
+from source.corpus import load_corpus
+from source.extraction_engine import ExtractionEngine
+from source.fuse_contributors import fuse_contributors
+from source.get_contributor_from_file_changes import find_contributors_from_keywords, search_project_code_file
+from source.get_contributors_BM25 import keyword_tokens, update_profiles
+from source.github import list_paths_commits, sync_closed_pulls
+from source.print_colors import bcolors
+from source.profiles import RANKER, get_default_profiles
+from source.store import get_default_store
+from source.tokenizer import get_default_token_cache
+from source.utils import filter_human_users
+
+
+class _BatchCache:
+    """Code-search results and per-path commit lists shared by every issue of a batch."""
+
+    def __init__(self):
+        self.searches = {}
+        self.commits = {}
+        self._lock = threading.Lock()
+
+    def search(self, token, query, owner, repo):
+        with self._lock:
+            if query in self.searches:
+                return self.searches[query]
+        result = search_project_code_file(token, query, owner, repo)
+        with self._lock:
+            self.searches[query] = result
+        return result
+
+    def list_commits(self, owner, repo, paths, token=None, commit_limit=100):
+        with self._lock:
+            missing = [p for p in paths if (p, commit_limit) not in self.commits]
+        if missing:
+            fetched = list_paths_commits(owner, repo, missing, token=token, commit_limit=commit_limit)
+            with self._lock:
+                for path, commits in zip(missing, fetched):
+                    self.commits[(path, commit_limit)] = commits
+        with self._lock:
+            return [self.commits[(p, commit_limit)] for p in paths]
+
+
+@metrics.timed("triage")
+def triage_issues(owner, repo, token, issues, output_path, pr_count=500, top_n=5, llm_batch_size=1, engine=None):
+    """
+    Recommend contributors for many issues in one run.
+
+    The PR corpus is synced, memory-mapped (see `Corpus`) and loaded into a
+    `BatchScorer` once, in the background while the first LLM calls are in
+    flight, and code search results and commit histories are shared between
+    issues. Keyword extraction runs concurrently in an `ExtractionEngine`, so
+    the LLM calls for later issues overlap with ranking of earlier ones. Each
+    result is appended to `output_path` (JSON Lines) as soon as it is ready.
+
+    :param issues:         Sized iterable of issue dicts, e.g. an `IssueFile`;
+                           read lazily, one window of issues at a time
+    :param llm_batch_size: Issues packed into one LLM prompt
+    :param engine:         Optional preconfigured `ExtractionEngine`
+    :return:               List of result dicts, in completion order
+    """
+    full_name = f"{owner}/{repo}"
+    total = len(issues)
+
+    def load_scorer():
+        store = get_default_store()
+        sync_closed_pulls(owner, repo, token=token, pr_count=pr_count, store=store)
+        if RANKER == "profiles":
+            update_profiles(owner, repo, token, store)
+            return get_default_profiles().scorer(full_name)
+        return BatchScorer.from_corpus(load_corpus(store, full_name, get_default_token_cache()))
+
+    cache = _BatchCache()
+    engine = engine or ExtractionEngine(batch_size=llm_batch_size)
+
+    results = []
+    with open(output_path, 'w', encoding='utf-8') as out, ThreadPoolExecutor(max_workers=1) as prefetch:
+        # the corpus doesn't depend on the keywords: it is built while the LLM works
+        scorer_future = prefetch.submit(load_scorer)
+        for done, (issue, extracted) in enumerate(engine.iter_extract(issues), start=1):
+            if not extracted:
+                print(f"{bcolors.FAIL}[{done}/{total}] Skipping issue #{issue['number']}: keyword extraction failed{bcolors.ENDC}")
+                continue
+            keywords, summary, _ = extracted
+            scorer = scorer_future.result()
+
+            try:
+                prs_ranked = filter_human_users(scorer.top_authors([keyword_tokens(keywords)], top_n=top_n)[0])
+                files_ranked = filter_human_users(find_contributors_from_keywords(
+                    token, keywords, owner, repo, search=cache.search, list_commits=cache.list_commits))
+            except Exception as e:
+                print(f"{bcolors.FAIL}[{done}/{total}] Skipping issue #{issue['number']}: {e}{bcolors.ENDC}")
+                continue
+
+            result = {
+                "issue_number": issue["number"],
+                "title": issue["title"],
+                "keywords": keywords,
+                "labels": issue.get("labels", []),
+                "summary": summary,
+                "contributors_by_prs": prs_ranked,
+                "contributors_by_files": files_ranked,
+                "recommended": fuse_contributors(prs_ranked, files_ranked),
+            }
+            out.write(json.dumps(result) + "\n")
+            out.flush()
+            results.append(result)
+            print(f"{bcolors.OKGREEN}[{done}/{total}] #{issue['number']}: {', '.join(result['recommended'])}{bcolors.ENDC}")
+
+    return results
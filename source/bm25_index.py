@@ -0,0 +1,230 @@
+import math
+import os
+import sqlite3
+import threading
+from collections import Counter
+
+from source import metrics
+from source.tokenizer import TOKENIZER_VERSION, code_tokens, get_default_token_cache
+
+DEFAULT_INDEX_PATH = os.path.join(os.getcwd(), "outputs", "bm25_index.sqlite3")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS docs (
+    repo        TEXT NOT NULL,
+    doc_id      INTEGER NOT NULL,
+    author      TEXT,
+    length      INTEGER NOT NULL,
+    updated_at  TEXT,
+    PRIMARY KEY (repo, doc_id)
+);
+CREATE TABLE IF NOT EXISTS postings (
+    repo        TEXT NOT NULL,
+    term        TEXT NOT NULL,
+    doc_id      INTEGER NOT NULL,
+    tf          INTEGER NOT NULL,
+    PRIMARY KEY (repo, term, doc_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS postings_doc ON postings (repo, doc_id);
+CREATE TABLE IF NOT EXISTS terms (
+    repo        TEXT NOT NULL,
+    term        TEXT NOT NULL,
+    df          INTEGER NOT NULL,
+    PRIMARY KEY (repo, term)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS stats (
+    repo         TEXT PRIMARY KEY,
+    doc_count    INTEGER NOT NULL DEFAULT 0,
+    total_length INTEGER NOT NULL DEFAULT 0,
+    high_water   TEXT
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key    TEXT PRIMARY KEY,
+    value  TEXT
+);
+"""
+
+
+def tokenize(text):
+    return code_tokens(text)
+
+
+def pull_text(pr):
+    text = pr.get("title") or ""
+    if pr.get("body"):
+        text += " " + pr["body"]
+    return text
+
+
+class BM25Index:
+    """
+    On-disk BM25 inverted index of a repository's PR history.
+
+    Keeps, per repository, the postings (term -> doc, term frequency), the
+    document lengths and the per-term document frequencies, together with the
+    document count and total length needed for the average document length.
+    Documents can be added or replaced one at a time and the statistics stay
+    exact, so new PRs never require a rebuild. A query only reads the postings
+    of its own terms.
+
+    Scores use the Okapi BM25 formula with k1/b as in `rank_bm25`, but with the
+    non-negative idf `log(1 + (N - df + 0.5) / (df + 0.5))`, since the
+    epsilon-floored idf of `rank_bm25` needs the average idf over the whole
+    vocabulary.
+    """
+
+    def __init__(self, path=DEFAULT_INDEX_PATH, k1=1.5, b=0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.executescript(SCHEMA)
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'tokenizer'").fetchone()
+            if row is None or row[0] != str(TOKENIZER_VERSION):
+                # indexed with another tokenizer: start over, the next update re-indexes from the store
+                for table in ("docs", "postings", "terms", "stats"):
+                    self._conn.execute(f"DELETE FROM {table}")
+                self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('tokenizer', ?)",
+                                   (str(TOKENIZER_VERSION),))
+
+    def close(self):
+        self._conn.close()
+
+    def stats(self, repo):
+        """Return `(doc_count, total_length, high_water)` for `repo`."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT doc_count, total_length, high_water FROM stats WHERE repo = ?", (repo,)).fetchone()
+        return row if row else (0, 0, None)
+
+    def _remove(self, cur, repo, doc_id):
+        row = cur.execute("SELECT length FROM docs WHERE repo = ? AND doc_id = ?", (repo, doc_id)).fetchone()
+        if row is None:
+            return
+        terms = [t for (t,) in cur.execute(
+            "SELECT term FROM postings WHERE repo = ? AND doc_id = ?", (repo, doc_id))]
+        cur.executemany("UPDATE terms SET df = df - 1 WHERE repo = ? AND term = ?", [(repo, t) for t in terms])
+        cur.execute("DELETE FROM postings WHERE repo = ? AND doc_id = ?", (repo, doc_id))
+        cur.execute("DELETE FROM docs WHERE repo = ? AND doc_id = ?", (repo, doc_id))
+        cur.execute("UPDATE stats SET doc_count = doc_count - 1, total_length = total_length - ? WHERE repo = ?",
+                    (row[0], repo))
+
+    def add_documents(self, repo, docs):
+        """
+        Add or replace documents.
+
+        :param repo: Repository in "owner/repo" format
+        :param docs: Iterable of `(doc_id, author, tokens, updated_at)`
+        """
+        with self._lock, self._conn:
+            cur = self._conn.cursor()
+            cur.execute("INSERT OR IGNORE INTO stats (repo) VALUES (?)", (repo,))
+            high_water = cur.execute("SELECT high_water FROM stats WHERE repo = ?", (repo,)).fetchone()[0]
+            added = 0
+            added_length = 0
+            for doc_id, author, tokens, updated_at in docs:
+                self._remove(cur, repo, doc_id)
+                counts = Counter(tokens)
+                cur.execute("INSERT INTO docs (repo, doc_id, author, length, updated_at) VALUES (?, ?, ?, ?, ?)",
+                            (repo, doc_id, author, len(tokens), updated_at))
+                cur.executemany("INSERT INTO postings (repo, term, doc_id, tf) VALUES (?, ?, ?, ?)",
+                                [(repo, term, doc_id, tf) for term, tf in counts.items()])
+                cur.executemany(
+                    "INSERT INTO terms (repo, term, df) VALUES (?, ?, 1) "
+                    "ON CONFLICT (repo, term) DO UPDATE SET df = df + 1",
+                    [(repo, term) for term in counts])
+                added += 1
+                added_length += len(tokens)
+                if updated_at and (high_water is None or updated_at > high_water):
+                    high_water = updated_at
+            cur.execute("UPDATE stats SET doc_count = doc_count + ?, total_length = total_length + ?, "
+                        "high_water = ? WHERE repo = ?", (added, added_length, high_water, repo))
+        return added
+
+    def add_pulls(self, repo, pulls, token_cache=None):
+        """
+        Index PR records (as returned by the metadata store) by PR number.
+
+        :param token_cache: Optional `TokenCache` to take unchanged PRs' tokens from
+        """
+        pulls = list(pulls)
+        if token_cache is not None:
+            streams = token_cache.pull_tokens(repo, pulls, pull_text)
+        else:
+            streams = [tokenize(pull_text(pr)) for pr in pulls]
+        return self.add_documents(
+            repo, ((pr["number"], pr["user"], tokens, pr.get("updated_at")) for pr, tokens in zip(pulls, streams)))
+
+    @metrics.timed("bm25_scoring")
+    def score(self, repo, query_tokens):
+        """
+        BM25 score of every document that contains at least one query term.
+
+        :return: Dict doc_id -> `(score, author)`
+        """
+        query = Counter(query_tokens)
+        if not query:
+            return {}
+        doc_count, total_length, _ = self.stats(repo)
+        if doc_count == 0:
+            return {}
+        avgdl = total_length / doc_count
+
+        terms = list(query)
+        marks = ",".join("?" * len(terms))
+        with self._lock:
+            dfs = dict(self._conn.execute(
+                f"SELECT term, df FROM terms WHERE repo = ? AND term IN ({marks})", [repo] + terms))
+            rows = self._conn.execute(
+                f"SELECT p.term, p.doc_id, p.tf, d.length, d.author FROM postings p "
+                f"JOIN docs d ON d.repo = p.repo AND d.doc_id = p.doc_id "
+                f"WHERE p.repo = ? AND p.term IN ({marks})", [repo] + terms).fetchall()
+
+        idf = {t: math.log(1 + (doc_count - df + 0.5) / (df + 0.5)) for t, df in dfs.items()}
+        results = {}
+        for term, doc_id, tf, length, author in rows:
+            norm = tf + self.k1 * (1 - self.b + self.b * length / avgdl)
+            s = query[term] * idf[term] * tf * (self.k1 + 1) / norm
+            prev = results.get(doc_id)
+            results[doc_id] = ((prev[0] if prev else 0.0) + s, author)
+        return results
+
+    def export(self, repo):
+        """
+        Whole index of `repo` for bulk scoring.
+
+        :return: `(docs, postings, dfs)` with docs as `[(doc_id, author, length)]`,
+                 postings as `[(term, doc_id, tf)]` and dfs as `{term: df}`
+        """
+        with self._lock:
+            docs = self._conn.execute(
+                "SELECT doc_id, author, length FROM docs WHERE repo = ? ORDER BY doc_id", (repo,)).fetchall()
+            postings = self._conn.execute(
+                "SELECT term, doc_id, tf FROM postings WHERE repo = ?", (repo,)).fetchall()
+            dfs = dict(self._conn.execute("SELECT term, df FROM terms WHERE repo = ? AND df > 0", (repo,)))
+        return docs, postings, dfs
+
+
+@metrics.timed("bm25_index")
+def update_index_from_store(index, store, repo):
+    """Index the closed PRs of `repo` that changed in the store since the last update."""
+    _, _, high_water = index.stats(repo)
+    return index.add_pulls(repo, store.get_pulls(repo, state="closed", since=high_water),
+                           token_cache=get_default_token_cache())
+
+
+_default_index = None
+_default_index_lock = threading.Lock()
+
+
+def get_default_index():
+    """Shared index. The file location can be overridden with GIT_RECOMMEND_BM25_INDEX."""
+    global _default_index
+    with _default_index_lock:
+        if _default_index is None:
+            _default_index = BM25Index(os.getenv("GIT_RECOMMEND_BM25_INDEX", DEFAULT_INDEX_PATH))
+        return _default_index
@@ -0,0 +1,150 @@
+import atexit
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_CACHE_PATH = os.path.join(os.getcwd(), "outputs", "bot_verdicts.sqlite3")
+DEFAULT_MAX_ENTRIES = 200000
+
+BOT_PATTERNS = [
+    r".*bot$",            # ends with “bot”
+    r"^bot-.*",           # starts with “bot-”
+    r".*bot-.*",          # contains “bot-”
+    r".*\[bot\].*",          # contains “[bot]”
+    r"dependabot.*",      # GitHub Dependabot
+    r".*dependabot-.*",
+    r".*[-_.]ci([-_.].*)?$",  # ci, .ci, -ci, _ci
+    r".*actions?$",       # action or actions
+    r"^web-flow$",        # GitHub’s web-flow alias
+    r"^github-actions$",  # official GH Actions bot
+    r".*automation.*",    # generic automation
+    r"^pre-?commit$",     # pre-commit integrations
+    r".*travis.*",        # Travis CI
+    r".*circleci.*",      # CircleCI
+    r".*mergify.*",       # Mergify
+]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS verdicts (
+    login        TEXT PRIMARY KEY,
+    is_bot       INTEGER NOT NULL,
+    source       TEXT NOT NULL,
+    accessed_at  REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS verdicts_accessed ON verdicts (accessed_at);
+"""
+
+
+class BotClassifier:
+    """
+    Tells bot accounts from humans by login.
+
+    All patterns are compiled into a single case-insensitive alternation, and
+    every verdict is memoized, so a login is matched at most once. Logins the
+    API reported with `type == "Bot"` (see `add_bots`) are bots whatever their
+    name. With a `path`, verdicts are kept in SQLite across runs: API verdicts
+    as they are, pattern verdicts tagged with a fingerprint of the patterns so
+    that editing them invalidates the old verdicts. At most `max_entries`
+    verdicts are kept, least recently used first out.
+    """
+
+    def __init__(self, patterns=None, path=None, max_entries=DEFAULT_MAX_ENTRIES):
+        patterns = list(BOT_PATTERNS if patterns is None else patterns)
+        self._regex = re.compile("|".join(f"(?:{p})" for p in patterns), re.IGNORECASE) if patterns else None
+        self.version = hashlib.sha256("\n".join(patterns).encode("utf-8")).hexdigest()[:16]
+        self.path = path
+        self.max_entries = max_entries
+        self._verdicts = OrderedDict()  # login -> (is_bot, source)
+        self._dirty = {}
+        self._lock = threading.Lock()
+        self._conn = None
+        if path:
+            if path != ":memory:":
+                os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            with self._lock, self._conn:
+                self._conn.executescript(SCHEMA)
+                rows = self._conn.execute(
+                    "SELECT login, is_bot, source FROM verdicts WHERE source IN ('type', ?) "
+                    "ORDER BY accessed_at DESC LIMIT ?", (self.version, max_entries)).fetchall()
+            for login, is_bot, source in reversed(rows):
+                self._verdicts[login] = (bool(is_bot), source)
+
+    def _remember(self, login, is_bot, source):
+        self._verdicts[login] = (is_bot, source)
+        self._verdicts.move_to_end(login)
+        self._dirty[login] = (is_bot, source)
+        while len(self._verdicts) > self.max_entries:
+            self._verdicts.popitem(last=False)
+
+    def add_bots(self, logins):
+        """Record logins the API reported as `type == "Bot"`."""
+        with self._lock:
+            for login in logins:
+                if login and self._verdicts.get(login, (None, None))[1] != "type":
+                    self._remember(login, True, "type")
+
+    def is_bot(self, login):
+        with self._lock:
+            verdict = self._verdicts.get(login)
+            if verdict is not None:
+                self._verdicts.move_to_end(login)
+                self._dirty[login] = verdict
+                return verdict[0]
+            is_bot = bool(self._regex and self._regex.match(login))
+            self._remember(login, is_bot, self.version)
+            return is_bot
+
+    def filter_humans(self, logins):
+        return [login for login in logins if not self.is_bot(login)]
+
+    def save(self):
+        """Write the verdicts reached or used since the last save to the cache file."""
+        if self._conn is None:
+            return
+        with self._lock, self._conn:
+            if not self._dirty:
+                return
+            now = time.time()
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO verdicts (login, is_bot, source, accessed_at) VALUES (?, ?, ?, ?)",
+                [(login, int(is_bot), source, now) for login, (is_bot, source) in self._dirty.items()])
+            self._dirty.clear()
+            count = self._conn.execute("SELECT COUNT(*) FROM verdicts").fetchone()[0]
+            if count > self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM verdicts WHERE login IN "
+                    "(SELECT login FROM verdicts ORDER BY accessed_at LIMIT ?)", (count - self.max_entries,))
+
+
+_default_classifier = None
+_default_classifier_lock = threading.Lock()
+
+
+def get_default_classifier():
+    """
+    Shared classifier, saved after each use by `filter_human_users`, by the
+    daemon's refresh loop and at exit (see `save_default_classifier` for exits
+    that skip atexit handlers). The cache location can be overridden
+    with GIT_RECOMMEND_BOT_CACHE; set GIT_RECOMMEND_BOT_CACHE=0 to keep
+    verdicts in memory only.
+    """
+    global _default_classifier
+    with _default_classifier_lock:
+        if _default_classifier is None:
+            location = os.getenv("GIT_RECOMMEND_BOT_CACHE", DEFAULT_CACHE_PATH)
+            _default_classifier = BotClassifier(path=None if location == "0" else location)
+            atexit.register(_default_classifier.save)
+        return _default_classifier
+
+
+def save_default_classifier():
+    """Save the shared classifier's new verdicts, if it was ever used."""
+    with _default_classifier_lock:
+        classifier = _default_classifier
+    if classifier is not None:
+        classifier.save()
@@ -0,0 +1,294 @@
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+
+from source.git_mirror import FETCH_INTERVAL, get_mirror
+
+DEFAULT_INDEX_DIR = os.path.join(os.getcwd(), "outputs", "code_index")
+# "api" uses GitHub's /search/code, "local" the trigram index over the git mirror
+CODE_SEARCH_BACKEND = os.getenv("GIT_RECOMMEND_CODE_SEARCH", "api").lower()
+
+CODE_EXTENSIONS = {
+    ".py", ".java", ".c", ".cpp", ".js", ".ts",
+    ".rb", ".go", ".cs", ".php", ".rs", ".swift", ".kt"
+}
+# GitHub code search skips files larger than this too
+MAX_FILE_SIZE = 384 * 1024
+# score of a term found in the path; content matches score log(1 + occurrences)
+PATH_WEIGHT = 3.0
+# GitHub code search query limits (operators and qualifiers don't count towards the length)
+MAX_QUERY_LENGTH = 256
+MAX_QUERY_OPERATORS = 5
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    file_id  INTEGER PRIMARY KEY,
+    path     TEXT NOT NULL UNIQUE,
+    blob     TEXT NOT NULL,
+    content  BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS trigrams (
+    trigram  BLOB NOT NULL,
+    file_id  INTEGER NOT NULL,
+    PRIMARY KEY (trigram, file_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS path_trigrams (
+    trigram  BLOB NOT NULL,
+    file_id  INTEGER NOT NULL,
+    PRIMARY KEY (trigram, file_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (
+    key    TEXT PRIMARY KEY,
+    value  TEXT
+);
+"""
+
+
+def trigrams(data):
+    """Distinct 3-byte substrings of `data` (bytes)."""
+    return {data[i:i + 3] for i in range(len(data) - 2)}
+
+
+def path_trigrams(path):
+    return trigrams(path.lower().encode("utf-8"))
+
+
+_QUERY_TOKEN = re.compile(r'"([^"]*)"|(\S+)')
+
+
+def parse_query(query):
+    """
+    Alternatives of a code-search query: a list of term lists, where a file
+    matches if it contains every term of any alternative. Terms are lowercased,
+    `"quoted phrases"` are single terms and qualifiers such as `in:` or
+    `repo:` are ignored.
+    """
+    alternatives = [[]]
+    for phrase, word in _QUERY_TOKEN.findall(query):
+        if word == "OR":
+            alternatives.append([])
+        elif phrase.strip() or (word and ":" not in word):
+            alternatives[-1].append((phrase or word).lower())
+    return [terms for terms in alternatives if terms]
+
+
+def query_length(query):
+    """Length of a query as counted by GitHub: without operators, qualifiers and separating spaces."""
+    return sum(len(word) if word else len(phrase) + 2 for phrase, word in _QUERY_TOKEN.findall(query)
+               if word not in ("AND", "OR", "NOT") and ":" not in word)
+
+
+def plan_queries(keywords, max_length=MAX_QUERY_LENGTH, max_operators=MAX_QUERY_OPERATORS):
+    """
+    Pack keywords into as few `"k1" OR "k2" OR ...` queries as GitHub's query
+    length and operator limits allow, in keyword order.
+
+    Keywords that would otherwise read as something else are quoted: those
+    with whitespace, a `:` (a qualifier such as `repo:x`), a leading `-` (an
+    exclusion) or an operator name. Keywords longer than a whole query on
+    their own are dropped.
+    """
+    queries, current = [], []
+    for keyword in dict.fromkeys(" ".join(k.replace('"', " ").split()) for k in keywords):
+        term = f'"{keyword}"' if _needs_quotes(keyword) else keyword
+        if not keyword or query_length(term) > max_length:
+            continue
+        candidate = current + [term]
+        if current and (len(candidate) - 1 > max_operators
+                        or query_length(" OR ".join(candidate)) > max_length):
+            queries.append(" OR ".join(current))
+            candidate = [term]
+        current = candidate
+    if current:
+        queries.append(" OR ".join(current))
+    return queries
+
+
+def _needs_quotes(keyword):
+    return " " in keyword or ":" in keyword or keyword.startswith("-") or keyword in ("AND", "OR", "NOT")
+
+
+class CodeIndex:
+    """
+    Trigram index over the default branch of a repository, built from its
+    local git mirror, answering the same `<terms> in:file,path` queries as
+    GitHub code search without touching the search API.
+
+    Every indexed file's lowercased content and path are split into trigrams,
+    and a term is looked up by intersecting the posting lists of its own
+    trigrams; the few candidate files are then checked against the stored
+    content. Files match when every term occurs in their content or path, and
+    are ranked by the number of occurrences plus a bonus for path matches.
+    Terms shorter than a trigram cannot narrow the candidates: they are only
+    checked on the files the other terms of their alternative select, and an
+    alternative made of such terms alone matches nothing.
+
+    Only files with an extension in `extensions` and no larger than
+    MAX_FILE_SIZE are indexed. `update` re-indexes only the files whose blob
+    changed since the last indexed commit.
+    """
+
+    def __init__(self, path, mirror, extensions=CODE_EXTENSIONS):
+        self.path = path
+        self.mirror = mirror
+        self.extensions = set(extensions)
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._checked_at = None
+        with self._lock, self._conn:
+            self._conn.executescript(SCHEMA)
+            if self._conn.execute("SELECT 1 FROM meta WHERE key = 'path_trigrams'").fetchone() is None:
+                # an index from before paths were indexed too
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO path_trigrams (trigram, file_id) VALUES (?, ?)",
+                    ((g, file_id) for file_id, path in self._conn.execute("SELECT file_id, path FROM files").fetchall()
+                     for g in path_trigrams(path)))
+                self._conn.execute("INSERT INTO meta (key, value) VALUES ('path_trigrams', '1')")
+
+    def _indexable(self, path, size):
+        return os.path.splitext(path)[1].lower() in self.extensions and size <= MAX_FILE_SIZE
+
+    def _remove(self, file_id, path, content):
+        grams = trigrams(zlib.decompress(content))
+        self._conn.executemany("DELETE FROM trigrams WHERE trigram = ? AND file_id = ?",
+                               ((g, file_id) for g in grams))
+        self._conn.executemany("DELETE FROM path_trigrams WHERE trigram = ? AND file_id = ?",
+                               ((g, file_id) for g in path_trigrams(path)))
+        self._conn.execute("DELETE FROM files WHERE file_id = ?", (file_id,))
+
+    def update(self):
+        """
+        Bring the index up to date with the mirror's HEAD.
+
+        :return: Number of files (re)indexed
+        """
+        self.mirror.update()
+        head = self.mirror.head()
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'head'").fetchone()
+            self._checked_at = time.monotonic()
+            if row and row[0] == head:
+                return 0
+            indexed = {path: (file_id, blob) for file_id, path, blob
+                       in self._conn.execute("SELECT file_id, path, blob FROM files")}
+
+        wanted = {path: sha for path, sha, size in self.mirror.list_files(head) if self._indexable(path, size)}
+        changed = {path: sha for path, sha in wanted.items()
+                   if path not in indexed or indexed[path][1] != sha}
+        paths_by_blob = {}
+        for path, sha in changed.items():
+            paths_by_blob.setdefault(sha, []).append(path)
+
+        with self._lock, self._conn:
+            for path, (file_id, blob) in indexed.items():
+                if wanted.get(path) != blob:
+                    content = self._conn.execute(
+                        "SELECT content FROM files WHERE file_id = ?", (file_id,)).fetchone()[0]
+                    self._remove(file_id, path, content)
+
+            for sha, data in self.mirror.read_blobs(paths_by_blob):
+                if b"\0" in data[:8000]:
+                    continue  # binary
+                data = data.lower()
+                grams = trigrams(data)
+                for path in paths_by_blob[sha]:
+                    cursor = self._conn.execute(
+                        "INSERT INTO files (path, blob, content) VALUES (?, ?, ?)",
+                        (path, sha, zlib.compress(data)))
+                    self._conn.executemany("INSERT INTO trigrams (trigram, file_id) VALUES (?, ?)",
+                                           ((g, cursor.lastrowid) for g in grams))
+                    self._conn.executemany("INSERT INTO path_trigrams (trigram, file_id) VALUES (?, ?)",
+                                           ((g, cursor.lastrowid) for g in path_trigrams(path)))
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('head', ?)", (head,))
+        return len(changed)
+
+    def ensure_fresh(self):
+        """`update`, at most once every FETCH_INTERVAL seconds."""
+        if self._checked_at is None or time.monotonic() - self._checked_at > FETCH_INTERVAL:
+            self.update()
+
+    def _candidates(self, term):
+        """File ids whose content or path may contain `term`, or None for terms shorter than a trigram."""
+        grams = list(trigrams(term.encode("utf-8")))
+        if not grams:
+            return None
+        placeholders = ",".join("?" * len(grams))
+        found = set()
+        for table in ("trigrams", "path_trigrams"):
+            rows = self._conn.execute(
+                f"SELECT file_id FROM {table} WHERE trigram IN ({placeholders}) "
+                f"GROUP BY file_id HAVING COUNT(*) = ?", (*grams, len(grams)))
+            found.update(file_id for file_id, in rows)
+        return found
+
+    def search(self, query, limit=100):
+        """
+        :param query: Terms, all of which must match, optionally combined with `OR`
+        :return:      GitHub-style `{"total_count", "items": [{"path", "score", "matched"}]}`,
+                      best first; `matched` lists the alternatives that matched
+        """
+        alternatives = parse_query(query)
+        if not alternatives:
+            return {"total_count": 0, "items": []}
+        self.ensure_fresh()
+
+        with self._lock:
+            candidates = set()
+            for terms in alternatives:
+                found = None
+                for term in terms:
+                    term_files = self._candidates(term)
+                    if term_files is not None:
+                        found = term_files if found is None else found & term_files
+                candidates |= found or set()
+            candidates = list(candidates)
+            files = {}
+            for i in range(0, len(candidates), 500):
+                chunk = candidates[i:i + 500]
+                files.update((file_id, (path, content)) for file_id, path, content in self._conn.execute(
+                    f"SELECT file_id, path, content FROM files WHERE file_id IN ({','.join('?' * len(chunk))})",
+                    chunk))
+
+        scored = []
+        for original_path, content in files.values():
+            text = zlib.decompress(content)
+            path = original_path.lower()
+            score, matched = 0.0, []
+            for terms in alternatives:
+                alternative_score = 0.0
+                for term in terms:
+                    in_path = term in path
+                    count = text.count(term.encode("utf-8"))
+                    if not in_path and not count:
+                        break
+                    alternative_score += math.log1p(count) + (PATH_WEIGHT if in_path else 0.0)
+                else:
+                    score += alternative_score
+                    matched.append(" ".join(terms))
+            if matched:
+                scored.append((score, original_path, matched))
+
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        items = [{"path": path, "score": score, "matched": matched} for score, path, matched in scored[:limit]]
+        return {"total_count": len(scored), "items": items}
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_code_index(owner, repo, token=None):
+    """Shared index per repository. The location can be overridden with GIT_RECOMMEND_CODE_INDEX_DIR."""
+    with _indexes_lock:
+        key = (owner, repo)
+        if key not in _indexes:
+            base_dir = os.getenv("GIT_RECOMMEND_CODE_INDEX_DIR", DEFAULT_INDEX_DIR)
+            _indexes[key] = CodeIndex(os.path.join(base_dir, owner, f"{repo}.sqlite3"),
+                                      get_mirror(owner, repo, token))
+        return _indexes[key]
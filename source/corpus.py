@@ -0,0 +1,320 @@
+import json
+import os
+import shutil
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+import numpy as np
+
+from source import metrics
+from source.bm25_index import pull_text
+from source.tokenizer import TOKENIZER_VERSION, TokenCache
+
+DEFAULT_CORPUS_DIR = os.path.join(os.getcwd(), "outputs", "corpus")
+
+# column name -> dtype
+COLUMNS = {
+    "numbers":       np.int64,
+    "author_ids":    np.int32,
+    "updated":       np.int64,   # epoch seconds
+    "token_offsets": np.int64,   # doc i's tokens are token_ids[token_offsets[i]:token_offsets[i + 1]]
+    "token_ids":     np.uint32,
+}
+
+
+def epoch_seconds(timestamp):
+    if not timestamp:
+        return 0
+    return int(datetime.fromisoformat(timestamp.replace("Z", "+00:00")).timestamp())
+
+
+LAYOUT = 2  # version of the on-disk layout
+# rebuild once more than this share of the rows are superseded by later versions of their PR
+MAX_DEAD_SHARE = 0.5
+
+
+def _map(directory, name, dtype, sizes):
+    """The first `sizes[name]` bytes of a raw array file, memory-mapped (an empty file cannot be)."""
+    count = sizes.get(name, 0) // np.dtype(dtype).itemsize
+    if count == 0:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(os.path.join(directory, name), dtype=dtype, mode="r", shape=(count,))
+
+
+class StringTable:
+    """Strings stored as one UTF-8 blob plus an offsets array, decoded on access."""
+
+    def __init__(self, blob, offsets):
+        self._blob = blob
+        self._offsets = offsets
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i):
+        return bytes(self._blob[self._offsets[i]:self._offsets[i + 1]]).decode("utf-8")
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    @staticmethod
+    def encode(strings, start=0):
+        """`(blob, offsets)` bytes to append for `strings`, the blob so far being `start` bytes long."""
+        encoded = [s.encode("utf-8") for s in strings]
+        ends = start + np.cumsum([len(e) for e in encoded], dtype=np.int64)
+        return b"".join(encoded), ends.tobytes()
+
+    @classmethod
+    def load(cls, directory, name, sizes):
+        offsets = _map(directory, f"{name}_offsets.bin", np.int64, sizes)
+        return cls(_map(directory, f"{name}.bin", np.uint8, sizes), offsets)
+
+
+class Corpus:
+    """
+    Closed PRs of one repository in a compact columnar layout: one raw array
+    file per column (see COLUMNS) plus string tables for author logins and
+    terms.
+
+    Every file is memory-mapped, so loading is nearly free, processes working
+    on the same repository share the pages, and only the columns a ranker
+    touches are ever read. `author_ids` index the `authors` table and
+    `token_ids` the `terms` table.
+
+    The files only ever grow: new PRs are appended, and a PR that changed is
+    appended again while its old row is listed in `dead.bin` (see `live`).
+    `meta.json` holds the length of every file and is replaced last, so a
+    reader never sees a half-written append, and the next append cuts the
+    files back to those lengths first. Appends must be made on a corpus just
+    read from disk, under `writer_lock` (see `load_corpus`).
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, "meta.json"), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        sizes = self.meta.get("sizes", {})  # none in a corpus of an older layout, which gets rebuilt
+        for name, dtype in COLUMNS.items():
+            setattr(self, name, _map(directory, f"{name}.bin", dtype, sizes))
+        self.dead = _map(directory, "dead.bin", np.int64, sizes)
+        self.authors = StringTable.load(directory, "authors", sizes)
+        self.terms = StringTable.load(directory, "terms", sizes)
+        self._author_ids = None  # login -> id, built on the first append
+        self._term_ids = None
+
+    def __len__(self):
+        return len(self.numbers)
+
+    @property
+    def lengths(self):
+        return np.diff(self.token_offsets)
+
+    @property
+    def live(self):
+        """Boolean mask of the rows that hold the current version of their PR."""
+        mask = np.ones(len(self), dtype=bool)
+        mask[np.asarray(self.dead)] = False
+        return mask
+
+    @classmethod
+    def create(cls, directory, meta):
+        """An empty corpus in `directory`, which must not exist yet."""
+        os.makedirs(directory)
+        sizes = {}
+        for name in list(COLUMNS) + ["dead", "authors", "terms"]:
+            open(os.path.join(directory, f"{name}.bin"), "wb").close()
+        for name in ("token_offsets", "authors_offsets", "terms_offsets"):
+            with open(os.path.join(directory, f"{name}.bin"), "wb") as f:
+                f.write(np.zeros(1, dtype=np.int64).tobytes())
+            sizes[f"{name}.bin"] = 8
+        _write_meta(directory, dict(meta, sizes=sizes))
+        return cls(directory)
+
+    def append(self, pulls, token_streams, vocabulary, meta):
+        """
+        Append PRs, superseding the rows of earlier versions of the same PRs.
+
+        :param pulls:         PR records as returned by the metadata store
+        :param token_streams: Token id arrays of the PRs (`TokenCache.pull_token_ids`)
+        :param vocabulary:    Dict token id -> term (`TokenCache.vocabulary`)
+        :param meta:          JSON-serialisable metadata stored alongside
+        :return:              The corpus as it is after the append
+        """
+        sizes = dict(self.meta["sizes"])
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.endswith(".bin") and os.path.getsize(path) > sizes.get(name, 0):
+                # drop whatever a crashed append left past the recorded length
+                os.truncate(path, sizes.get(name, 0))
+        if self._author_ids is None:
+            self._author_ids = {login: i for i, login in enumerate(self.authors)}
+            self._term_ids = {term: i for i, term in enumerate(self.terms)}
+        author_ids, term_ids = self._author_ids, self._term_ids
+
+        numbers = np.fromiter((pr["number"] for pr in pulls), dtype=np.int64, count=len(pulls))
+        superseded = np.flatnonzero(np.isin(self.numbers, numbers) & self.live)
+        lengths = np.fromiter((len(s) for s in token_streams), dtype=np.int64, count=len(token_streams))
+        all_ids = np.concatenate([np.asarray(s, dtype=np.uint32) for s in token_streams] or [np.zeros(0, np.uint32)])
+        # token cache ids -> corpus term ids, new terms going to the end of the table
+        global_ids, inverse = np.unique(all_ids, return_inverse=True)
+        new_terms = []
+        for t in global_ids:
+            term = vocabulary[int(t)]
+            if term not in term_ids:
+                term_ids[term] = len(term_ids)
+                new_terms.append(term)
+        dense = np.fromiter((term_ids[vocabulary[int(t)]] for t in global_ids), dtype=np.uint32,
+                            count=len(global_ids))
+        new_authors = [login for login in dict.fromkeys(pr["user"] or "" for pr in pulls) if login not in author_ids]
+        for login in new_authors:
+            author_ids[login] = len(author_ids)
+
+        last_offset = int(self.token_offsets[-1])
+        parts = {
+            "numbers.bin": numbers,
+            "author_ids.bin": [author_ids[pr["user"] or ""] for pr in pulls],
+            "updated.bin": [epoch_seconds(pr.get("updated_at")) for pr in pulls],
+            "token_offsets.bin": last_offset + np.cumsum(lengths),
+            "token_ids.bin": dense[inverse] if len(all_ids) else [],
+        }
+        parts = {name: np.asarray(values, dtype=COLUMNS[name[:-4]]).tobytes() for name, values in parts.items()}
+        parts["dead.bin"] = superseded.astype(np.int64).tobytes()
+        parts["authors.bin"], parts["authors_offsets.bin"] = StringTable.encode(
+            new_authors, sizes.get("authors.bin", 0))
+        parts["terms.bin"], parts["terms_offsets.bin"] = StringTable.encode(new_terms, sizes.get("terms.bin", 0))
+        for name, data in parts.items():
+            with open(os.path.join(self.directory, name), "ab") as f:
+                f.write(data)
+            sizes[name] = sizes.get(name, 0) + len(data)
+        _write_meta(self.directory, dict(meta, sizes=sizes))
+
+        corpus = Corpus(self.directory)
+        corpus._author_ids, corpus._term_ids = author_ids, term_ids
+        return corpus
+
+
+def _read_meta(directory):
+    try:
+        with open(os.path.join(directory, "meta.json"), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+@contextmanager
+def writer_lock(directory):
+    """
+    Exclusive lock on the corpus in `directory` across processes (e.g. the
+    daemon and a batch run), held while it is appended to or rebuilt. The lock
+    file sits next to the directory, which a rebuild replaces.
+    """
+    os.makedirs(os.path.dirname(directory), exist_ok=True)
+    with open(directory + ".lock", "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _write_meta(directory, meta):
+    tmp = os.path.join(directory, "meta.json.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(tmp, os.path.join(directory, "meta.json"))
+
+
+_corpora = {}
+_corpora_lock = threading.Lock()
+
+
+@metrics.timed("corpus_load")
+def load_corpus(store, repo, token_cache=None, base_dir=None):
+    """
+    Memory-mapped corpus of the closed PRs of `repo` in `store`, brought up to
+    date first if the store changed since it was last written.
+
+    PRs updated since then are appended to the corpus (`Corpus.append`), so
+    only they are read from the store and tokenized. The corpus is rebuilt,
+    reading the store a batch at a time, when there is none yet or it was
+    built with another tokenizer, when PRs left the store or stopped being
+    closed, and when over MAX_DEAD_SHARE of its rows have been superseded.
+    Tokens come from the token cache, so a rebuild only tokenizes the PRs that
+    changed.
+
+    Other processes may update the same corpus: `meta.json` is read on every
+    call, a corpus changed on disk is mapped again, and updates are made under
+    `writer_lock` on the corpus as it is on disk at that point.
+
+    The location can be overridden with GIT_RECOMMEND_CORPUS_DIR.
+    """
+    base_dir = base_dir or os.getenv("GIT_RECOMMEND_CORPUS_DIR", DEFAULT_CORPUS_DIR)
+    directory = os.path.join(base_dir, *repo.split("/"))
+    count, latest = store.pull_stats(repo, state="closed")
+    meta = {"repo": repo, "count": count, "latest": latest, "tokenizer": TOKENIZER_VERSION, "layout": LAYOUT}
+    # without a shared token cache, a throwaway in-memory one still interns the terms
+    token_cache = token_cache or TokenCache(":memory:")
+
+    def append(corpus, pulls):
+        streams = token_cache.pull_token_ids(repo, pulls, pull_text)
+        return corpus.append(pulls, streams, token_cache.vocabulary(), meta)
+
+    def current():
+        """The cached corpus if it is still the one on disk, else the one on disk (or None)."""
+        corpus = _corpora.get(directory)
+        on_disk = _read_meta(directory)
+        if on_disk is None:
+            return None
+        if corpus is None or corpus.meta != on_disk:
+            corpus = _corpora[directory] = Corpus(directory)
+        return corpus
+
+    with _corpora_lock:
+        corpus = current()
+        if corpus is not None and _version(corpus.meta) == _version(meta):
+            return corpus
+        with writer_lock(directory):
+            corpus = _update(current(), directory, store, repo, meta, count, append)
+        _corpora[directory] = corpus
+        return corpus
+
+
+def _update(corpus, directory, store, repo, meta, count, append):
+    """Bring `corpus` (as on disk, or None) up to `meta`, appending or rebuilding."""
+    if corpus is not None and _version(corpus.meta) == _version(meta):
+        return corpus  # another process got there first
+    if corpus is not None and _version(corpus.meta)[2:] == _version(meta)[2:]:
+        pulls = store.get_pulls(repo, state="closed", since=corpus.meta["latest"])
+        # those at the old high-water mark may be in already
+        rows = np.isin(corpus.numbers, [pr["number"] for pr in pulls]) & corpus.live
+        present = set(zip(np.asarray(corpus.numbers)[rows].tolist(), np.asarray(corpus.updated)[rows].tolist()))
+        pulls = [pr for pr in pulls if (pr["number"], epoch_seconds(pr.get("updated_at"))) not in present]
+        corpus = append(corpus, pulls)
+        live_rows = len(corpus) - len(corpus.dead)
+        if live_rows != count or len(corpus.dead) > MAX_DEAD_SHARE * len(corpus):
+            corpus = None
+    else:
+        corpus = None
+
+    if corpus is None:
+        tmp = directory + ".tmp"
+        shutil.rmtree(tmp, ignore_errors=True)
+        corpus = Corpus.create(tmp, meta)
+        for pulls in store.iter_pulls(repo, state="closed"):
+            corpus = append(corpus, pulls)
+        shutil.rmtree(directory, ignore_errors=True)
+        os.replace(tmp, directory)
+        corpus = Corpus(directory)
+    return corpus
+
+
+def _version(meta):
+    return meta.get("count"), meta.get("latest"), meta.get("tokenizer"), meta.get("layout")
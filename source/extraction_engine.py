@@ -0,0 +1,165 @@
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+
+from source import metrics
+from source.keyword_extraction import get_model, parse_extraction
+from source.keyword_extraction_prompt import contruct_batch_prompt, contruct_prompt
+from source.llm_cache import get_default_llm_cache
+from source.utils import extract_batch_results_from_json_string
+
+DEFAULT_MODEL = "gemini-2.0-flash"
+# Gemini free-tier limits for gemini-2.0-flash; override for paid tiers
+DEFAULT_RPM = int(os.getenv("GIT_RECOMMEND_LLM_RPM", "15"))
+DEFAULT_TPM = int(os.getenv("GIT_RECOMMEND_LLM_TPM", "1000000"))
+
+
+def estimate_tokens(text):
+    """Rough token count (~4 characters per token), good enough for budgeting."""
+    return len(text) // 4 + 1
+
+
+class RequestLimiter:
+    """
+    Sliding one-minute window over requests and tokens. `acquire` blocks until
+    sending a request of the given size keeps both under their per-minute limit.
+    """
+
+    def __init__(self, rpm=DEFAULT_RPM, tpm=DEFAULT_TPM, sleep=time.sleep, clock=time.monotonic):
+        self.rpm = rpm
+        self.tpm = tpm
+        self._sleep = sleep
+        self._clock = clock
+        self._window = deque()  # (timestamp, tokens)
+        self._tokens = 0
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens):
+        # a single request larger than the whole budget still has to go through eventually
+        tokens = min(tokens, self.tpm)
+        while True:
+            with self._lock:
+                now = self._clock()
+                while self._window and self._window[0][0] <= now - 60:
+                    self._tokens -= self._window.popleft()[1]
+                if len(self._window) < self.rpm and self._tokens + tokens <= self.tpm:
+                    self._window.append((now, tokens))
+                    self._tokens += tokens
+                    return
+                wait = self._window[0][0] + 60 - now
+            self._sleep(max(wait, 0.01))
+
+
+class ExtractionEngine:
+    """
+    Keyword/summary extraction for many issues.
+
+    One model client is reused for every request, requests run concurrently on
+    `max_workers` threads under a requests/tokens-per-minute limiter, and with
+    `batch_size > 1` several issues are packed into one prompt, so the fixed
+    instructions and few-shot examples are paid once per batch. Issues missing
+    from a batch answer are retried one by one. Issues whose answer is already
+    in the extraction cache never reach the LLM.
+
+    :param client: Object with `generate_content(prompt)` (default: the shared
+                   Gemini model); handy for plugging in a local stub
+    :param cache:  `ExtractionCache` to use (default: the shared one, if enabled)
+    """
+
+    def __init__(self, model=DEFAULT_MODEL, client=None, limiter=None, max_workers=4, batch_size=1, cache=None):
+        self.model = model
+        self.client = client or get_model(model)
+        self.cache = cache if cache is not None else get_default_llm_cache()
+        self.limiter = limiter or RequestLimiter()
+        self.max_workers = max(1, max_workers)
+        self.batch_size = max(1, batch_size)
+
+    def _remember(self, issue, result):
+        if self.cache:
+            self.cache.put(issue, self.model, result)
+
+    @metrics.timed("llm")
+    def _generate(self, prompt):
+        self.limiter.acquire(estimate_tokens(prompt))
+        return self.client.generate_content(prompt).text.strip()
+
+    def extract(self, issue):
+        """Same contract as `extract_keywords`: `(keywords, summary, content)`, or [] on failure."""
+        try:
+            content = self._generate(contruct_prompt(issue))
+            keywords, summary = parse_extraction(content)
+            self._remember(issue, (keywords, summary, content))
+            return keywords, summary, content
+        except Exception as e:
+            print(f"Error processing issue {issue['number']}: {str(e)}")
+            return []
+
+    def extract_batch(self, issues):
+        """
+        Extract several issues with one prompt.
+
+        :return: List of `(issue, result)` pairs
+        """
+        if len(issues) == 1:
+            return [(issues[0], self.extract(issues[0]))]
+        try:
+            content = self._generate(contruct_batch_prompt(issues))
+            parsed = extract_batch_results_from_json_string(content)
+        except Exception as e:
+            print(f"Error processing issues {', '.join(str(i['number']) for i in issues)}: {str(e)}")
+            parsed = {}
+
+        results = []
+        for issue in issues:
+            if issue["number"] in parsed:
+                keywords, summary = parsed[issue["number"]]
+                self._remember(issue, (keywords, summary, content))
+                results.append((issue, (keywords, summary, content)))
+            else:
+                results.append((issue, self.extract(issue)))
+        return results
+
+    def iter_extract(self, issues):
+        """
+        Yield `(issue, result)` pairs as soon as each one is extracted.
+
+        `issues` is consumed lazily (e.g. an `IssueFile`): cached answers are
+        handed out as they are read, and at most `2 * max_workers` chunks are
+        in flight, so only a window of the issues is held in memory.
+        """
+        window = 2 * self.max_workers
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            running = set()
+            chunk = []
+
+            def finished(block):
+                if block:
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                else:
+                    done = {future for future in running if future.done()}
+                running.difference_update(done)
+                for future in done:
+                    yield from future.result()
+
+            for issue in issues:
+                result = self.cache.get(issue, self.model) if self.cache else None
+                if result is not None:
+                    yield issue, result
+                    continue
+                chunk.append(issue)
+                if len(chunk) < self.batch_size:
+                    continue
+                running.add(pool.submit(self.extract_batch, chunk))
+                chunk = []
+                yield from finished(block=len(running) >= window)
+
+            if chunk:
+                running.add(pool.submit(self.extract_batch, chunk))
+            for future in as_completed(running):
+                yield from future.result()
+
+    def extract_many(self, issues):
+        """Dict issue number -> result for all `issues`."""
+        return {issue["number"]: result for issue, result in self.iter_extract(issues)}
@@ -1,11 +1,8 @@
 import requests
 from urllib.parse import urlparse
 import os
-from dotenv import load_dotenv
 import json
 
-load_dotenv()
-
 def parse_github_url(repo_url):
     """Extracts the owner and repository name from a GitHub URL."""
     parsed = urlparse(repo_url)
@@ -66,6 +63,8 @@ def save_issues_to_file(issues, filename="issues.json"):
     print(f"\nSaved {len(issues)} issues to '{filename}'")
 
 if __name__ == "__main__":
+    from dotenv import load_dotenv
+    load_dotenv()
     repo_url = input("Enter GitHub repo URL to fetch issues from: ")
     token = os.getenv("GITHUB_TOKEN")
     try:
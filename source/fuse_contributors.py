@@ -1,7 +1,12 @@
+from source import metrics
+
+
+@metrics.timed("fusion")
 def fuse_contributors(prs_ranked, files_ranked, k=60, top_n=3):
     """
     Combine two ranked lists of GitHub users (from PR history and file-change history)
-    via Reciprocal Rank Fusion, and return the top_n contributors.
+    via Reciprocal Rank Fusion, and return the top_n contributors. Either list may be
+    empty, e.g. when its ranker ran out of time, and the other one is used alone.
 
     :param prs_ranked:   List[str] – users ranked by related-PRs relevance
     :param files_ranked: List[str] – users ranked by file-change relevance
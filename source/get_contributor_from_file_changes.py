@@ -1,13 +1,27 @@
-import requests
 import json
 import os
 from datetime import datetime, timezone
 
+import numpy as np
+
+from source import metrics
+from source.code_search import CODE_EXTENSIONS, CODE_SEARCH_BACKEND, get_code_index, plan_queries
+from source.corpus import epoch_seconds
+from source.git_mirror import get_mirror
+from source.github import COMMITS_BACKEND, list_paths_commits
+from source.github_client import get_client
+from source.pipeline import SingleFlight
 from source.utils import filter_human_users
 
+# upper bound on code searches per issue; keywords that don't fit are not searched
+MAX_SEARCH_QUERIES = 3
+# text fragments of each hit, used to tell which keywords of an OR query matched a file
+TEXT_MATCH_ACCEPT = "application/vnd.github.text-match+json"
+
 def search_project_code_file(token: str, query: str, owner: str, repo: str) -> dict:
     """
-    Search GitHub code via the GitHub API.
+    Search GitHub code via the GitHub API, or the local trigram index when
+    GIT_RECOMMEND_CODE_SEARCH=local.
 
     :param token: GitHub personal access token
     :param query: Search term (e.g. "auto-completion")
@@ -15,12 +29,6 @@ def search_project_code_file(token: str, query: str, owner: str, repo: str) -> d
     :return: Parsed JSON response from the API
     """
 
-    url = "https://api.github.com/search/code"
-    headers = {
-        "Accept": "application/vnd.github+json",
-        "Authorization": f"Bearer {token}",
-        "X-GitHub-Api-Version": "2022-11-28"
-    }
     # params = {
 
     #     "q": query,
@@ -28,24 +36,75 @@ def search_project_code_file(token: str, query: str, owner: str, repo: str) -> d
     #     "in": "file",
     # }
 
+    if CODE_SEARCH_BACKEND == "local":
+        return get_code_index(owner, repo, token).search(query)
+
     params = {
-        "q": f"{query} in:file,path repo:{owner}/{repo}"
+        "q": f"{query} in:file,path repo:{owner}/{repo}",
+        "per_page": 100,
     }
 
     # "q": f"repo:{repo}+in:file+{query}"
 
-    response = requests.get(url, headers=headers, params=params)
+    response = get_client(token).get("/search/code", params=params, headers={"Accept": TEXT_MATCH_ACCEPT})
     # print(response.request.url)
     response.raise_for_status()  # raises an error for 4xx/5xx responses
     return response.json()
 
 
+def matched_keywords(item, keywords):
+    """Keywords found in a search hit's path, text-match fragments or (local index) `matched` list."""
+    texts = [item.get("path", "")] + list(item.get("matched", []))
+    texts += [match.get("fragment", "") for match in item.get("text_matches", [])]
+    texts = [text.lower() for text in texts]
+    return [k for k in keywords if any(k.lower() in text for text in texts)]
+
+
+@metrics.timed("code_search")
+def search_keywords(token, keywords, owner, repo, search=None, max_queries=MAX_SEARCH_QUERIES):
+    """
+    Search the code for all `keywords` with as few requests as possible.
+
+    The keywords are packed into OR queries by `plan_queries`, which run
+    concurrently (the client's rate-limit scheduler keeps them within the
+    search budget). Hits are merged into one per-file relevance score: the
+    number of keywords the file matched, plus the reciprocal of its rank in
+    each result list as a tie-breaker. When the code search budget left is
+    smaller than `max_queries`, only that many queries run (at least one), so
+    a batch of issues does not stall on the search rate limit; the first
+    keywords, which the LLM ranks as most relevant, are kept.
+
+    :return: Items `{"path", "score", "keywords"}`, best first
+    """
+    client = get_client(token)
+    if CODE_SEARCH_BACKEND != "local":
+        headroom = client.remaining("code_search")
+        if headroom is not None:
+            max_queries = max(1, min(max_queries, headroom))
+    search = search or search_project_code_file
+    queries = plan_queries(keywords)[:max_queries]
+    results = client.map(lambda query: search(token, query, owner, repo), queries)
+
+    merged = {}
+    for result in results:
+        for rank, item in enumerate(result.get("items", [])):
+            path = item.get("path", "")
+            entry = merged.setdefault(path, {"path": path, "score": 0.0, "keywords": set()})
+            entry["keywords"].update(matched_keywords(item, keywords))
+            entry["score"] += 1.0 / (rank + 1)
+
+    items = []
+    for entry in merged.values():
+        entry["score"] += len(entry["keywords"])
+        entry["keywords"] = sorted(entry["keywords"])
+        items.append(entry)
+    items.sort(key=lambda entry: (-entry["score"], entry["path"]))
+    return items
+
+
 def filter_code_paths(items, allowed_exts=None, limit=5):
     if allowed_exts is None:
-        allowed_exts = {
-            ".py", ".java", ".c", ".cpp", ".js", ".ts",
-            ".rb", ".go", ".cs", ".php", ".rs", ".swift", ".kt"
-        }
+        allowed_exts = CODE_EXTENSIONS
 
     filtered = []
     for item in items:
@@ -59,6 +118,25 @@ def filter_code_paths(items, allowed_exts=None, limit=5):
     return filtered
 
 
+_file_syncs = SingleFlight()
+
+
+def prepare_file_ranking(owner, repo, token, force=False):
+    """
+    Bring the local sources of the file-based ranking up to date ahead of a
+    query: the trigram code index (GIT_RECOMMEND_CODE_SEARCH=local) or the git
+    mirror (GIT_RECOMMEND_COMMITS_BACKEND=mirror). Nothing to do over the API.
+    An update of the repository already in flight is joined, not repeated.
+
+    :param force: Update the code index even if it was checked recently
+    """
+    if CODE_SEARCH_BACKEND == "local":
+        index = get_code_index(owner, repo, token)
+        _file_syncs.do((owner, repo), index.update if force else index.ensure_fresh)
+    elif COMMITS_BACKEND == "mirror":
+        _file_syncs.do((owner, repo), get_mirror(owner, repo, token).update)
+
+
 def find_contributors_from_file_data(token, keywords_file, owner, repo):
 
     # with open(keywords_file, 'r', encoding='utf-8') as f:
@@ -74,23 +152,37 @@ def find_contributors_from_file_data(token, keywords_file, owner, repo):
     for e in entries:
         keywords.extend(e.get("keywords", []))
 
+    return find_contributors_from_keywords(token, keywords, owner, repo)
+
+
+@metrics.timed("file_ranking")
+def find_contributors_from_keywords(token, keywords, owner, repo, search=None, list_commits=None):
+    """
+    File-based ranking for a list of extracted keywords.
+
+    :param search:       Optional override for `search_project_code_file`
+                         (e.g. a memoized one shared across a batch)
+    :param list_commits: Optional override for `list_paths_commits`, passed to `rank_contributors`
+    """
+    search = search or search_project_code_file
+
     # Remove duplicates while preserving order
     unique_keywords = list(dict.fromkeys(keywords))
+    if not unique_keywords:
+        return []
 
     # print(keyword_doc)
 
-    query = unique_keywords[0]
-    # query = 'auto-completion'
-
-    # print("keyword searching ->", query)
-    result = search_project_code_file(token, query, owner, repo)
-    # print(result.get("items", []))
+    # every keyword is searched, packed into a few OR queries
+    items = search_keywords(token, unique_keywords, owner, repo, search=search)
     
     # filter the code files
-    items = result.get("items", [])
     code_files = filter_code_paths(items, limit=5)
     
-    contributors = rank_contributors(token, owner, repo, code_files, commit_limit=20, top_n=5)
+    # the local mirror makes deep history free; over the API only the latest commits are fetched
+    commit_limit = None if COMMITS_BACKEND == "mirror" else 20
+    contributors = rank_contributors(token, owner, repo, code_files, commit_limit=commit_limit, top_n=5,
+                                     list_commits=list_commits)
     return contributors
     
 
@@ -105,7 +197,7 @@ def find_contributors_from_file_data(token, keywords_file, owner, repo):
     # pass
 
 
-def rank_contributors(token, owner, repo, file_paths, commit_limit=100, top_n=5):
+def rank_contributors(token, owner, repo, file_paths, commit_limit=100, top_n=5, list_commits=None):
     """
     Fetches up to `commit_limit` most recent commits touching any of the given `file_paths`,
     aggregates authors by number of commits and recency, then returns the top_n contributor logins.
@@ -114,59 +206,40 @@ def rank_contributors(token, owner, repo, file_paths, commit_limit=100, top_n=5)
     :param repo:        Repository name (e.g. "vscode-ansible")
     :param token:       GitHub personal access token
     :param file_paths:  List of file paths to fetch commits for
-    :param commit_limit:Max number of commits (across all files) to consider (default 100)
+    :param commit_limit:Max number of commits (across all files) to consider (default 100, None for all)
     :param top_n:       How many top contributors to return (default 5)
+    :param list_commits:Optional override for `list_paths_commits`
     :return:            List of top_n contributor logins, sorted by combined score
     """
-    headers = {
-        "Accept":              "application/vnd.github+json",
-        "Authorization":       f"Bearer {token}",
-        "X-GitHub-Api-Version":"2022-11-28"
-    }
-
-    # 1) Collect all commits touching any of the given files
-    all_commits = []
-    for path in file_paths:
-        url = f"https://api.github.com/repos/{owner}/{repo}/commits"
-        params = {"path": path, "per_page": commit_limit}
-        resp = requests.get(url, headers=headers, params=params)
-        resp.raise_for_status()
-        all_commits.extend(resp.json())
+    # 1) Collect the author and date of every commit touching any of the given files
+    #    (fetched concurrently) as two flat arrays; the commit records themselves are not kept
+    list_commits = list_commits or list_paths_commits
+    author_ids = {}
+    authors, dates = [], []
+    for commits in list_commits(owner, repo, file_paths, token=token, commit_limit=commit_limit):
+        for c in commits:
+            # prefer GitHub login if available, otherwise use author name
+            authors.append(author_ids.setdefault(c["login"] or c["name"], len(author_ids)))
+            dates.append(epoch_seconds(c["date"]))
+    authors = np.asarray(authors, dtype=np.int64)
+    dates = np.asarray(dates, dtype=np.int64)
 
     # 2) Sort by commit date descending and take top `commit_limit`
-    def commit_date(c):
-        # parse ISO8601 date, falling back to author date
-        date_str = c["commit"]["author"]["date"]
-        # replace 'Z' with '+00:00' for fromisoformat
-        return datetime.fromisoformat(date_str.replace("Z", "+00:00"))
-    
-    all_commits.sort(key=commit_date, reverse=True)
-    top_commits = all_commits[:commit_limit]
-
-    # 3) Aggregate per-author counts and recency weights
-    now = datetime.now(timezone.utc)
-    author_stats = {}
-    for c in top_commits:
-        # prefer GitHub login if available, otherwise use author name
-        author_info = c.get("author")
-        login = author_info["login"] if author_info else c["commit"]["author"]["name"]
-        
-        # count
-        stats = author_stats.setdefault(login, {"count": 0, "recency_score": 0.0})
-        stats["count"] += 1
-        
-        # recency weight: 1 / (days_since + 1)
-        dt = commit_date(c)
-        days = (now - dt).days
-        stats["recency_score"] += 1.0 / (days + 1)
-
-    # 4) Compute combined score and sort authors
-    scored = [
-        (login, stats["count"] + stats["recency_score"])
-        for login, stats in author_stats.items()
-    ]
-    scored.sort(key=lambda x: x[1], reverse=True)
+    order = np.argsort(-dates, kind="stable")[:commit_limit]
+    authors, dates = authors[order], dates[order]
+
+    # 3) Aggregate per-author counts and recency weights: 1 / (days_since + 1)
+    now = int(datetime.now(timezone.utc).timestamp())
+    days = (now - dates) // 86400
+    counts = np.bincount(authors, minlength=len(author_ids))
+    recency = np.bincount(authors, weights=1.0 / (days + 1), minlength=len(author_ids))
+
+    # 4) Compute combined score and sort authors, ties in order of their most recent commit
+    present, first_seen = np.unique(authors, return_index=True)
+    scores = counts[present] + recency[present]
+    ranked = present[np.lexsort((first_seen, -scores))]
 
     # 5) Return top_n logins
-    users = [login for login, _ in scored[:top_n]]
+    names = list(author_ids)
+    users = [names[i] for i in ranked[:top_n]]
     return filter_human_users(users)
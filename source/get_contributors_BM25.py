@@ -1,67 +1,149 @@
 # get_contributors.py
 
-# Requires: pip install rank-bm25
-from rank_bm25 import BM25Okapi
 import json
-import requests
+
+from source import metrics
+from source.bm25_index import BM25Index, get_default_index, tokenize, update_index_from_store
+from source.git_mirror import get_mirror
+from source.github import COMMITS_BACKEND, resolve_commit_logins, sync_closed_pulls
+from source.pipeline import SingleFlight
+from source.profiles import RANKER, get_default_profiles, update_profiles_from_store
+from source.store import get_default_store
+from source.tokenizer import get_default_token_cache
 
 def find_contributors(owner, repo, token, keywords_file, pr_count=500, top_n=5):
     """
-    Fetches the latest `pr_count` closed PRs from the given GitHub repo,
-    scores them against the keywords in `keywords_file` using BM25,
-    and returns the top_n contributor usernames.
+    Syncs the latest `pr_count` closed PRs from the given GitHub repo into the
+    local BM25 index (which keeps every PR indexed so far), scores them against
+    the keywords in `keywords_file`, and returns the top_n contributor usernames.
     """
 
     with open(keywords_file, 'r', encoding='utf-8') as f:
         entries = json.load(f)
-    kws = set()
+    kws = []
     for e in entries:
-        kws.update(e.get("keywords", []))
-    keyword_doc = " ".join(kws).lower().split()
-
-
-    headers = {"Authorization": f"token {token}"}
-    prs = []
-    per_page = 100
-    page = 1
-    while len(prs) < pr_count:
-        params = {
-            "state":      "closed",
-            "per_page":   per_page,
-            "page":       page,
-            "sort":       "updated",
-            "direction":  "desc"
-        }
-        url = f"https://api.github.com/repos/{owner}/{repo}/pulls"
-        r = requests.get(url, headers=headers, params=params)
-        r.raise_for_status()
-        batch = r.json()
-        if not batch:
-            break
-        prs.extend(batch)
-        page += 1
-    prs = prs[:pr_count]
-
-
-    docs_tokens = []
-    authors = []
-    for pr in prs:
-        text = pr.get("title", "")
-        if pr.get("body"):
-            text += " " + pr["body"]
-        tokens = text.lower().split()
-        docs_tokens.append(tokens)
-        authors.append(pr["user"]["login"])
-
-
-    bm25 = BM25Okapi(docs_tokens)
-    scores = bm25.get_scores(keyword_doc)
+        kws.extend(e.get("keywords", []))
+
+    return find_contributors_for_keywords(owner, repo, token, kws, pr_count=pr_count, top_n=top_n)
+
+
+@metrics.timed("pr_ranking")
+def find_contributors_for_keywords(owner, repo, token, keywords, pr_count=500, top_n=5, sync=True):
+    """
+    `find_contributors` for a list of extracted keywords. With
+    GIT_RECOMMEND_RANKER=profiles the contributors' expertise profiles are
+    scored directly instead (see `ProfileIndex`).
+
+    :param sync: Bring the PR store and index up to date first; a caller that
+                 refreshes them on its own (e.g. the daemon) can skip it
+    """
+    keyword_doc = keyword_tokens(keywords)
+
+    full_name = f"{owner}/{repo}"
+    if sync:
+        sync_pr_index(owner, repo, token, pr_count=pr_count)
+
+    if RANKER == "profiles":
+        return get_default_profiles().top_authors(full_name, keyword_doc, top_n=top_n)
 
+    # only the postings of the keywords are read
+    scores = get_default_index().score(full_name, keyword_doc)
+    return top_authors(scores, top_n)
 
+
+@metrics.timed("pr_ranking")
+def find_contributors_partial(owner, repo, keywords, pr_count=500, top_n=5):
+    """
+    `find_contributors_for_keywords` for when the PR sync did not finish in
+    time: nothing is fetched or written to the index. The on-disk index (or
+    the profiles) is used as it is, or, before the first sync has completed,
+    the PRs stored so far are indexed in memory.
+    """
+    full_name = f"{owner}/{repo}"
+    keyword_doc = keyword_tokens(keywords)
+    if RANKER == "profiles" and get_default_profiles().stats(full_name)[0] > 0:
+        return get_default_profiles().top_authors(full_name, keyword_doc, top_n=top_n)
+    index = get_default_index()
+    if index.stats(full_name)[0] > 0:
+        return top_authors(index.score(full_name, keyword_doc), top_n)
+
+    # indexing a partial sync on disk would move its high-water mark past the PRs still missing
+    partial = BM25Index(":memory:")
+    try:
+        partial.add_pulls(full_name, get_default_store().get_pulls(full_name, state="closed", limit=pr_count),
+                          token_cache=get_default_token_cache())
+        return top_authors(partial.score(full_name, keyword_doc), top_n)
+    finally:
+        partial.close()
+
+
+def top_authors(scores, top_n=5):
+    """The top_n authors by summed score, from a `BM25Index.score` result."""
     author_scores = {}
-    for author, score in zip(authors, scores):
+    for score, author in scores.values():
         author_scores[author] = author_scores.get(author, 0.0) + score
 
-
     top = sorted(author_scores.items(), key=lambda kv: kv[1], reverse=True)[:top_n]
     return [author for author, _ in top]
+
+
+_pr_syncs = SingleFlight()
+
+
+def sync_pr_index(owner, repo, token, pr_count=500):
+    """
+    Bring the PR store and the on-disk BM25 index (or the contributor
+    profiles) up to date; only PRs that changed since the last run are
+    fetched and (re-)indexed. Needs no keywords, so it can run while they are
+    being extracted. A sync of the repository already in flight (e.g. left
+    running by a request that ran out of time) is joined, not repeated.
+    """
+    def sync():
+        store = get_default_store()
+        sync_closed_pulls(owner, repo, token=token, pr_count=pr_count, store=store)
+        if RANKER == "profiles":
+            update_profiles(owner, repo, token, store)
+        else:
+            update_index_from_store(get_default_index(), store, f"{owner}/{repo}")
+
+    _pr_syncs.do((owner, repo), sync)
+
+
+def update_profiles(owner, repo, token, store=None):
+    """Fold what the store (or the git mirror, when in use) has gained since the last update into the profiles."""
+    store = store or get_default_store()
+    mirror = get_mirror(owner, repo, token) if COMMITS_BACKEND == "mirror" else None
+    update_profiles_from_store(
+        get_default_profiles(), store, f"{owner}/{repo}", token_cache=get_default_token_cache(), mirror=mirror,
+        resolve_logins=lambda commits: resolve_commit_logins(owner, repo, commits, token=token, store=store))
+
+
+def keyword_tokens(keywords):
+    """Query tokens for a list of extracted keywords, as used by `find_contributors`."""
+    return tokenize(" ".join(set(keywords)))
+
+
+def find_contributors_batch(owner, repo, token, keyword_lists, pr_count=500, top_n=5):
+    """
+    `find_contributors` for many issues at once.
+
+    The PRs are synced once and memory-mapped as a columnar `Corpus`, then all
+    issues are scored together with a sparse matrix product (see `BatchScorer`).
+
+    :param keyword_lists: List of keyword lists, one per issue
+    :return:              List of top_n contributor lists, in the same order
+    """
+    from source.batch_scoring import BatchScorer
+    from source.corpus import load_corpus
+
+    full_name = f"{owner}/{repo}"
+    store = get_default_store()
+    sync_closed_pulls(owner, repo, token=token, pr_count=pr_count, store=store)
+
+    if RANKER == "profiles":
+        update_profiles(owner, repo, token, store)
+        scorer = get_default_profiles().scorer(full_name)
+        return scorer.top_authors([keyword_tokens(k) for k in keyword_lists], top_n=top_n)
+
+    scorer = BatchScorer.from_corpus(load_corpus(store, full_name, get_default_token_cache()))
+    return scorer.top_authors([keyword_tokens(k) for k in keyword_lists], top_n=top_n)
@@ -0,0 +1,212 @@
+import base64
+import os
+import re
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+DEFAULT_MIRROR_DIR = os.path.join(os.getcwd(), "outputs", "mirrors")
+# don't fetch again if the mirror was updated less than this many seconds ago
+FETCH_INTERVAL = int(os.getenv("GIT_RECOMMEND_MIRROR_FETCH_INTERVAL", "300"))
+
+# GitHub's noreply addresses carry the login: "12345+login@users.noreply.github.com"
+NOREPLY_PATTERN = re.compile(r"^(?:\d+\+)?([^@]+)@users\.noreply\.github\.com$", re.IGNORECASE)
+
+# what `update` fetches: the branches, not tags or the refs/pull/* of every pull request
+_HEADS_REFSPEC = "+refs/heads/*:refs/heads/*"
+
+_FIELD = "\x1f"
+_RECORD = "\x1e"
+
+
+def login_from_email(email):
+    match = NOREPLY_PATTERN.match(email or "")
+    return match.group(1) if match else None
+
+
+class GitMirror:
+    """
+    Bare local mirror of a GitHub repository used to answer "which commits
+    touched these paths, by whom and when" with `git log`, instead of one
+    `/commits?path=` API call per path.
+
+    The mirror is a bare clone of the branches only, made on first use and
+    brought up to date with an incremental `git fetch` (at most once every
+    FETCH_INTERVAL seconds).
+
+    Git only knows author names and e-mails, so the GitHub login is taken
+    from noreply addresses when possible and is None otherwise; records keep
+    the author's `email` so callers can resolve it (see `resolve_commit_logins`).
+
+    The token is only handed to `clone` and `fetch`, through `GIT_CONFIG_*`
+    environment variables, so it never shows up on a command line.
+    """
+
+    def __init__(self, owner, repo, token=None, base_dir=DEFAULT_MIRROR_DIR, url=None, max_workers=8):
+        self.owner = owner
+        self.repo = repo
+        self.token = token
+        self.url = url or f"https://github.com/{owner}/{repo}.git"
+        self.path = os.path.abspath(os.path.join(base_dir, owner, f"{repo}.git"))
+        self.max_workers = max_workers
+        self._lock = threading.Lock()
+        self._ready = False
+
+    def _auth_env(self):
+        """Environment passing the token as an HTTP header to git, for commands that talk to GitHub."""
+        if not (self.token and self.url.startswith("https://")):
+            return None
+        basic = base64.b64encode(f"x-access-token:{self.token}".encode()).decode()
+        return {**os.environ, "GIT_CONFIG_COUNT": "1", "GIT_CONFIG_KEY_0": "http.extraHeader",
+                "GIT_CONFIG_VALUE_0": f"Authorization: Basic {basic}"}
+
+    def _git(self, *args, cwd=None, auth=False):
+        env = self._auth_env() if auth else None
+        result = subprocess.run(["git", *args], cwd=cwd or self.path, capture_output=True, text=True, env=env)
+        if result.returncode != 0:
+            raise Exception(f"git {args[0]} failed: {result.stderr.strip()}")
+        return result.stdout
+
+    def update(self, force=False):
+        """Clone the mirror if it does not exist yet, otherwise fetch what is new."""
+        with self._lock:
+            if not os.path.isdir(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                # branches only: a --mirror clone would also fetch every refs/pull/* of the repository
+                self._git("clone", "--bare", "--no-tags", "--quiet", self.url, self.path,
+                          cwd=os.path.dirname(self.path), auth=True)
+                self._git("config", "remote.origin.fetch", _HEADS_REFSPEC)
+            else:
+                stamp = os.path.join(self.path, "FETCH_HEAD")
+                age = time.time() - os.path.getmtime(stamp) if os.path.exists(stamp) else None
+                if force or age is None or age > FETCH_INTERVAL:
+                    # also narrows mirrors cloned with --mirror by earlier versions
+                    self._git("config", "remote.origin.fetch", _HEADS_REFSPEC)
+                    self._git("fetch", "--prune", "--no-tags", "--quiet", "origin", auth=True)
+            self._ready = True
+
+    def _ensure(self):
+        if not self._ready:
+            self.update()
+
+    def path_commits(self, path, limit=None):
+        """
+        Commits on the default branch touching `path`, newest first, as
+        `{sha, login, name, email, date, message}` records (date in UTC ISO
+        8601, message the subject line).
+        """
+        self._ensure()
+        args = ["log", f"--format={_LOG_FORMAT}", "HEAD"]
+        if limit:
+            args.insert(1, f"--max-count={limit}")
+        return _parse_log(self._git(*args, "--", path))
+
+    def history(self, since=None):
+        """
+        Every commit on the default branch, newest first, as `path_commits`
+        records with the `paths` they touched. With `since` (a commit SHA),
+        only the commits that are not ancestors of it.
+        """
+        self._ensure()
+        revision = f"{since}..HEAD" if since else "HEAD"
+        return _parse_log(self._git("log", "--name-only", f"--format={_LOG_FORMAT}", revision), with_paths=True)
+
+    def head(self):
+        """SHA of the default branch head."""
+        self._ensure()
+        return self._git("rev-parse", "HEAD").strip()
+
+    def list_files(self, rev="HEAD"):
+        """`[(path, blob_sha, size)]` of every file at `rev`."""
+        self._ensure()
+        files = []
+        for line in self._git("ls-tree", "-r", "-l", "-z", rev).split("\0"):
+            if not line:
+                continue
+            meta, path = line.split("\t", 1)
+            _, kind, sha, size = meta.split()
+            if kind == "blob":
+                files.append((path, sha, int(size)))
+        return files
+
+    def read_blobs(self, shas):
+        """Yield `(sha, bytes)` for the given blob SHAs through one `git cat-file --batch` process."""
+        self._ensure()
+        proc = subprocess.Popen(["git", "cat-file", "--batch"], cwd=self.path,
+                                stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        writer = threading.Thread(target=self._feed, args=(proc.stdin, shas))
+        writer.start()
+        try:
+            while True:
+                header = proc.stdout.readline()
+                if not header:
+                    break
+                parts = header.split()
+                if len(parts) < 3 or parts[1] == b"missing":
+                    continue
+                data = proc.stdout.read(int(parts[2]))
+                proc.stdout.read(1)  # trailing newline
+                yield parts[0].decode(), data
+        finally:
+            writer.join()
+            proc.stdout.close()
+            proc.wait()
+
+    @staticmethod
+    def _feed(stdin, shas):
+        try:
+            for sha in shas:
+                stdin.write(sha.encode() + b"\n")
+        finally:
+            stdin.close()
+
+    def paths_commits(self, paths, limit=None):
+        """`path_commits` for several paths, run as parallel `git log` processes."""
+        self._ensure()
+        paths = list(paths)
+        if len(paths) <= 1:
+            return [self.path_commits(p, limit) for p in paths]
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(paths))) as pool:
+            return list(pool.map(lambda p: self.path_commits(p, limit), paths))
+
+
+_LOG_FORMAT = f"{_RECORD}%H{_FIELD}%an{_FIELD}%ae{_FIELD}%at{_FIELD}%s"
+
+
+def _parse_log(out, with_paths=False):
+    commits = []
+    for record in out.split(_RECORD):
+        record = record.strip()
+        if not record:
+            continue
+        header, _, files = record.partition("\n")
+        sha, name, email, timestamp, message = header.split(_FIELD, 4)
+        date = datetime.fromtimestamp(int(timestamp), tz=timezone.utc)
+        commit = {
+            'sha': sha,
+            'login': login_from_email(email),
+            'name': name,
+            'email': email,
+            'date': date.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            'message': message,
+        }
+        if with_paths:
+            commit['paths'] = [line for line in files.splitlines() if line]
+        commits.append(commit)
+    return commits
+
+
+_mirrors = {}
+_mirrors_lock = threading.Lock()
+
+
+def get_mirror(owner, repo, token=None):
+    """Shared mirror per repository. The location can be overridden with GIT_RECOMMEND_MIRROR_DIR."""
+    with _mirrors_lock:
+        key = (owner, repo)
+        if key not in _mirrors:
+            _mirrors[key] = GitMirror(owner, repo, token=token,
+                                      base_dir=os.getenv("GIT_RECOMMEND_MIRROR_DIR", DEFAULT_MIRROR_DIR))
+        return _mirrors[key]
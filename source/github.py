@@ -1,36 +1,357 @@
-import requests
+import os
+
+from source import metrics
+from source.bot_classifier import get_default_classifier
+from source.git_mirror import get_mirror
+from source.github_client import get_client
+from source.github_graphql import fetch_paths_history, iter_closed_pull_pages
+from source.store import get_default_store
+
+# How closed PRs and path histories are fetched: "graphql" (needs a token),
+# "rest", or "auto" = GraphQL when a token is set, falling back to REST on errors.
+BACKEND = os.getenv("GIT_RECOMMEND_BACKEND", "auto")
+# Where per-path commit histories come from: "api" (the backend above) or
+# "mirror" (`git log` on a local bare clone, see source/git_mirror.py).
+COMMITS_BACKEND = os.getenv("GIT_RECOMMEND_COMMITS_BACKEND", "api")
+
+
+def _issue_record(issue):
+    return {
+        'number': issue['number'],
+        'state': issue['state'],
+        'title': issue['title'],
+        'body': issue.get('body', ''),
+        'created_at': issue['created_at'],
+        'updated_at': issue.get('updated_at'),
+        'user': issue['user']['login'],
+        'labels': [label['name'] for label in issue.get('labels', [])]
+    }
+
+
+def _pull_record(pr):
+    return {
+        'number': pr['number'],
+        'state': pr['state'],
+        'title': pr.get('title', ''),
+        'body': pr.get('body'),
+        'user': pr['user']['login'],
+        'user_type': pr['user'].get('type'),
+        'updated_at': pr['updated_at'],
+    }
+
+
+def _use_graphql(token):
+    return BACKEND == "graphql" or (BACKEND == "auto" and bool(token))
 
-def list_github_issues(owner, repo, token=None, state='open'):
-    """Fetch issues from GitHub repo."""
-    api_url = f"https://api.github.com/repos/{owner}/{repo}/issues"
-    headers = {'Authorization': f'token {token}'} if token else {}
-    params = {'state': state, 'per_page': 100}
 
-    all_issues = []
-    page = 1
+def _commit_record(c):
+    author_info = c.get("author")
+    return {
+        'sha': c['sha'],
+        'login': author_info["login"] if author_info else None,
+        'name': c["commit"]["author"]["name"],
+        'date': c["commit"]["author"]["date"],
+        'message': (c["commit"].get("message") or "").split("\n", 1)[0],
+    }
 
-    while True:
-        params['page'] = page
-        response = requests.get(api_url, headers=headers, params=params)
+
+@metrics.timed("issue_list")
+def sync_issues(owner, repo, token=None, state='open', store=None):
+    """
+    Bring the local issue store up to date.
+
+    The first sync pages through every issue in `state`. Later syncs ask for
+    issues of any state updated since the last high-water mark, so issues that
+    were closed in the meantime are picked up too.
+    """
+    store = store or get_default_store()
+    full_name = f"{owner}/{repo}"
+    resource = f"issues:{state}"
+    high_water, _ = store.get_sync_state(full_name, resource)
+
+    if high_water:
+        params = {'state': 'all', 'since': high_water, 'sort': 'updated', 'direction': 'asc', 'per_page': 100}
+    else:
+        params = {'state': state, 'per_page': 100}
+
+    responses = get_client(token).get_all_pages(f"/repos/{owner}/{repo}/issues", params)
+    for response in responses:
         if response.status_code != 200:
             raise Exception(f"Failed to fetch issues: {response.status_code} {response.reason}\n{response.text}")
 
         issues = response.json()
-        if not issues:
-            break
-
         for issue in issues:
-            if 'pull_request' in issue:
-                continue
-            all_issues.append({
-                'number': issue['number'],
-                'state': issue['state'],
-                'title': issue['title'],
-                'body': issue.get('body', ''),
-                'created_at': issue['created_at'],
-                'user': issue['user']['login'],
-                'labels': [label['name'] for label in issue.get('labels', [])]
-            })
-        page += 1
-
-    return all_issues
+            if issue.get('updated_at') and (high_water is None or issue['updated_at'] > high_water):
+                high_water = issue['updated_at']
+
+        store.upsert_issues(full_name, [_issue_record(i) for i in issues if 'pull_request' not in i])
+
+    store.set_sync_state(full_name, resource, high_water)
+
+
+def list_github_issues(owner, repo, token=None, state='open', store=None):
+    """Fetch issues from GitHub repo."""
+    store = store or get_default_store()
+    sync_issues(owner, repo, token=token, state=state, store=store)
+    return store.get_issues(f"{owner}/{repo}", state=state)
+
+
+@metrics.timed("issue_fetch")
+def get_github_issue(owner, repo, number, token=None, store=None):
+    """
+    Fetch a single issue with `GET /issues/{number}`, independent of how many
+    issues the repository has, and keep it in the store.
+
+    :return: The issue record, or None if there is no such issue or `number` is a pull request
+    """
+    response = get_client(token).get(f"/repos/{owner}/{repo}/issues/{number}")
+    if response.status_code in (404, 410):
+        return None
+    if response.status_code != 200:
+        raise Exception(f"Failed to fetch issue #{number}: {response.status_code} {response.reason}\n{response.text}")
+
+    issue = response.json()
+    if 'pull_request' in issue:
+        return None
+    record = _issue_record(issue)
+    (store or get_default_store()).upsert_issues(f"{owner}/{repo}", [record])
+    return record
+
+
+def iter_github_issues(owner, repo, token=None, state='open', store=None):
+    """`list_github_issues` as a generator, without building the whole list."""
+    store = store or get_default_store()
+    sync_issues(owner, repo, token=token, state=state, store=store)
+    yield from store.iter_issues(f"{owner}/{repo}", state=state)
+
+
+@metrics.timed("pr_fetch")
+def sync_closed_pulls(owner, repo, token=None, pr_count=500, store=None):
+    """
+    Bring the local store of closed PRs up to date.
+
+    `/pulls` has no `since` filter, so PRs are paged newest-updated first and
+    paging stops at the first PR that is not newer than the high-water mark.
+    The first sync (or one asking for more PRs than were ever fetched) pulls
+    the latest `pr_count` PRs.
+
+    Each page is stored as soon as it arrives, so a sync that is cut short
+    (see `recommend_issue`'s deadline) leaves a usable partial corpus; the
+    high-water mark only moves once the sync has completed.
+    """
+    store = store or get_default_store()
+    full_name = f"{owner}/{repo}"
+    high_water, depth = store.get_sync_state(full_name, "pulls:closed")
+    if depth < pr_count:
+        high_water = None
+
+    new_high_water = None
+
+    def save(batch):
+        nonlocal new_high_water
+        if batch and new_high_water is None:
+            new_high_water = batch[0]['updated_at']
+        store.upsert_pulls(full_name, batch)
+
+    done = False
+    if _use_graphql(token):
+        try:
+            for batch in _closed_pull_batches_graphql(owner, repo, token, pr_count, high_water):
+                save(batch)
+            done = True
+        except Exception:
+            if BACKEND == "graphql":
+                raise
+            new_high_water = None
+    if not done:
+        for batch in _closed_pull_batches_rest(owner, repo, token, pr_count, high_water):
+            save(batch)
+
+    store.set_sync_state(full_name, "pulls:closed", new_high_water or high_water, max(depth, pr_count))
+    # authors the API reports as bots are filtered out whatever their login
+    get_default_classifier().add_bots(store.get_bot_logins(full_name))
+
+
+def _closed_pull_batches_rest(owner, repo, token, pr_count, high_water):
+    """Pages of PRs as they are fetched."""
+    client = get_client(token)
+    path = f"/repos/{owner}/{repo}/pulls"
+    params = {
+        "state":      "closed",
+        "per_page":   100,
+        "sort":       "updated",
+        "direction":  "desc"
+    }
+
+    if high_water:
+        # usually a single page: keep going only while every PR on it is new
+        page = 1
+        while True:
+            r = client.get(path, params={**params, "page": page})
+            r.raise_for_status()
+            batch = r.json()
+            fresh = [pr for pr in batch if pr['updated_at'] > high_water]
+            yield [_pull_record(pr) for pr in fresh]
+            if not batch or len(fresh) < len(batch):
+                return
+            page += 1
+    else:
+        # the number of pages is known up front, so fetch them concurrently; each one is
+        # still handed out as soon as it and the ones before it have arrived
+        pages = range(1, (pr_count + params["per_page"] - 1) // params["per_page"] + 1)
+
+        def fetch(page):
+            return client.get(path, params={**params, "page": page})
+
+        for r in client.imap(fetch, pages):
+            r.raise_for_status()
+            yield [_pull_record(pr) for pr in r.json()]
+
+
+def _closed_pull_batches_graphql(owner, repo, token, pr_count, high_water):
+    """Pages of PRs as they are fetched (the cursor makes them sequential anyway)."""
+    fetched = 0
+    for batch in iter_closed_pull_pages(owner, repo, token, page_size=min(pr_count, 100)):
+        if high_water:
+            fresh = [pr for pr in batch if pr['updated_at'] > high_water]
+            yield fresh
+            if len(fresh) < len(batch):
+                return
+        else:
+            yield batch
+            fetched += len(batch)
+            if fetched >= pr_count:
+                return
+
+
+def list_closed_pulls(owner, repo, token=None, pr_count=500, store=None):
+    """The `pr_count` most recently updated closed PRs, synced incrementally."""
+    store = store or get_default_store()
+    sync_closed_pulls(owner, repo, token=token, pr_count=pr_count, store=store)
+    return store.get_pulls(f"{owner}/{repo}", state="closed", limit=pr_count)
+
+
+def _path_sync_state(store, full_name, path, commit_limit):
+    high_water, depth = store.get_sync_state(full_name, f"commits:{path}")
+    if depth < commit_limit:
+        high_water = None
+    return high_water, depth
+
+
+def _save_path_commits(store, full_name, path, commits, high_water, depth, commit_limit):
+    store.upsert_commits(full_name, path, commits)
+    for c in commits:
+        if high_water is None or c['date'] > high_water:
+            high_water = c['date']
+    store.set_sync_state(full_name, f"commits:{path}", high_water, max(depth, commit_limit))
+
+
+def sync_path_commits(owner, repo, path, token=None, commit_limit=100, store=None):
+    """
+    Bring the stored commit history of `path` up to date. Only the first sync
+    fetches `commit_limit` commits; later ones ask for every commit `since`
+    the newest one already stored, page after page.
+    """
+    store = store or get_default_store()
+    full_name = f"{owner}/{repo}"
+    high_water, depth = _path_sync_state(store, full_name, path, commit_limit)
+    client = get_client(token)
+
+    if high_water:
+        responses = client.iter_pages(f"/repos/{owner}/{repo}/commits",
+                                      {"path": path, "per_page": 100, "since": high_water})
+    else:
+        responses = [client.get(f"/repos/{owner}/{repo}/commits", params={"path": path, "per_page": commit_limit})]
+    commits = []
+    for resp in responses:
+        resp.raise_for_status()
+        commits.extend(_commit_record(c) for c in resp.json())
+    _save_path_commits(store, full_name, path, commits, high_water, depth, commit_limit)
+
+
+def sync_paths_commits_graphql(owner, repo, paths, token=None, commit_limit=100, store=None):
+    """`sync_path_commits` for several paths at once, batched into aliased GraphQL queries."""
+    store = store or get_default_store()
+    full_name = f"{owner}/{repo}"
+    states = {path: _path_sync_state(store, full_name, path, commit_limit) for path in paths}
+
+    path_specs = [(path, high_water, commit_limit) for path, (high_water, _) in states.items()]
+    histories = fetch_paths_history(owner, repo, path_specs, token=token)
+    for path, (high_water, depth) in states.items():
+        _save_path_commits(store, full_name, path, histories.get(path, []), high_water, depth, commit_limit)
+
+
+def list_path_commits(owner, repo, path, token=None, commit_limit=100, store=None):
+    """Newest `commit_limit` commits touching `path` as `{sha, login, name, date}` dicts."""
+    store = store or get_default_store()
+    sync_path_commits(owner, repo, path, token=token, commit_limit=commit_limit, store=store)
+    return store.get_commits(f"{owner}/{repo}", path, limit=commit_limit)
+
+
+def resolve_commit_logins(owner, repo, commits, token=None, store=None):
+    """
+    Fill in the GitHub login of git mirror commit records whose author e-mail
+    did not give it away. Each unknown e-mail costs one `GET /commits/{sha}`
+    for one of its commits; the answer, including "no GitHub account", is
+    kept in the store. Records that stay without a login are left as they are.
+    """
+    store = store or get_default_store()
+    full_name = f"{owner}/{repo}"
+    pending = {}
+    for c in commits:
+        if c['login'] is None and c.get('email'):
+            pending.setdefault(c['email'], c['sha'])
+    if not pending:
+        return commits
+
+    known = store.get_email_logins(full_name, pending)
+    missing = [(email, sha) for email, sha in pending.items() if email not in known]
+    if missing:
+        client = get_client(token)
+
+        def lookup(item):
+            email, sha = item
+            response = client.get(f"/repos/{owner}/{repo}/commits/{sha}")
+            if response.status_code != 200:
+                return email, None, response.status_code in (404, 422)
+            author = response.json().get("author")
+            return email, author["login"] if author else None, True
+
+        found = {email: login for email, login, final in client.map(lookup, missing) if final}
+        store.set_email_logins(full_name, found)
+        known.update(found)
+
+    for c in commits:
+        if c['login'] is None and c.get('email'):
+            c['login'] = known.get(c['email'])
+    return commits
+
+
+@metrics.timed("commit_fetch")
+def list_paths_commits(owner, repo, paths, token=None, commit_limit=100, store=None):
+    """
+    `list_path_commits` for several paths. Returns one list per path. Uses
+    parallel `git log` on the local mirror, one GraphQL query per batch of
+    paths, or concurrent REST calls. With the mirror, `commit_limit=None`
+    returns the full history, and authors get their logins from
+    `resolve_commit_logins`.
+    """
+    store = store or get_default_store()
+    if COMMITS_BACKEND == "mirror":
+        histories = get_mirror(owner, repo, token).paths_commits(paths, limit=commit_limit)
+        resolve_commit_logins(owner, repo, [c for commits in histories for c in commits], token=token, store=store)
+        return histories
+
+    full_name = f"{owner}/{repo}"
+
+    if _use_graphql(token) and paths:
+        try:
+            sync_paths_commits_graphql(owner, repo, paths, token=token, commit_limit=commit_limit, store=store)
+            return [store.get_commits(full_name, path, limit=commit_limit) for path in paths]
+        except Exception:
+            if BACKEND == "graphql":
+                raise
+
+    def fetch(path):
+        return list_path_commits(owner, repo, path, token=token, commit_limit=commit_limit, store=store)
+    return get_client(token).map(fetch, paths)
@@ -0,0 +1,181 @@
+import hashlib
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from source import metrics
+from source.http_cache import get_default_cache
+from source.rate_limit import RateLimitScheduler, resource_for, tokens_from_env
+
+API_URL = os.getenv("GITHUB_API_URL", "https://api.github.com").rstrip("/")
+DEFAULT_MAX_WORKERS = int(os.getenv("GIT_RECOMMEND_MAX_WORKERS", "8"))
+MAX_RETRIES = 3
+
+
+class GitHubClient:
+    """
+    Shared GitHub REST client.
+
+    All requests go through one `requests.Session` whose connection pool is
+    sized for `max_workers` parallel requests, so connections are kept alive
+    across calls instead of being re-opened for every page. Responses go through
+    the on-disk conditional-request cache when one is configured; requests that
+    do reach GitHub are budgeted by a `RateLimitScheduler`, which picks the
+    token to send them with and waits out rate limits.
+
+    :param token:     GitHub token, or a list of tokens to spread requests over
+    """
+
+    def __init__(self, token=None, max_workers=DEFAULT_MAX_WORKERS, cache=None, api_url=API_URL, scheduler=None):
+        self.api_url = api_url
+        self.max_workers = max(1, max_workers)
+        self.cache = cache
+        tokens = token if isinstance(token, (list, tuple)) else [token]
+        self.identity = client_identity(tokens)
+        self.scheduler = scheduler or RateLimitScheduler(tokens)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.max_workers)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({
+            "Accept":               "application/vnd.github+json",
+            "Accept-Encoding":      "gzip",
+            "X-GitHub-Api-Version": "2022-11-28",
+        })
+
+    def url(self, path):
+        """Turn an API path like `/repos/o/r/pulls` into a full URL."""
+        if path.startswith("http://") or path.startswith("https://"):
+            return path
+        return self.api_url + path
+
+    def _send(self, url, headers=None, params=None, method="GET", json=None):
+        """Send one request with a scheduled token, retrying after rate-limit rejections."""
+        resource = resource_for(url)
+        for attempt in range(MAX_RETRIES + 1):
+            token = self.scheduler.acquire(resource)
+            request_headers = dict(headers or {})
+            if token:
+                request_headers["Authorization"] = f"Bearer {token}"
+            response = self.session.request(method, url, headers=request_headers, params=params, json=json)
+            retry_after = self.scheduler.record(token, resource, response)
+            metrics.record_response(resource, response)
+            if retry_after is None or attempt == MAX_RETRIES:
+                return response
+        return response
+
+    def get(self, path, params=None, headers=None):
+        url = self.url(path)
+        if self.cache is None:
+            return self._send(url, headers=headers, params=params)
+        return self.cache.get(url, headers=headers, params=params, send=self._send, identity=self.identity)
+
+    def post(self, path, json=None, headers=None):
+        """POST (e.g. a GraphQL query). Never cached."""
+        return self._send(self.url(path), headers=headers, method="POST", json=json)
+
+    def remaining(self, resource="core"):
+        """Requests left in the `resource` bucket (core, search, code_search, graphql) over all tokens."""
+        return self.scheduler.remaining(resource)
+
+    def map(self, fn, items):
+        """`[fn(item) for item in items]`, run on up to `max_workers` threads."""
+        items = list(items)
+        if len(items) <= 1 or self.max_workers == 1:
+            return [fn(item) for item in items]
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(items))) as pool:
+            return list(pool.map(fn, items))
+
+    def imap(self, fn, items):
+        """Like `map`, but yields each result, in order, as soon as it (and the ones before it) is done."""
+        items = list(items)
+        if len(items) <= 1 or self.max_workers == 1:
+            for item in items:
+                yield fn(item)
+            return
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(items))) as pool:
+            yield from pool.map(fn, items)
+
+    def get_pages(self, path, params, pages):
+        """Fetch the given page numbers of a paginated endpoint concurrently, in order."""
+        def fetch(page):
+            return self.get(path, params={**params, "page": page})
+        return self.map(fetch, pages)
+
+    def get_all_pages(self, path, params):
+        """
+        Fetch every page of a paginated endpoint. The first page is fetched
+        alone; its `Link: rel="last"` header tells how many pages there are, and
+        the rest are then fetched concurrently.
+
+        :return: list of responses, one per page, in page order
+        """
+        first = self.get(path, params={**params, "page": 1})
+        last = last_page(first)
+        if first.status_code != 200 or last <= 1:
+            return [first]
+        return [first] + self.get_pages(path, params, range(2, last + 1))
+
+
+    def iter_pages(self, path, params):
+        """
+        Fetch the pages of a paginated endpoint one after the other, following
+        `Link: rel="next"` until there is none; for endpoints (such as commit
+        lists) whose length is not known up front. Yields the responses.
+        """
+        page = 1
+        while page is not None:
+            response = self.get(path, params={**params, "page": page})
+            yield response
+            page = next_page(response) if response.status_code == 200 else None
+
+
+def client_identity(tokens):
+    """
+    Cache identity of a set of tokens: a hash, so tokens never reach the cache
+    files. Requests are spread over all tokens of a client, so they share it.
+    """
+    tokens = sorted(t for t in tokens if t)
+    if not tokens:
+        return "anonymous"
+    return hashlib.sha256("\n".join(tokens).encode("utf-8")).hexdigest()[:32]
+
+
+def last_page(response):
+    """Page number of the `rel="last"` link, or 1 when there is none."""
+    return _link_page(response, "last") or 1
+
+
+def next_page(response):
+    """Page number of the `rel="next"` link, or None on the last page."""
+    return _link_page(response, "next")
+
+
+def _link_page(response, rel):
+    link = response.links.get(rel) if response.headers.get("Link") else None
+    if not link:
+        return None
+    page = parse_qs(urlparse(link["url"]).query).get("page")
+    return int(page[0]) if page else None
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(token=None):
+    """
+    Shared client per token, so every stage reuses the same connection pool and
+    rate-limit budget. Extra tokens listed in GITHUB_TOKENS join the pool.
+    """
+    with _clients_lock:
+        client = _clients.get(token)
+        if client is None:
+            client = GitHubClient(tokens_from_env(token), cache=get_default_cache())
+            _clients[token] = client
+        return client
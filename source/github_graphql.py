@@ -0,0 +1,122 @@
+from source.github_client import get_client
+
+# GraphQL connections return at most 100 nodes per page
+PAGE_SIZE = 100
+# paths whose histories are fetched together in one aliased query
+PATHS_PER_QUERY = 10
+
+CLOSED_PULLS_QUERY = """
+query($owner: String!, $name: String!, $first: Int!, $after: String) {
+  repository(owner: $owner, name: $name) {
+    pullRequests(states: [CLOSED, MERGED], first: $first, after: $after,
+                 orderBy: {field: UPDATED_AT, direction: DESC}) {
+      pageInfo { hasNextPage endCursor }
+      nodes {
+        number
+        title
+        body
+        updatedAt
+        author { login __typename }
+      }
+    }
+  }
+}
+"""
+
+
+def run_query(query, variables, token=None):
+    """Run a GraphQL query and return its `data`. GraphQL errors are raised."""
+    response = get_client(token).post("/graphql", json={"query": query, "variables": variables})
+    response.raise_for_status()
+    payload = response.json()
+    if payload.get("errors"):
+        messages = "; ".join(e.get("message", "") for e in payload["errors"])
+        raise Exception(f"GraphQL query failed: {messages}")
+    return payload["data"]
+
+
+def _pull_record(node):
+    author = node.get("author") or {}
+    return {
+        'number': node['number'],
+        'state': 'closed',
+        'title': node.get('title', ''),
+        'body': node.get('body'),
+        'user': author.get('login', 'ghost'),
+        'user_type': author.get('__typename'),
+        'updated_at': node['updatedAt'],
+    }
+
+
+def iter_closed_pull_pages(owner, repo, token=None, page_size=PAGE_SIZE):
+    """
+    Yield pages of closed (and merged) PRs, most recently updated first, as
+    store records. Only the fields the rankers use are requested, instead of
+    the full REST objects with their nested head/base repositories.
+    """
+    after = None
+    while True:
+        data = run_query(CLOSED_PULLS_QUERY, {"owner": owner, "name": repo, "first": page_size, "after": after}, token)
+        connection = data["repository"]["pullRequests"]
+        yield [_pull_record(node) for node in connection["nodes"]]
+        if not connection["pageInfo"]["hasNextPage"]:
+            return
+        after = connection["pageInfo"]["endCursor"]
+
+
+def _paths_history_query(count):
+    params = ", ".join(f"$path{i}: String!, $since{i}: GitTimestamp, $first{i}: Int!" for i in range(count))
+    fields = "\n".join(
+        f"        p{i}: history(path: $path{i}, since: $since{i}, first: $first{i}) "
+        "{ nodes { oid messageHeadline author { name date user { login } } } }"
+        for i in range(count))
+    return f"""
+query($owner: String!, $name: String!, {params}) {{
+  repository(owner: $owner, name: $name) {{
+    defaultBranchRef {{
+      target {{
+        ... on Commit {{
+{fields}
+        }}
+      }}
+    }}
+  }}
+}}
+"""
+
+
+def _commit_record(node):
+    author = node.get("author") or {}
+    user = author.get("user") or {}
+    return {
+        'sha': node['oid'],
+        'login': user.get('login'),
+        'name': author.get('name'),
+        'date': author.get('date'),
+        'message': node.get('messageHeadline'),
+    }
+
+
+def fetch_paths_history(owner, repo, path_specs, token=None):
+    """
+    Commit histories of several paths, `PATHS_PER_QUERY` paths per aliased query.
+
+    :param path_specs: List of `(path, since, limit)`; `since` may be None
+    :return:           Dict path -> list of commit records, newest first
+    """
+    histories = {}
+    for start in range(0, len(path_specs), PATHS_PER_QUERY):
+        chunk = path_specs[start:start + PATHS_PER_QUERY]
+        variables = {"owner": owner, "name": repo}
+        for i, (path, since, limit) in enumerate(chunk):
+            variables[f"path{i}"] = path
+            variables[f"since{i}"] = since
+            variables[f"first{i}"] = min(limit, PAGE_SIZE)
+
+        data = run_query(_paths_history_query(len(chunk)), variables, token)
+        ref = data["repository"]["defaultBranchRef"]
+        target = ref["target"] if ref else {}
+        for i, (path, _, _) in enumerate(chunk):
+            nodes = (target.get(f"p{i}") or {}).get("nodes", [])
+            histories[path] = [_commit_record(n) for n in nodes]
+    return histories
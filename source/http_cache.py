@@ -0,0 +1,253 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from source import metrics
+
+DEFAULT_CACHE_DIR = os.path.join(os.getcwd(), "outputs", ".http_cache")
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024  # 256 MiB
+# eviction goes down to this share of max_bytes, so that it does not run again on the next store
+EVICT_TO = 0.9
+
+# How long (in seconds) a cached response is served without even asking GitHub.
+# Once it is older than this, the request is revalidated with If-None-Match /
+# If-Modified-Since, and a 304 answer is served from disk.
+DEFAULT_TTLS = [
+    (re.compile(r"/search/code$"), 3600),
+    (re.compile(r"/repos/[^/]+/[^/]+/commits$"), 600),
+    (re.compile(r"/repos/[^/]+/[^/]+/pulls$"), 300),
+    (re.compile(r"/repos/[^/]+/[^/]+/issues(/\d+)?$"), 60),
+]
+DEFAULT_TTL = 0
+
+
+def _write_atomic(path, data):
+    """
+    Write `data` to a temporary file next to `path` and rename it over `path`,
+    so concurrent readers see the old file or the new one, never a partial one.
+    """
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+class ResponseCache:
+    """
+    On-disk cache of GitHub API responses keyed by URL, query params and the
+    identity the request was made with (see `GitHubClient.identity`), so a
+    response fetched with one token is never served to another.
+
+    Every entry is stored as two files under `cache_dir`: `<key>.json` with the
+    validators (ETag / Last-Modified) and headers, and `<key>.body` with the raw
+    response body, each written to a temporary file and renamed into place. The
+    total body size is kept as a running count (taken from the directory once);
+    when a store takes it over `max_bytes`, the least recently used entries are
+    evicted.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES, ttls=None, default_ttl=DEFAULT_TTL):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.ttls = DEFAULT_TTLS if ttls is None else ttls
+        self.default_ttl = default_ttl
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+        self._size = None  # total body bytes, counted on the first store
+        self._size_lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def key(self, url, params=None, identity=None):
+        params = sorted((str(k), str(v)) for k, v in (params or {}).items())
+        raw = json.dumps([url, params, identity or ""], separators=(",", ":"))
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def ttl_for(self, url):
+        for pattern, ttl in self.ttls:
+            if pattern.search(url.split("?", 1)[0]):
+                return ttl
+        return self.default_ttl
+
+    def _count(self, counter):
+        with self._stats_lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def _paths(self, key):
+        base = os.path.join(self.cache_dir, key)
+        return base + ".json", base + ".body"
+
+    def lookup(self, url, params=None, identity=None):
+        """Return `(meta, body)` for a cached response, or None."""
+        meta_path, body_path = self._paths(self.key(url, params, identity))
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            with open(body_path, 'rb') as f:
+                body = f.read()
+        except (OSError, ValueError):
+            return None
+        return meta, body
+
+    def store(self, url, params, response, identity=None):
+        headers = response.headers
+        if not (headers.get("ETag") or headers.get("Last-Modified") or self.ttl_for(url)):
+            # nothing to revalidate with and no TTL, so the entry would never be reused
+            return
+
+        meta_path, body_path = self._paths(self.key(url, params, identity))
+        try:
+            replaced = os.path.getsize(body_path)
+        except OSError:
+            replaced = 0
+        meta = {
+            "url": url,
+            "params": {str(k): str(v) for k, v in (params or {}).items()},
+            "status_code": response.status_code,
+            "etag": headers.get("ETag"),
+            "last_modified": headers.get("Last-Modified"),
+            "headers": dict(headers),
+            "stored_at": time.time(),
+        }
+        _write_atomic(body_path, response.content)
+        _write_atomic(meta_path, json.dumps(meta).encode("utf-8"))
+
+        with self._size_lock:
+            if self._size is None:
+                self._size = self._scan()[1]
+            else:
+                self._size += len(response.content) - replaced
+            over = self._size > self.max_bytes
+        if over:
+            self.evict()
+
+    def _touch(self, url, params, meta, identity=None):
+        meta_path, body_path = self._paths(self.key(url, params, identity))
+        _write_atomic(meta_path, json.dumps(meta).encode("utf-8"))
+        os.utime(body_path)
+
+    def _scan(self):
+        """`(entries, total bytes)` of the bodies on disk, entries as `(mtime, size, path)`."""
+        entries = []
+        total = 0
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".body"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+        return entries, total
+
+    def evict(self):
+        """Drop least recently used entries until the cache is back under `max_bytes` (with some room)."""
+        entries, total = self._scan()
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes * EVICT_TO:
+                break
+            for p in (path, path[:-len(".body")] + ".json"):
+                try:
+                    os.remove(p)
+                except OSError:
+                    pass
+            total -= size
+        with self._size_lock:
+            self._size = total
+
+    def clear(self):
+        for name in os.listdir(self.cache_dir):
+            if name.endswith((".body", ".json", ".tmp")):
+                os.remove(os.path.join(self.cache_dir, name))
+        with self._size_lock:
+            self._size = 0
+
+    def stats(self):
+        with self._stats_lock:
+            return {"hits": self.hits, "revalidated": self.revalidated, "misses": self.misses}
+
+    @staticmethod
+    def _build_response(meta, body, extra_headers=None):
+        response = requests.models.Response()
+        response.status_code = meta["status_code"]
+        response.reason = "OK"
+        response._content = body
+        response.headers = CaseInsensitiveDict(meta["headers"])
+        if extra_headers:
+            response.headers.update(extra_headers)
+        response.url = meta["url"]
+        response.encoding = "utf-8"
+        response.from_cache = True
+        return response
+
+    def get(self, url, headers=None, params=None, send=None, identity=None):
+        """
+        Conditional GET through the cache.
+
+        :param url:     Request URL
+        :param headers: Request headers (Authorization, Accept, ...)
+        :param params:  Query params; part of the cache key
+        :param identity: Who the request is made as (e.g. a hash of the token); part of the cache key
+        :param send:    Callable(url, headers=, params=) doing the actual request
+                        (default: `requests.get`)
+        :return:        requests.Response; 304s are turned into the cached 200
+        """
+        send = send or requests.get
+        cached = self.lookup(url, params, identity)
+
+        if cached is not None:
+            meta, body = cached
+            if time.time() - meta["stored_at"] < self.ttl_for(url):
+                self._count("hits")
+                os.utime(self._paths(self.key(url, params, identity))[1])
+                return self._build_response(meta, body)
+
+        request_headers = dict(headers or {})
+        if cached is not None:
+            meta, _ = cached
+            if meta.get("etag"):
+                request_headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                request_headers["If-Modified-Since"] = meta["last_modified"]
+
+        response = send(url, headers=request_headers, params=params)
+
+        if response.status_code == 304 and cached is not None:
+            self._count("revalidated")
+            meta, body = cached
+            meta["stored_at"] = time.time()
+            self._touch(url, params, meta, identity)
+            # keep the fresh rate-limit headers from the 304
+            return self._build_response(meta, body, extra_headers=response.headers)
+
+        self._count("misses")
+        if response.status_code == 200:
+            self.store(url, params, response, identity)
+        return response
+
+
+_default_cache = None
+
+
+def get_default_cache():
+    """
+    Shared cache used by all GitHub fetches. The location can be overridden with
+    GIT_RECOMMEND_CACHE_DIR; set GIT_RECOMMEND_HTTP_CACHE=0 to disable caching.
+    """
+    global _default_cache
+    if os.getenv("GIT_RECOMMEND_HTTP_CACHE", "1") == "0":
+        return None
+    if _default_cache is None:
+        _default_cache = ResponseCache(os.getenv("GIT_RECOMMEND_CACHE_DIR", DEFAULT_CACHE_DIR))
+        metrics.register_cache("http", _default_cache)
+    return _default_cache
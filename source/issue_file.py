@@ -0,0 +1,105 @@
+import json
+import os
+
+
+def index_path(filename):
+    return filename + ".idx"
+
+
+def write_issues_jsonl(issues, filename):
+    """
+    Write issues to a JSON Lines file as they come (any iterable, e.g. a
+    generator over API pages), plus a `<filename>.idx` sidecar mapping each
+    issue number to the byte offset of its line.
+
+    :return: Number of issues written
+    """
+    offsets = {}
+    tmp = filename + ".tmp"
+    with open(tmp, 'wb') as f:
+        for issue in issues:
+            offsets[issue['number']] = f.tell()
+            f.write(json.dumps(issue).encode('utf-8') + b"\n")
+    os.replace(tmp, filename)
+    with open(index_path(filename), 'w', encoding='utf-8') as f:
+        json.dump(offsets, f)
+    return len(offsets)
+
+
+class IssueFile:
+    """
+    Lazy view of a JSON Lines issue file.
+
+    Only the offset index is read up front; `get` seeks straight to one
+    issue's line and iteration parses one line at a time. A missing or
+    outdated index is rebuilt with a single scan of the file.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._offsets = self._load_index()
+
+    def _load_index(self):
+        idx = index_path(self.filename)
+        if os.path.exists(idx) and os.path.getmtime(idx) >= os.path.getmtime(self.filename):
+            with open(idx, encoding='utf-8') as f:
+                return {int(number): offset for number, offset in json.load(f).items()}
+
+        offsets = {}
+        with open(self.filename, 'rb') as f:
+            offset = 0
+            for line in f:
+                if line.strip():
+                    offsets[json.loads(line)['number']] = offset
+                offset += len(line)
+        with open(idx, 'w', encoding='utf-8') as f:
+            json.dump(offsets, f)
+        return offsets
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def __contains__(self, number):
+        return number in self._offsets
+
+    def numbers(self):
+        return list(self._offsets)
+
+    def get(self, number, default=None):
+        offset = self._offsets.get(number)
+        if offset is None:
+            return default
+        with open(self.filename, 'rb') as f:
+            f.seek(offset)
+            return json.loads(f.readline())
+
+    def __iter__(self):
+        with open(self.filename, 'rb') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    def select(self, numbers):
+        """Lazy view of just the issues `numbers` that are in the file, in that order."""
+        return IssueSelection(self, [n for n in numbers if n in self._offsets])
+
+
+class IssueSelection:
+    """Some issues of an `IssueFile`; each one is read with `IssueFile.get` when iterated to."""
+
+    def __init__(self, issue_file, numbers):
+        self.issue_file = issue_file
+        self._numbers = numbers
+
+    def __len__(self):
+        return len(self._numbers)
+
+    def __contains__(self, number):
+        return number in self._numbers
+
+    def numbers(self):
+        return list(self._numbers)
+
+    def __iter__(self):
+        for number in self._numbers:
+            yield self.issue_file.get(number)
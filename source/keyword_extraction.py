@@ -1,53 +1,120 @@
 import json
-import google.generativeai as genai
 import os
+import re
+import threading
 from time import sleep
-from dotenv import load_dotenv
+from source import metrics
+from source.issue_file import IssueFile
 from source.keyword_extraction_prompt import contruct_prompt
+from source.llm_cache import get_default_llm_cache
 from source.print_colors import bcolors
 from source.utils import extract_keywords_from_json_string, print_issue_pretty
-from prettytable import PrettyTable, TableStyle
-
-
-# Load environment variables
-load_dotenv()
-api_key = os.getenv("GOOGLE_API_KEY")
-genai.configure(api_key=api_key)
 
 
 def load_issues(file_path):
-    """Load issues from JSON file"""
+    """Load issues from JSON (or JSON Lines) file"""
+    if file_path.endswith(".jsonl"):
+        return list(IssueFile(file_path))
     with open(file_path, 'r') as f:
         return json.load(f)
 
+def load_issues_lazy(file_path):
+    """Open a JSON Lines issue file without parsing it; issues are read on access"""
+    return IssueFile(file_path)
+
 def save_results(output_path, results):
     """Save extracted keywords to JSON file"""
     with open(output_path, 'w') as f:
         json.dump(results, f, indent=2)
 
-def extract_keywords(issue, model="gemini-2.0-flash"):
-    """Extract technical keywords using LLM"""
+_models = {}
+_models_lock = threading.Lock()
+
+def get_model(model="gemini-2.0-flash"):
+    """
+    Shared GenerativeModel per model name, so the client is created once per process.
+
+    `google.generativeai` is imported and configured (GOOGLE_API_KEY, from the
+    environment or .env) on first use, so runs that never reach the LLM don't pay for it.
+    """
+    with _models_lock:
+        if model not in _models:
+            import google.generativeai as genai
+            from dotenv import load_dotenv
+
+            if not _models:
+                load_dotenv()
+                genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+            _models[model] = genai.GenerativeModel(model)
+        return _models[model]
+
+def parse_extraction(content):
+    """Turn the raw LLM answer for one issue into `(keywords, summary)`"""
+    summary = ""
+    if(content.startswith("```json")):
+        keywords, summary = extract_keywords_from_json_string(content)
+    else:
+        keywords = [k.strip() for k in content.split(',')]
+    return keywords, summary
+
+def extract_keywords(issue, model="gemini-2.0-flash", client=None):
+    """Extract technical keywords using LLM (answers are cached by issue content, prompt and model)"""
    
+    cache = get_default_llm_cache()
+    cached = cache.get(issue, model) if cache else None
+    if cached is not None:
+        return cached
+
     prompt = contruct_prompt(issue)
     
     try:
-        model = genai.GenerativeModel(model)
-        response = model.generate_content(prompt)
+        client = client or get_model(model)
+        with metrics.span("llm"):
+            response = client.generate_content(prompt)
         content = response.text.strip()
         # return response.choices[0].message['content'].strip().split(', ')
-        if(content.startswith("```json")):
-            keywords, summary = extract_keywords_from_json_string(content)
-        else:
-            keywords = [k.strip() for k in content.split(',')]
+        keywords, summary = parse_extraction(content)
+        if cache:
+            cache.put(issue, model, (keywords, summary, content))
         return keywords, summary, content
 
     except Exception as e:
         print(f"Error processing issue {issue['number']}: {str(e)}")
         return []
 
+# words of an issue title that say nothing about the code it concerns
+_TITLE_STOPWORDS = frozenset("""
+a an and are as at be but by can can't cannot could does doesn't don't for from has have how if in into is isn't it
+its not of on or should that the this to was when where which while why will with without would
+add allow bug error fail fails failed failing feature fix issue make new problem request support use using
+""".split())
+_TITLE_WORD = re.compile(r"[A-Za-z0-9]+(?:[._/\-'][A-Za-z0-9]+)*")
+
+def title_keywords(issue, limit=8):
+    """The words of the issue title that look like keywords, for when the LLM is not an option"""
+    keywords = []
+    for word in _TITLE_WORD.findall(issue.get('title') or ""):
+        if len(word) > 2 and word.lower() not in _TITLE_STOPWORDS and word not in keywords:
+            keywords.append(word)
+    return keywords[:limit]
+
+def fallback_keywords(issue, model="gemini-2.0-flash"):
+    """
+    `(keywords, summary)` without calling the LLM: a cached extraction of the
+    issue if there is one, otherwise the keywords of its title and no summary
+    """
+    cache = get_default_llm_cache()
+    cached = cache.get(issue, model) if cache else None
+    if cached is not None:
+        return cached[0], cached[1]
+    return title_keywords(issue), ""
+
 def process_single_issue(issues, issue_number, output_path):
     """Process a single issue selected by user input"""
-    selected_issue = next((issue for issue in issues if issue['number'] == issue_number), None)
+    if isinstance(issues, IssueFile):
+        selected_issue = issues.get(issue_number)
+    else:
+        selected_issue = next((issue for issue in issues if issue['number'] == issue_number), None)
     
     if selected_issue is None or selected_issue["state"] == "closed":
         raise Exception(f"Issue #{issue_number} is either closed or does not exist.")
@@ -1,76 +1,5 @@
-def contruct_prompt(issue):
-    # prompt = f"""
-    # You are a Technical Keyword Extraction Assistant.  
-    # Given a GitHub issue’s **Title** and **Description**, extract a concise list of the **most important technical keywords**.  
-    # - **Only** include terms that refer to filenames, module or class names, function/method names, error types, CamelCase identifiers, configuration keys, library names, etc.  
-    # - **Do not** include vague words (e.g. "problem", "issue", "error" by itself, "performance", "slow", etc.) unless they are part of a specific technical identifier (e.g. `NullPointerException`).  
-    # - Preserve original casing and punctuation for CamelCase or dotted names.  
-    # - Return your answer as a JSON array under the key `keywords`.
-
-    # ### Format:
-
-    # keywords: \[
-    # "FirstKeyword",
-    # "Another\_Term",
-    # "someLibrary.js",
-    # "ModuleName.methodName()",
-    # …
-    # ]
-
-    # ### Few-Shot Examples
-
-    # #### Example 1
-    # **Input**  
-    # Title: `NullPointerException in DataProcessor.processData when input is null`  
-    # Description: `I’m seeing a NullPointerException thrown from the DataProcessor.processData method whenever the input parameter is null.  
-    # Stack trace shows com.example.dataprocessor.DataProcessor.processData(DataProcessor.java:45).`
-
-    # **Output**  
-    # [
-    # "NullPointerException",
-    # "DataProcessor.processData",
-    # "com.example.dataprocessor.DataProcessor",
-    # "DataProcessor.java"
-    # ]
-
-    # #### Example 2
-    # **Input**  
-    # Title: `React UI freeze when clicking SaveButton in production build`  
-    # Description: `After deploying the React app, clicking the SaveButton component causes the UI to lock up.  
-    # The issue appears in SaveHandler.handleSave() and only reproduces in the production webpack bundle.`
-
-    # **Output**  
-    # [
-    # "React",
-    # "SaveButton",
-    # "SaveHandler.handleSave()",
-    # "production webpack bundle"
-    # ]
-
-    # #### Example 3
-    # **Input**  
-    # Title: `Memory leak in CacheManager.close() method`  
-    # Description: `When shutting down the service, CacheManager.close() does not release file handles, leading to a memory leak detected by VisualVM.  
-    # I’m using version 2.3.1 of cache-lib.`
-
-    # **Output**  
-    # [
-    # "CacheManager.close()",
-    # "file handles",
-    # "memory leak",
-    # "VisualVM",
-    # "cache-lib 2.3.1"
-    # ]
-
-    # **Now apply the same extraction logic to the new issue below:**  
-
-    # Title: {issue['title']}
-    # Description: {issue['body']}
-    # """
-
-    # return prompt
-
-    prompt = f"""
+# Instructions and few-shot examples shared by the single- and multi-issue prompts.
+PROMPT_PREFIX = """
     You are a Technical Keyword & Issue Summary Extraction Assistant.
 
     Given a GitHub issue’s **Title**, **Description**, and **Labels**, you must produce:
@@ -85,10 +14,10 @@ def contruct_prompt(issue):
     Return exactly this JSON structure:
 
     ```json
-    {{
+    {
     "keywords": [ … ],
     "summary": "…"
-    }}
+    }
     ````
 
     ### Few-Shot Examples
@@ -104,7 +33,7 @@ def contruct_prompt(issue):
 
     **Output**
     ```json
-    {{
+    {
     "keywords": [
         "NullPointerException",
         "DataProcessor.processData",
@@ -112,7 +41,7 @@ def contruct_prompt(issue):
         "DataProcessor.java"
     ],
     "summary": "Users encounter a NullPointerException in DataProcessor.processData when a null input is passed. The stack trace pinpoints com.example.dataprocessor.DataProcessor.processData in DataProcessor.java:45. This crash must be mitigated by adding null checks or input validation before processing."
-    }}
+    }
     ```
 
     #### Example 2
@@ -126,7 +55,7 @@ def contruct_prompt(issue):
 
     **Output**
     ```json
-    {{
+    {
     "keywords": [
         "React",
         "SaveButton",
@@ -134,7 +63,7 @@ def contruct_prompt(issue):
         "production webpack bundle"
     ],
     "summary": "In the production webpack bundle, clicking the SaveButton in the React app causes the UI to freeze. Investigation shows SaveHandler.handleSave() hangs only in the optimized build. This regression blocks user actions after deploy and requires debugging the handler or adjusting the build configuration."
-    }}
+    }
     ```
 
     #### Example 3
@@ -149,7 +78,7 @@ def contruct_prompt(issue):
 
     **Output**
     ```json
-    {{
+    {
     "keywords": [
         "CacheManager.close()",
         "file handles",
@@ -158,9 +87,84 @@ def contruct_prompt(issue):
         "cache-lib 2.3.1"
     ],
     "summary": "CacheManager.close() fails to release file handles during service shutdown, causing a memory leak detected by VisualVM. This occurs in cache-lib version 2.3.1 and degrades performance over time. Ensuring proper resource cleanup in CacheManager.close() is essential to prevent system instability."
-    }}
+    }
     ```
+"""
+
+
+def contruct_prompt(issue):
+    # prompt = f"""
+    # You are a Technical Keyword Extraction Assistant.  
+    # Given a GitHub issue’s **Title** and **Description**, extract a concise list of the **most important technical keywords**.  
+    # - **Only** include terms that refer to filenames, module or class names, function/method names, error types, CamelCase identifiers, configuration keys, library names, etc.  
+    # - **Do not** include vague words (e.g. "problem", "issue", "error" by itself, "performance", "slow", etc.) unless they are part of a specific technical identifier (e.g. `NullPointerException`).  
+    # - Preserve original casing and punctuation for CamelCase or dotted names.  
+    # - Return your answer as a JSON array under the key `keywords`.
+
+    # ### Format:
+
+    # keywords: \[
+    # "FirstKeyword",
+    # "Another\_Term",
+    # "someLibrary.js",
+    # "ModuleName.methodName()",
+    # …
+    # ]
 
+    # ### Few-Shot Examples
+
+    # #### Example 1
+    # **Input**  
+    # Title: `NullPointerException in DataProcessor.processData when input is null`  
+    # Description: `I’m seeing a NullPointerException thrown from the DataProcessor.processData method whenever the input parameter is null.  
+    # Stack trace shows com.example.dataprocessor.DataProcessor.processData(DataProcessor.java:45).`
+
+    # **Output**  
+    # [
+    # "NullPointerException",
+    # "DataProcessor.processData",
+    # "com.example.dataprocessor.DataProcessor",
+    # "DataProcessor.java"
+    # ]
+
+    # #### Example 2
+    # **Input**  
+    # Title: `React UI freeze when clicking SaveButton in production build`  
+    # Description: `After deploying the React app, clicking the SaveButton component causes the UI to lock up.  
+    # The issue appears in SaveHandler.handleSave() and only reproduces in the production webpack bundle.`
+
+    # **Output**  
+    # [
+    # "React",
+    # "SaveButton",
+    # "SaveHandler.handleSave()",
+    # "production webpack bundle"
+    # ]
+
+    # #### Example 3
+    # **Input**  
+    # Title: `Memory leak in CacheManager.close() method`  
+    # Description: `When shutting down the service, CacheManager.close() does not release file handles, leading to a memory leak detected by VisualVM.  
+    # I’m using version 2.3.1 of cache-lib.`
+
+    # **Output**  
+    # [
+    # "CacheManager.close()",
+    # "file handles",
+    # "memory leak",
+    # "VisualVM",
+    # "cache-lib 2.3.1"
+    # ]
+
+    # **Now apply the same extraction logic to the new issue below:**  
+
+    # Title: {issue['title']}
+    # Description: {issue['body']}
+    # """
+
+    # return prompt
+
+    prompt = PROMPT_PREFIX + f"""
     **Now process the new issue below using the same rules:**
 
     ```
@@ -173,6 +177,43 @@ def contruct_prompt(issue):
     return prompt
 
 
+def contruct_batch_prompt(issues):
+    """
+    Prompt for several issues at once. The instructions and few-shot examples
+    are sent once; the answer is a JSON list keyed by issue number.
+    """
+    issue_blocks = "\n".join(
+        f"""
+    ### Issue {issue['number']}
+
+    ```
+    Title: {issue['title']}
+    Description: {issue['body']}
+    Labels: {issue['labels']}
+    ```
+""" for issue in issues)
+
+    prompt = PROMPT_PREFIX + f"""
+    **Now process each of the {len(issues)} issues below using the same rules.**
+
+    Return exactly one JSON list with one object per issue, keyed by its issue number:
+
+    ```json
+    [
+    {{
+    "issue_number": 123,
+    "keywords": [ … ],
+    "summary": "…"
+    }},
+    …
+    ]
+    ```
+{issue_blocks}
+    """
+
+    return prompt
+
+
 
 # Old prompt
 
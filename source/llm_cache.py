@@ -0,0 +1,119 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from source import metrics
+from source.keyword_extraction_prompt import contruct_batch_prompt, contruct_prompt
+
+DEFAULT_CACHE_PATH = os.path.join(os.getcwd(), "outputs", "llm_cache.sqlite3")
+DEFAULT_MAX_ENTRIES = 50000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS extractions (
+    key          TEXT PRIMARY KEY,
+    keywords     TEXT NOT NULL,
+    summary      TEXT,
+    content      TEXT,
+    accessed_at  REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS extractions_accessed ON extractions (accessed_at);
+"""
+
+_SENTINEL_ISSUE = {'number': 0, 'title': '\x00title', 'body': '\x00body', 'labels': ['\x00label']}
+
+
+def prompt_template_version():
+    """
+    Fingerprint of the prompt templates: the prompts rendered for a fixed
+    sentinel issue. Any edit to `contruct_prompt`/`contruct_batch_prompt`
+    changes it, and with it every cache key.
+    """
+    rendered = contruct_prompt(_SENTINEL_ISSUE) + contruct_batch_prompt([_SENTINEL_ISSUE])
+    return hashlib.sha256(rendered.encode("utf-8")).hexdigest()[:16]
+
+
+class ExtractionCache:
+    """
+    Persistent, content-addressed cache of LLM keyword/summary extractions.
+
+    Entries are keyed by a hash of the issue title, body and labels, the prompt
+    template version and the model name, so an unchanged issue never goes to
+    the LLM twice, while any change to the issue, the prompt or the model is a
+    miss. The least recently used entries are dropped beyond `max_entries`.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.template_version = prompt_template_version()
+        self.hits = 0
+        self.misses = 0
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.executescript(SCHEMA)
+
+    def key(self, issue, model):
+        raw = json.dumps([
+            issue.get('title') or "",
+            issue.get('body') or "",
+            sorted(issue.get('labels') or []),
+            self.template_version,
+            model,
+        ])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, issue, model):
+        """Cached `(keywords, summary, content)` for `issue`, or None."""
+        key = self.key(issue, model)
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT keywords, summary, content FROM extractions WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._conn.execute("UPDATE extractions SET accessed_at = ? WHERE key = ?", (time.time(), key))
+        return json.loads(row[0]), row[1], row[2]
+
+    def put(self, issue, model, result):
+        keywords, summary, content = result
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO extractions (key, keywords, summary, content, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (self.key(issue, model), json.dumps(keywords), summary, content, time.time()))
+            count = self._conn.execute("SELECT COUNT(*) FROM extractions").fetchone()[0]
+            if count > self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM extractions WHERE key IN "
+                    "(SELECT key FROM extractions ORDER BY accessed_at LIMIT ?)", (count - self.max_entries,))
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / total if total else 0.0}
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_default_llm_cache():
+    """
+    Shared extraction cache. The location can be overridden with
+    GIT_RECOMMEND_LLM_CACHE; set GIT_RECOMMEND_LLM_CACHE=0 to disable it.
+    """
+    global _default_cache
+    location = os.getenv("GIT_RECOMMEND_LLM_CACHE", DEFAULT_CACHE_PATH)
+    if location == "0":
+        return None
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = ExtractionCache(location)
+            metrics.register_cache("llm", _default_cache)
+        return _default_cache
@@ -0,0 +1,234 @@
+import functools
+import json
+import sys
+import threading
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Collection is off unless `enable()` is called (`--profile`, `--metrics-out`,
+# `serve --metrics`); while off, spans and request hooks return right away.
+_enabled = False
+_lock = threading.Lock()
+_spans = {}       # stage -> {"calls", "seconds", "max_seconds"}
+_requests = {}    # (resource, status) -> count
+_bytes = {}       # resource -> response bytes
+_rate_limits = {}  # resource -> {"remaining", "min_remaining"}
+_caches = {}      # name -> object with a `stats()` dict of hits/misses
+
+
+def enable():
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def enabled():
+    return _enabled
+
+
+def reset():
+    """Forget everything recorded so far (registered caches stay, their counters are theirs)."""
+    with _lock:
+        _spans.clear()
+        _requests.clear()
+        _bytes.clear()
+        _rate_limits.clear()
+
+
+class _Span:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        with _lock:
+            entry = _spans.get(self.name)
+            if entry is None:
+                entry = _spans[self.name] = {"calls": 0, "seconds": 0.0, "max_seconds": 0.0}
+            entry["calls"] += 1
+            entry["seconds"] += elapsed
+            entry["max_seconds"] = max(entry["max_seconds"], elapsed)
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name):
+    """`with span("stage"):` times the block under `stage` (calls, total and longest time)."""
+    return _Span(name) if _enabled else _NULL_SPAN
+
+
+def timed(name):
+    """Decorator: every call of the function is a `span(name)`."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with _Span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def record_response(resource_name, response):
+    """Count a GitHub response that went over the network, its size and the rate-limit headroom it reports."""
+    if not _enabled:
+        return
+    headers = response.headers
+    size = headers.get("Content-Length")
+    size = int(size) if size is not None else len(response.content or b"")
+    resource_name = headers.get("X-RateLimit-Resource", resource_name)
+    remaining = headers.get("X-RateLimit-Remaining")
+    with _lock:
+        key = (resource_name, response.status_code)
+        _requests[key] = _requests.get(key, 0) + 1
+        _bytes[resource_name] = _bytes.get(resource_name, 0) + size
+        if remaining is not None:
+            remaining = int(remaining)
+            entry = _rate_limits.setdefault(resource_name, {"remaining": remaining, "min_remaining": remaining})
+            entry["remaining"] = remaining
+            entry["min_remaining"] = min(entry["min_remaining"], remaining)
+
+
+def register_cache(name, cache):
+    """Report `cache.stats()` (hits, misses, ...) under `name` in every snapshot."""
+    with _lock:
+        _caches[name] = cache
+
+
+def peak_rss_bytes():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def snapshot():
+    """Everything recorded so far as a JSON-serializable dict."""
+    with _lock:
+        spans = {name: dict(entry) for name, entry in _spans.items()}
+        requests = [{"resource": r, "status": s, "count": n} for (r, s), n in sorted(_requests.items())]
+        response_bytes = dict(_bytes)
+        rate_limits = {name: dict(entry) for name, entry in _rate_limits.items()}
+        caches = dict(_caches)
+
+    cache_stats = {}
+    for name, cache in caches.items():
+        stats = dict(cache.stats())
+        lookups = sum(v for k, v in stats.items() if k != "hit_rate")
+        stats["hit_rate"] = (lookups - stats.get("misses", 0)) / lookups if lookups else 0.0
+        cache_stats[name] = stats
+
+    return {
+        "spans": spans,
+        "http": {"requests": requests, "bytes": response_bytes, "rate_limit": rate_limits},
+        "caches": cache_stats,
+        "peak_rss_bytes": peak_rss_bytes(),
+    }
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def to_prometheus(data, prefix="git_recommend"):
+    """Render a `snapshot()` in the Prometheus text exposition format."""
+    lines = []
+
+    def metric(name, kind, help_text, samples):
+        lines.append(f"# HELP {prefix}_{name} {help_text}")
+        lines.append(f"# TYPE {prefix}_{name} {kind}")
+        for labels, value in samples:
+            label_text = ",".join(f'{k}="{_label(v)}"' for k, v in labels.items())
+            lines.append(f"{prefix}_{name}{{{label_text}}} {value}" if label_text else f"{prefix}_{name} {value}")
+
+    spans = sorted(data["spans"].items())
+    metric("stage_seconds_total", "counter", "Time spent in each pipeline stage.",
+           [({"stage": name}, entry["seconds"]) for name, entry in spans])
+    metric("stage_calls_total", "counter", "Calls of each pipeline stage.",
+           [({"stage": name}, entry["calls"]) for name, entry in spans])
+    metric("stage_max_seconds", "gauge", "Longest single call of each pipeline stage.",
+           [({"stage": name}, entry["max_seconds"]) for name, entry in spans])
+
+    http = data["http"]
+    metric("http_requests_total", "counter", "GitHub API responses received over the network.",
+           [({"resource": r["resource"], "status": r["status"]}, r["count"]) for r in http["requests"]])
+    metric("http_response_bytes_total", "counter", "Bytes of GitHub API responses.",
+           [({"resource": name}, size) for name, size in sorted(http["bytes"].items())])
+    metric("rate_limit_remaining", "gauge", "Requests left in the rate-limit window, as last reported.",
+           [({"resource": name}, entry["remaining"]) for name, entry in sorted(http["rate_limit"].items())])
+    metric("rate_limit_min_remaining", "gauge", "Lowest rate-limit headroom reported.",
+           [({"resource": name}, entry["min_remaining"]) for name, entry in sorted(http["rate_limit"].items())])
+
+    caches = sorted(data["caches"].items())
+    metric("cache_lookups_total", "counter", "Cache lookups by outcome.",
+           [({"cache": name, "outcome": outcome}, value)
+            for name, stats in caches for outcome, value in sorted(stats.items()) if outcome != "hit_rate"])
+    metric("cache_hit_ratio", "gauge", "Share of cache lookups answered without recomputing or refetching.",
+           [({"cache": name}, stats["hit_rate"]) for name, stats in caches])
+
+    if data["peak_rss_bytes"] is not None:
+        metric("peak_rss_bytes", "gauge", "Peak resident set size of the process.", [({}, data["peak_rss_bytes"])])
+    return "\n".join(lines) + "\n"
+
+
+def format_summary(data):
+    """Human-readable table of a `snapshot()`, for `--profile`."""
+    lines = [f"{'stage':16} {'calls':>6} {'total s':>9} {'max s':>8}"]
+    for name, entry in sorted(data["spans"].items(), key=lambda kv: -kv[1]["seconds"]):
+        lines.append(f"{name:16} {entry['calls']:6} {entry['seconds']:9.3f} {entry['max_seconds']:8.3f}")
+
+    http = data["http"]
+    for name, size in sorted(http["bytes"].items()):
+        count = sum(r["count"] for r in http["requests"] if r["resource"] == name)
+        headroom = http["rate_limit"].get(name)
+        left = f", {headroom['min_remaining']} left in rate limit" if headroom else ""
+        lines.append(f"GitHub {name}: {count} requests, {size / 1024:.1f} KiB{left}")
+    for name, stats in sorted(data["caches"].items()):
+        lookups = ", ".join(f"{k} {v}" for k, v in stats.items() if k != "hit_rate")
+        lines.append(f"{name} cache: {lookups} (hit rate {stats['hit_rate']:.0%})")
+    if data["peak_rss_bytes"] is not None:
+        lines.append(f"peak RSS: {data['peak_rss_bytes'] / 2 ** 20:.0f} MiB")
+    return "\n".join(lines)
+
+
+def write(path, fmt=None):
+    """
+    Write a snapshot to `path` as JSON or Prometheus text. The format defaults
+    to Prometheus for `.prom`/`.txt` files and JSON otherwise.
+    """
+    if fmt is None:
+        fmt = "prometheus" if path.endswith((".prom", ".txt")) else "json"
+    data = snapshot()
+    with open(path, "w", encoding="utf-8") as f:
+        if fmt == "prometheus":
+            f.write(to_prometheus(data))
+        else:
+            json.dump(data, f, indent=2)
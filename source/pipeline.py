@@ -0,0 +1,142 @@
+import queue
+import threading
+import time
+
+
+class Pipeline:
+    """
+    Small dependency-graph executor.
+
+    Steps are added with the names of the steps they depend on and start as
+    soon as all of those have finished, each on its own thread, so
+    independent steps (e.g. syncing the PR corpus and calling the LLM) overlap
+    and the run takes as long as its critical path. A step receives the
+    results of its dependencies as keyword arguments named after them.
+
+    A step can have a `budget`, the number of seconds after the start of the
+    run by which it must have finished (steps without one get the deadline of
+    the run, if any), and a `fallback`, called with the same arguments when
+    the step raises or runs out of time; its result stands in for the step's,
+    and the step is listed in `degraded`. A step that fails without a fallback
+    stops the run: no further steps are started and the exception (or a
+    `TimeoutError`) is re-raised by `run`. Steps given up on are left to
+    finish in the background, on daemon threads, so they never hold up the
+    exit of the process.
+    """
+
+    def __init__(self):
+        self._steps = {}  # name -> (fn, deps, budget, fallback)
+        self.degraded = []
+
+    def add(self, name, fn, deps=(), budget=None, fallback=None):
+        """Add step `name`, computed as `fn(**{dep: result of dep for dep in deps})`."""
+        if name in self._steps:
+            raise ValueError(f"Pipeline step '{name}' is defined twice")
+        missing = [dep for dep in deps if dep not in self._steps]
+        if missing:
+            # steps must be added after their dependencies, which also rules out cycles
+            raise ValueError(f"Pipeline step '{name}' depends on unknown steps: {', '.join(missing)}")
+        self._steps[name] = (fn, tuple(deps), budget, fallback)
+        return self
+
+    def run(self, deadline=None):
+        """
+        Run every step; returns a dict step name -> result.
+
+        :param deadline: Seconds the run may take; the budget of steps without one
+        """
+        start = time.monotonic()
+        results = {}
+        pending = dict(self._steps)
+        running = {}  # name -> time by which it must finish, or None
+        finished = queue.Queue()
+        self.degraded = []
+
+        def call(name, fn, kwargs):
+            try:
+                finished.put((name, fn(**kwargs), None))
+            except Exception as e:
+                finished.put((name, None, e))
+
+        def fall_back(name, error):
+            _, deps, _, fallback = self._steps[name]
+            if fallback is None:
+                raise error
+            self.degraded.append(name)
+            results[name] = fallback(**{dep: results[dep] for dep in deps})
+
+        while pending or running:
+            for name, (fn, deps, budget, _) in list(pending.items()):
+                if all(dep in results for dep in deps):
+                    del pending[name]
+                    limit = budget if budget is not None else deadline
+                    running[name] = None if limit is None else start + limit
+                    kwargs = {dep: results[dep] for dep in deps}
+                    threading.Thread(target=call, args=(name, fn, kwargs),
+                                     name=f"pipeline-{name}", daemon=True).start()
+
+            expiries = [expiry for expiry in running.values() if expiry is not None]
+            timeout = max(0.0, min(expiries) - time.monotonic()) if expiries else None
+            try:
+                name, result, error = finished.get(timeout=timeout)
+            except queue.Empty:
+                now = time.monotonic()
+                for name, expiry in list(running.items()):
+                    if expiry is not None and expiry <= now:
+                        del running[name]
+                        fall_back(name, TimeoutError(f"Pipeline step '{name}' did not finish in time"))
+                continue
+
+            if name not in running:
+                continue  # given up on already
+            del running[name]
+            if error is None:
+                results[name] = result
+            else:
+                fall_back(name, error)
+        return results
+
+
+class SingleFlight:
+    """
+    At most one call per key at a time: a call made while another one with
+    the same key is still running waits for it and gets its result (or its
+    exception) instead of doing the work again. Meant for work like syncing
+    a repository, which a `Pipeline` step given up on leaves running in the
+    background: the next request joins it rather than starting another.
+    """
+
+    def __init__(self):
+        self._calls = {}  # key -> _Call
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        """Return `fn()`, or the result of the call of `fn` for `key` already in flight."""
+        with self._lock:
+            call = self._calls.get(key)
+            joined = call is not None
+            if not joined:
+                call = self._calls[key] = _Call()
+        if joined:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
@@ -0,0 +1,311 @@
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+
+from source import metrics
+from source.bm25_index import pull_text
+from source.corpus import epoch_seconds
+from source.tokenizer import TOKENIZER_VERSION, code_tokens
+
+DEFAULT_PROFILES_PATH = os.path.join(os.getcwd(), "outputs", "profiles.sqlite3")
+# "bm25" scores every PR and sums per author; "profiles" scores the contributor profiles directly
+RANKER = os.getenv("GIT_RECOMMEND_RANKER", "bm25")
+# a contribution counts half as much after this many days
+HALF_LIFE_DAYS = float(os.getenv("GIT_RECOMMEND_PROFILE_HALF_LIFE_DAYS", "365"))
+# weights are moved to a later reference time once they would grow past 2 ** MAX_DOUBLINGS, see `ProfileIndex`
+MAX_DOUBLINGS = 512
+# how much one contribution of each kind counts
+SOURCE_WEIGHTS = {"pr": 1.0, "commit": 0.5, "path": 0.5}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS weights (
+    repo    TEXT NOT NULL,
+    term    TEXT NOT NULL,
+    author  TEXT NOT NULL,
+    weight  REAL NOT NULL,
+    PRIMARY KEY (repo, term, author)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS terms (
+    repo    TEXT NOT NULL,
+    term    TEXT NOT NULL,
+    df      INTEGER NOT NULL,
+    PRIMARY KEY (repo, term)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS items (
+    repo    TEXT NOT NULL,
+    kind    TEXT NOT NULL,
+    key     TEXT NOT NULL,
+    PRIMARY KEY (repo, kind, key)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS stats (
+    repo              TEXT PRIMARY KEY,
+    item_count        INTEGER NOT NULL DEFAULT 0,
+    pulls_high_water  TEXT,
+    commits_row       INTEGER NOT NULL DEFAULT 0,
+    mirror_head       TEXT,
+    decay_epoch       REAL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key    TEXT PRIMARY KEY,
+    value  TEXT
+);
+"""
+
+
+class ProfileIndex:
+    """
+    On-disk expertise profile of every contributor of a repository: a sparse,
+    time-decayed term vector built from the text of their PRs, the messages
+    of their commits and the paths those commits touched.
+
+    Each contribution (a PR, a commit message or a path touched by a commit)
+    adds the saturated frequency `tf * (k1 + 1) / (tf + k1)` of each of its
+    terms to its author's vector, times `SOURCE_WEIGHTS[kind]` and the decay
+    factor `2 ** ((t - epoch) / half_life)`, where `epoch` is a reference time
+    kept per repository (at first, that of its first contribution). Since the
+    decay of every weight from then until now is the same factor, the weights
+    do not have to be rewritten as time passes: contributions are only ever
+    added, and scores are scaled to the present at query time. Only when a
+    contribution is more than `MAX_DOUBLINGS` half-lives newer than the epoch
+    are the weights of the repository scaled down once and the epoch moved to
+    it, so no factor ever overflows. Contributions are folded in once (keyed
+    by PR number, commit SHA or commit and path), so updates can be repeated
+    freely. Commits whose author has no known GitHub login are left out.
+
+    A query is one sparse dot product: the idf-weighted query terms against
+    the weights of those terms, so it reads at most one row per query term
+    and contributor, however many PRs and commits went into the profiles.
+    """
+
+    def __init__(self, path=DEFAULT_PROFILES_PATH, half_life_days=HALF_LIFE_DAYS, k1=1.2):
+        if not (math.isfinite(half_life_days) and half_life_days > 0):
+            raise ValueError(f"The profile half-life must be a positive number of days "
+                             f"(GIT_RECOMMEND_PROFILE_HALF_LIFE_DAYS), got {half_life_days}")
+        self.path = path
+        self.half_life = half_life_days * 86400
+        self.k1 = k1
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.executescript(SCHEMA)
+            columns = [row[1] for row in self._conn.execute("PRAGMA table_info(stats)")]
+            if "decay_epoch" not in columns:
+                self._conn.execute("ALTER TABLE stats ADD COLUMN decay_epoch REAL")
+            version = f"{TOKENIZER_VERSION}:{half_life_days}:{k1}:epoch"
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+            if row is None or row[0] != version:
+                # built with another tokenizer or weighting: start over, the next update rebuilds
+                for table in ("weights", "terms", "items", "stats"):
+                    self._conn.execute(f"DELETE FROM {table}")
+                self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('version', ?)", (version,))
+
+    def close(self):
+        self._conn.close()
+
+    def stats(self, repo):
+        """Return `(item_count, pulls_high_water, commits_row, mirror_head)` for `repo`."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT item_count, pulls_high_water, commits_row, mirror_head FROM stats WHERE repo = ?",
+                (repo,)).fetchone()
+        return row if row else (0, None, 0, None)
+
+    def contributor_count(self, repo):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(DISTINCT author) FROM weights WHERE repo = ?", (repo,)).fetchone()[0]
+
+    def add_items(self, repo, items, **marks):
+        """
+        Fold contributions into the profiles; those already folded in are skipped.
+
+        :param items: Iterable of `(kind, key, author, tokens, timestamp)`
+        :param marks: New `pulls_high_water`, `commits_row` or `mirror_head` of `repo`
+        :return:      Number of contributions added
+        """
+        with self._lock, self._conn:
+            cur = self._conn.cursor()
+            cur.execute("INSERT OR IGNORE INTO stats (repo) VALUES (?)", (repo,))
+            epoch = cur.execute("SELECT decay_epoch FROM stats WHERE repo = ?", (repo,)).fetchone()[0]
+            weights = {}
+            dfs = Counter()
+            added = 0
+            for kind, key, author, tokens, timestamp in items:
+                if not author or not tokens:
+                    continue
+                key = str(key)
+                if cur.execute("INSERT OR IGNORE INTO items (repo, kind, key) VALUES (?, ?, ?)",
+                               (repo, kind, key)).rowcount == 0:
+                    continue
+                t = epoch_seconds(timestamp)
+                if epoch is None:
+                    epoch = t
+                    cur.execute("UPDATE stats SET decay_epoch = ? WHERE repo = ?", (epoch, repo))
+                doublings = (t - epoch) / self.half_life
+                if doublings > MAX_DOUBLINGS:
+                    # move the epoch up to t: everything folded in so far shrinks by the same factor
+                    shrink = 2.0 ** -doublings
+                    cur.execute("UPDATE weights SET weight = weight * ? WHERE repo = ?", (shrink, repo))
+                    weights = {pair: weight * shrink for pair, weight in weights.items()}
+                    epoch, doublings = t, 0.0
+                    cur.execute("UPDATE stats SET decay_epoch = ? WHERE repo = ?", (epoch, repo))
+                scale = SOURCE_WEIGHTS[kind] * 2.0 ** doublings
+                counts = Counter(tokens)
+                for term, tf in counts.items():
+                    weights[(term, author)] = (weights.get((term, author), 0.0)
+                                               + scale * tf * (self.k1 + 1) / (tf + self.k1))
+                dfs.update(counts.keys())
+                added += 1
+
+            cur.executemany(
+                "INSERT INTO weights (repo, term, author, weight) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (repo, term, author) DO UPDATE SET weight = weight + excluded.weight",
+                [(repo, term, author, weight) for (term, author), weight in weights.items()])
+            cur.executemany(
+                "INSERT INTO terms (repo, term, df) VALUES (?, ?, ?) "
+                "ON CONFLICT (repo, term) DO UPDATE SET df = df + excluded.df",
+                [(repo, term, df) for term, df in dfs.items()])
+            cur.execute("UPDATE stats SET item_count = item_count + ? WHERE repo = ?", (added, repo))
+            for column, value in marks.items():
+                cur.execute(f"UPDATE stats SET {column} = ? WHERE repo = ?", (value, repo))
+        return added
+
+    def add_pulls(self, repo, pulls, token_cache=None, **marks):
+        """Fold in PR records (as returned by the metadata store), by PR author."""
+        pulls = list(pulls)
+        if token_cache is not None:
+            streams = token_cache.pull_tokens(repo, pulls, pull_text)
+        else:
+            streams = [code_tokens(pull_text(pr)) for pr in pulls]
+        return self.add_items(
+            repo, (("pr", pr["number"], pr["user"], tokens, pr.get("updated_at")) for pr, tokens in zip(pulls, streams)),
+            **marks)
+
+    def add_commits(self, repo, commits, **marks):
+        """
+        Fold in commit records (`{sha, login, name, date, message}`, with the
+        touched path under `path` or a list under `paths`): the message once
+        per commit and each path once per commit, by login. Commits without a
+        login are skipped: a git author name is not a GitHub account.
+        """
+        def items():
+            for c in commits:
+                author = c.get("login")
+                if not author:
+                    continue
+                yield "commit", c["sha"], author, code_tokens(c.get("message")), c["date"]
+                for path in c["paths"] if "paths" in c else [c["path"]]:
+                    yield "path", f"{c['sha']}:{path}", author, code_tokens(path), c["date"]
+        return self.add_items(repo, items(), **marks)
+
+    @metrics.timed("profile_scoring")
+    def score(self, repo, query_tokens, now=None):
+        """
+        Relevance of every contributor whose profile has at least one query term,
+        decayed to `now` (default: the current time).
+
+        :return: Dict author -> score
+        """
+        query = Counter(query_tokens)
+        if not query:
+            return {}
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT item_count, decay_epoch FROM stats WHERE repo = ?", (repo,)).fetchone()
+        if not row or row[0] == 0:
+            return {}
+        item_count, epoch = row
+
+        terms = list(query)
+        marks = ",".join("?" * len(terms))
+        with self._lock:
+            dfs = dict(self._conn.execute(
+                f"SELECT term, df FROM terms WHERE repo = ? AND term IN ({marks})", [repo] + terms))
+            rows = self._conn.execute(
+                f"SELECT term, author, weight FROM weights WHERE repo = ? AND term IN ({marks})",
+                [repo] + terms).fetchall()
+
+        now = time.time() if now is None else now
+        # past MAX_DOUBLINGS half-lives only the order of the scores is left to keep
+        to_now = 2.0 ** -min((now - epoch) / self.half_life, MAX_DOUBLINGS)
+        term_weights = {t: query[t] * math.log(1 + (item_count - df + 0.5) / (df + 0.5)) * to_now
+                        for t, df in dfs.items()}
+        scores = {}
+        for term, author, weight in rows:
+            scores[author] = scores.get(author, 0.0) + term_weights[term] * weight
+        return scores
+
+    def top_authors(self, repo, query_tokens, top_n=5):
+        """The top_n contributors for a query, best first."""
+        scores = self.score(repo, query_tokens)
+        return [author for author, _ in sorted(scores.items(), key=lambda kv: kv[1], reverse=True)[:top_n]]
+
+    def scorer(self, repo):
+        """This index bound to `repo`, with `BatchScorer`'s `top_authors(queries, top_n)`."""
+        return _RepoProfiles(self, repo)
+
+
+class _RepoProfiles:
+    def __init__(self, index, repo):
+        self.index = index
+        self.repo = repo
+
+    def top_authors(self, queries, top_n=5):
+        return [self.index.top_authors(self.repo, query, top_n=top_n) for query in queries]
+
+
+@metrics.timed("profile_index")
+def update_profiles_from_store(profiles, store, repo, token_cache=None, mirror=None, resolve_logins=None):
+    """
+    Fold the closed PRs and commits of `repo` that are new since the last
+    update into the profiles: PRs from the store, and commits from the git
+    mirror when given (its whole history, touched paths included), otherwise
+    the per-path commits the store has collected so far.
+
+    :param resolve_logins: Called with the mirror's commit records to fill in
+                           the logins their e-mails do not give away
+                           (e.g. `github.resolve_commit_logins`)
+    """
+    _, high_water, commits_row, mirror_head = profiles.stats(repo)
+    pulls = store.get_pulls(repo, state="closed", since=high_water)
+    if pulls:
+        newest = max(pr["updated_at"] for pr in pulls if pr.get("updated_at"))
+        profiles.add_pulls(repo, pulls, token_cache=token_cache,
+                           pulls_high_water=max(newest, high_water) if high_water else newest)
+
+    if mirror is not None:
+        try:
+            commits = mirror.history(since=mirror_head)
+        except Exception:
+            # the old head is gone (e.g. a force push): go over the whole history, folded commits are skipped
+            commits = mirror.history()
+        if commits:
+            if resolve_logins is not None:
+                resolve_logins(commits)
+            profiles.add_commits(repo, commits, mirror_head=commits[0]["sha"])
+        return
+
+    while True:
+        commits = store.get_commits_after(repo, commits_row, limit=5000)
+        if not commits:
+            return
+        commits_row = commits[-1]["row"]
+        profiles.add_commits(repo, commits, commits_row=commits_row)
+
+
+_default_profiles = None
+_default_profiles_lock = threading.Lock()
+
+
+def get_default_profiles():
+    """Shared profile index. The file location can be overridden with GIT_RECOMMEND_PROFILES."""
+    global _default_profiles
+    with _default_profiles_lock:
+        if _default_profiles is None:
+            _default_profiles = ProfileIndex(os.getenv("GIT_RECOMMEND_PROFILES", DEFAULT_PROFILES_PATH))
+        return _default_profiles
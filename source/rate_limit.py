@@ -0,0 +1,181 @@
+import os
+import threading
+import time
+from collections import deque
+
+# Limits GitHub applies per token, used until the first response tells us the real numbers.
+# `per_hour` is the primary limit; `per_minute` is a client-side window for the
+# resources GitHub meters per minute (search) so bursts don't trip the limit.
+DEFAULT_LIMITS = {
+    "core":        {"per_hour": 5000, "per_minute": None},
+    "search":      {"per_hour": None, "per_minute": 30},
+    "code_search": {"per_hour": None, "per_minute": 10},
+    "graphql":     {"per_hour": 5000, "per_minute": None},
+}
+
+# GitHub asks clients to wait at least a minute after a secondary rate limit
+# without Retry-After; we back off exponentially from there.
+SECONDARY_LIMIT_BACKOFF = 60
+MAX_WAIT = float(os.getenv("GIT_RECOMMEND_MAX_RATE_WAIT", "900"))
+
+
+class RateLimitExceeded(Exception):
+    """Raised when no token will have budget for a resource within the allowed wait."""
+
+
+def resource_for(url):
+    """Which rate-limit bucket a request to `url` is charged to."""
+    path = url.split("?", 1)[0]
+    if path.endswith("/graphql"):
+        return "graphql"
+    if "/search/code" in path:
+        return "code_search"
+    if "/search/" in path:
+        return "search"
+    return "core"
+
+
+class _Bucket:
+    """Budget of one token for one resource."""
+
+    def __init__(self, resource):
+        limits = DEFAULT_LIMITS.get(resource, DEFAULT_LIMITS["core"])
+        self.limit = limits["per_hour"] or limits["per_minute"]
+        self.remaining = self.limit
+        self.reset = 0.0
+        self.per_minute = limits["per_minute"]
+        self.window = deque()
+        self.blocked_until = 0.0
+        self.strikes = 0
+
+    def wait_time(self, now):
+        waits = [0.0]
+        if self.blocked_until > now:
+            waits.append(self.blocked_until - now)
+        if self.remaining is not None and self.remaining <= 0 and self.reset > now:
+            waits.append(self.reset - now)
+        if self.per_minute:
+            while self.window and self.window[0] <= now - 60:
+                self.window.popleft()
+            if len(self.window) >= self.per_minute:
+                waits.append(self.window[0] + 60 - now)
+        return max(waits)
+
+    def reserve(self, now):
+        if self.per_minute:
+            self.window.append(now)
+        if self.remaining is not None:
+            self.remaining -= 1
+
+
+class RateLimitScheduler:
+    """
+    Central budget keeper for all GitHub requests.
+
+    Every request first `acquire`s a token for its resource (core, search,
+    code_search, graphql). The scheduler hands out the token with the most
+    budget left, or sleeps until one has budget again. After the response
+    arrives, `record` reads X-RateLimit-Remaining/Reset and the secondary-limit
+    signals (403/429 with Retry-After) so the next acquire knows about them.
+
+    :param tokens:   List of GitHub tokens to spread requests over (may be [None])
+    :param max_wait: Longest time (seconds) `acquire` may sleep before giving up
+    """
+
+    def __init__(self, tokens, max_wait=MAX_WAIT, sleep=time.sleep, clock=time.time):
+        self.tokens = list(dict.fromkeys(tokens)) or [None]
+        self.max_wait = max_wait
+        self._sleep = sleep
+        self._clock = clock
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def _bucket(self, token, resource):
+        key = (token, resource)
+        if key not in self._buckets:
+            self._buckets[key] = _Bucket(resource)
+        return self._buckets[key]
+
+    def wait_time(self, resource):
+        """Seconds until some token has budget for `resource` (0 if one has it now)."""
+        with self._lock:
+            now = self._clock()
+            return min(self._bucket(t, resource).wait_time(now) for t in self.tokens)
+
+    def remaining(self, resource):
+        """Requests left for `resource` summed over all tokens (None if unlimited)."""
+        with self._lock:
+            total = 0
+            for token in self.tokens:
+                bucket = self._bucket(token, resource)
+                if bucket.remaining is None:
+                    return None
+                total += max(0, bucket.remaining)
+            return total
+
+    def acquire(self, resource):
+        """Block until a token has budget for `resource`, charge it and return the token."""
+        while True:
+            with self._lock:
+                now = self._clock()
+                best, wait = None, None
+                for token in self.tokens:
+                    bucket = self._bucket(token, resource)
+                    w = bucket.wait_time(now)
+                    if w == 0:
+                        if best is None or (bucket.remaining or 0) > (best[1].remaining or 0):
+                            best = (token, bucket)
+                    elif wait is None or w < wait:
+                        wait = w
+                if best is not None:
+                    best[1].reserve(now)
+                    return best[0]
+
+            if wait > self.max_wait:
+                raise RateLimitExceeded(
+                    f"GitHub '{resource}' rate limit exhausted for all tokens; next budget in {int(wait)}s")
+            self._sleep(wait)
+
+    def record(self, token, resource, response):
+        """
+        Update budgets from a response.
+
+        :return: seconds to wait before retrying if the response was a rate-limit
+                 rejection, otherwise None
+        """
+        headers = response.headers
+        now = self._clock()
+        with self._lock:
+            resource = headers.get("X-RateLimit-Resource", resource)
+            bucket = self._bucket(token, resource)
+            if headers.get("X-RateLimit-Remaining") is not None:
+                bucket.remaining = int(headers["X-RateLimit-Remaining"])
+                bucket.limit = int(headers.get("X-RateLimit-Limit", bucket.limit or 0)) or bucket.limit
+            if headers.get("X-RateLimit-Reset") is not None:
+                bucket.reset = float(headers["X-RateLimit-Reset"])
+
+            if response.status_code not in (403, 429):
+                bucket.strikes = 0
+                return None
+
+            if headers.get("Retry-After") is not None:
+                wait = float(headers["Retry-After"])
+            elif bucket.remaining is not None and bucket.remaining <= 0:
+                wait = max(0.0, bucket.reset - now)
+            elif "rate limit" in response.text.lower():
+                # secondary rate limit without Retry-After
+                wait = SECONDARY_LIMIT_BACKOFF * (2 ** bucket.strikes)
+                bucket.strikes += 1
+            else:
+                # an ordinary permission error
+                return None
+
+            bucket.blocked_until = max(bucket.blocked_until, now + wait)
+            return wait
+
+
+def tokens_from_env(token=None):
+    """`token` plus any extra tokens listed (comma-separated) in GITHUB_TOKENS."""
+    tokens = [token] if token else []
+    tokens += [t.strip() for t in os.getenv("GITHUB_TOKENS", "").split(",") if t.strip()]
+    return tokens or [None]
@@ -0,0 +1,126 @@
+from source import metrics
+from source.fuse_contributors import fuse_contributors
+from source.get_contributor_from_file_changes import find_contributors_from_keywords, prepare_file_ranking
+from source.get_contributors_BM25 import find_contributors_for_keywords, find_contributors_partial, sync_pr_index
+from source.github import get_github_issue
+from source.keyword_extraction import extract_keywords, fallback_keywords, save_results
+from source.pipeline import Pipeline
+from source.store import get_default_store
+from source.utils import filter_human_users
+
+
+def issue_summary(issue, keywords, summary):
+    """The part of a result that comes from the issue and its extraction."""
+    return {
+        "issue_number": issue["number"],
+        "title": issue["title"],
+        "keywords": keywords,
+        "labels": issue.get("labels", []),
+        "summary": summary,
+    }
+
+
+@metrics.timed("recommend")
+def recommend_issue(owner, repo, token, issue_number, output_path=None, pr_count=500, top_n=5, sync=True,
+                    deadline=None):
+    """
+    Recommend contributors for one open issue.
+
+    The stages run as a `Pipeline`: the PR corpus sync (and the local code
+    index or mirror, when in use) starts alongside the issue fetch and goes on
+    while the LLM extracts keywords; the PR-based and file-based rankers then
+    run concurrently and their results are fused, so the latency is roughly
+    max(issue + LLM, PR sync) + max(rankers).
+
+    A stage that fails, or does not finish within its share of `deadline`,
+    falls back instead of failing the run: the stored copy of the issue, a
+    cached extraction or the keywords of the issue title instead of the LLM,
+    the PRs synced so far instead of the full corpus, and no ranking at all
+    from a ranker; the fusion then combines whichever rankers finished. The
+    stages that fell back are listed under "degraded" in the result.
+
+    :param output_path: Optional file to save the extracted keywords/summary to
+                        (same format as `process_single_issue`)
+    :param sync:        Sync the PR store and index first (see `find_contributors_for_keywords`)
+    :param deadline:    Optional number of seconds to answer in, however slow GitHub or the LLM are
+    :return:            Dict with the same keys as a batch triage result, plus "degraded"
+    """
+    full_name = f"{owner}/{repo}"
+
+    def budget(share):
+        return share * deadline if deadline is not None else None
+
+    def check_issue(issue):
+        if issue is None or issue["state"] == "closed":
+            raise Exception(f"Issue #{issue_number} is either closed or does not exist.")
+        return issue
+
+    def fetch_issue():
+        return check_issue(get_github_issue(owner, repo, issue_number, token=token))
+
+    def stored_issue():
+        return check_issue(get_default_store().get_issue(full_name, issue_number))
+
+    def extract(issue):
+        extracted = extract_keywords(issue)
+        if not extracted:
+            raise Exception(f"Keyword extraction failed for issue #{issue_number}.")
+        keywords, summary, _ = extracted
+        return save(issue, keywords, summary)
+
+    def extract_without_llm(issue):
+        keywords, summary = fallback_keywords(issue)
+        return save(issue, keywords, summary)
+
+    def save(issue, keywords, summary):
+        if output_path:
+            save_results(output_path, [issue_summary(issue, keywords, summary)])
+        return keywords, summary
+
+    def sync_prs():
+        sync_pr_index(owner, repo, token, pr_count=pr_count)
+        return True
+
+    def prepare_files():
+        prepare_file_ranking(owner, repo, token)
+        return True
+
+    def rank_by_prs(extraction, pr_index=True):
+        if not pr_index:
+            ranked = find_contributors_partial(owner, repo, extraction[0], pr_count=pr_count, top_n=top_n)
+        else:
+            ranked = find_contributors_for_keywords(
+                owner, repo, token, extraction[0], pr_count=pr_count, top_n=top_n, sync=False)
+        return filter_human_users(ranked)
+
+    def rank_by_files(extraction, file_sources=True):
+        if not file_sources:
+            # the code index or mirror is still being updated, and searching it would wait for that
+            return []
+        return filter_human_users(find_contributors_from_keywords(token, extraction[0], owner, repo))
+
+    def no_ranking(**_):
+        return []
+
+    pipeline = Pipeline()
+    pipeline.add("issue", fetch_issue, budget=budget(0.25), fallback=stored_issue)
+    pipeline.add("extraction", extract, deps=["issue"], budget=budget(0.6), fallback=extract_without_llm)
+    pr_deps, file_deps = ["extraction"], ["extraction"]
+    if sync:
+        # neither needs the keywords, so both overlap with the issue fetch and the LLM call
+        pipeline.add("pr_index", sync_prs, budget=budget(0.6), fallback=lambda: False)
+        pipeline.add("file_sources", prepare_files, budget=budget(0.6), fallback=lambda: False)
+        pr_deps.append("pr_index")
+        file_deps.append("file_sources")
+    pipeline.add("prs_ranked", rank_by_prs, deps=pr_deps, budget=budget(0.9), fallback=no_ranking)
+    pipeline.add("files_ranked", rank_by_files, deps=file_deps, budget=budget(0.9), fallback=no_ranking)
+    pipeline.add("recommended", fuse_contributors, deps=["prs_ranked", "files_ranked"])
+    results = pipeline.run(deadline=deadline)
+
+    keywords, summary = results["extraction"]
+    result = issue_summary(results["issue"], keywords, summary)
+    result["contributors_by_prs"] = results["prs_ranked"]
+    result["contributors_by_files"] = results["files_ranked"]
+    result["recommended"] = results["recommended"]
+    result["degraded"] = pipeline.degraded
+    return result
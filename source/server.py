@@ -0,0 +1,181 @@
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from source import metrics
+from source.bot_classifier import save_default_classifier
+from source.get_contributor_from_file_changes import prepare_file_ranking
+from source.get_contributors_BM25 import sync_pr_index
+from source.keyword_extraction import get_model
+from source.pipeline import SingleFlight
+from source.print_colors import bcolors
+from source.recommend import recommend_issue
+from source.server_client import DEFAULT_ADDRESS
+from source.utils import parse_full_repo_name
+
+# seconds between background refreshes of a repository's PRs, index and mirror
+REFRESH_INTERVAL = int(os.getenv("GIT_RECOMMEND_REFRESH_INTERVAL", "300"))
+
+
+def parse_address(address):
+    host, _, port = address.rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+
+class RecommendationService:
+    """
+    Process-wide state of the daemon: the shared GitHub client, LLM client,
+    store, indexes and caches all stay warm between requests. Every repository
+    asked about is brought up to date once, then refreshed in the background
+    every `refresh_interval` seconds, so requests only pay for the issue
+    itself (its fetch, the LLM call and the ranking). A refresh of a
+    repository that is already running is joined rather than started again.
+    """
+
+    def __init__(self, token=None, pr_count=500, refresh_interval=REFRESH_INTERVAL):
+        self.token = token
+        self.pr_count = pr_count
+        self.refresh_interval = refresh_interval
+        self._refreshed = {}  # (owner, repo) -> time of the last refresh
+        self._refreshes = SingleFlight()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def refresh(self, owner, repo):
+        """Sync the PR store and BM25 index or profiles (and the mirror and code index when in use)."""
+        self._refreshes.do((owner, repo), lambda: self._refresh(owner, repo))
+
+    def _refresh(self, owner, repo):
+        # the mirror first, so that the profiles take in the commits just fetched
+        prepare_file_ranking(owner, repo, self.token, force=True)
+        sync_pr_index(owner, repo, self.token, pr_count=self.pr_count)
+        with self._lock:
+            self._refreshed[(owner, repo)] = time.monotonic()
+
+    def _refresh_in_background(self, owner, repo):
+        def run():
+            try:
+                self.refresh(owner, repo)
+            except Exception as e:
+                print(f"{bcolors.FAIL}Refreshing {owner}/{repo} failed: {e}{bcolors.ENDC}")
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def recommend(self, owner, repo, issue_number, deadline=None):
+        with self._lock:
+            known = (owner, repo) in self._refreshed
+        if known or deadline is None:
+            if not known:
+                self.refresh(owner, repo)
+            return recommend_issue(owner, repo, self.token, issue_number, pr_count=self.pr_count, sync=False,
+                                   deadline=deadline)
+
+        # the first sync of a repository may not fit in the deadline: sync within the request's budgets
+        result = recommend_issue(owner, repo, self.token, issue_number, pr_count=self.pr_count, deadline=deadline)
+        if not {"pr_index", "file_sources"} & set(result["degraded"]):
+            with self._lock:
+                self._refreshed[(owner, repo)] = time.monotonic()
+        else:
+            # the syncs given up on are still running: join them, and mark the repository once they are done
+            self._refresh_in_background(owner, repo)
+        return result
+
+    def repos(self):
+        with self._lock:
+            return [f"{owner}/{repo}" for owner, repo in self._refreshed]
+
+    def _refresh_loop(self):
+        while not self._stop.wait(min(self.refresh_interval, 30)):
+            with self._lock:
+                due = [key for key, at in self._refreshed.items()
+                       if time.monotonic() - at >= self.refresh_interval]
+            for owner, repo in due:
+                try:
+                    self.refresh(owner, repo)
+                except Exception as e:
+                    print(f"{bcolors.FAIL}Refreshing {owner}/{repo} failed: {e}{bcolors.ENDC}")
+            # the refreshes record bots reported by the API; don't wait for shutdown to keep them
+            save_default_classifier()
+
+    def start(self):
+        threading.Thread(target=self._refresh_loop, daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    service = None
+
+    def _reply(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == "/health":
+            return self._reply(200, {"status": "ok", "repos": self.service.repos()})
+        if self.path == "/metrics" and metrics.enabled():
+            data = metrics.to_prometheus(metrics.snapshot()).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            return
+        self._reply(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self.path != "/recommend":
+            return self._reply(404, {"error": "not found"})
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            # owner and repo end up in paths under outputs/: only well-formed names get through
+            _, owner, repo = parse_full_repo_name(request["repo"])
+            issue_number = int(request["issue_number"])
+            deadline = request.get("deadline")
+            deadline = float(deadline) if deadline is not None else None
+        except (ValueError, KeyError, TypeError) as e:
+            return self._reply(400, {"error": f"bad request: {e}"})
+        try:
+            self._reply(200, self.service.recommend(owner, repo, issue_number, deadline=deadline))
+        except Exception as e:
+            self._reply(422, {"error": str(e)})
+
+    def log_message(self, format, *args):
+        print(f"{bcolors.OKCYAN}{self.address_string()} {format % args}{bcolors.ENDC}")
+
+
+def serve(address=None, token=None, metrics_enabled=False):
+    """
+    Run the recommender daemon until interrupted.
+
+    POST /recommend with `{"repo": "owner/repo", "issue_number": n}` (and an
+    optional `"deadline"` in seconds, see `recommend_issue`) answers with the
+    same JSON as a batch triage result; GET /health lists the warm
+    repositories. With `metrics_enabled`, GET /metrics returns the stage
+    timings, GitHub request counts and cache hit rates since start-up in the
+    Prometheus text format. Binds to GIT_RECOMMEND_SERVER (default 127.0.0.1:8765).
+    """
+    address = address or os.getenv("GIT_RECOMMEND_SERVER", DEFAULT_ADDRESS)
+    if metrics_enabled:
+        metrics.enable()
+    service = RecommendationService(token=token)
+    get_model()  # create the LLM client up front
+    service.start()
+
+    handler = type("Handler", (_Handler,), {"service": service})
+    server = ThreadingHTTPServer(parse_address(address), handler)
+    print(f"{bcolors.OKGREEN}git-recommend daemon listening on {address}{bcolors.ENDC}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.stop()
+        server.server_close()
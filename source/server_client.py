@@ -0,0 +1,47 @@
+import json
+import os
+import socket
+import urllib.error
+import urllib.request
+
+DEFAULT_ADDRESS = "127.0.0.1:8765"
+# the daemon answers after the LLM call, so allow for a slow model
+REQUEST_TIMEOUT = 300
+# a deadline bounds the daemon's own work; this covers the request around it
+DEADLINE_SLACK = 2
+
+
+def request_recommendation(full_repo_name, issue_number, address=None, timeout=REQUEST_TIMEOUT, deadline=None):
+    """
+    Ask a running `git-recommend serve` daemon for a recommendation.
+
+    :param deadline: Seconds the daemon has to answer in (see `recommend_issue`)
+
+    :return: The result dict, or None when no daemon is listening (callers
+             then run the recommendation in-process)
+    :raises Exception: When the daemon is up but could not answer (e.g. closed issue),
+                       or did not answer within `timeout` (running the recommendation
+                       in-process as well would take at least as long again)
+    """
+    address = address or os.getenv("GIT_RECOMMEND_SERVER", DEFAULT_ADDRESS)
+    payload = {"repo": full_repo_name, "issue_number": issue_number}
+    if deadline is not None:
+        payload["deadline"] = deadline
+        timeout = min(timeout, deadline + DEADLINE_SLACK)
+    body = json.dumps(payload).encode("utf-8")
+    request = urllib.request.Request(f"http://{address}/recommend", data=body,
+                                     headers={"Content-Type": "application/json"})
+    timed_out = Exception(f"The git-recommend daemon at {address} did not answer within {timeout:g} seconds")
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        raise Exception(json.loads(e.read() or b"{}").get("error", f"daemon error {e.code}"))
+    except (TimeoutError, socket.timeout):
+        raise timed_out from None
+    except urllib.error.URLError as e:
+        if isinstance(e.reason, (TimeoutError, socket.timeout)):
+            raise timed_out from None
+        return None
+    except ConnectionError:
+        return None
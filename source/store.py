@@ -0,0 +1,269 @@
+import json
+import os
+import sqlite3
+import threading
+
+DEFAULT_STORE_PATH = os.path.join(os.getcwd(), "outputs", "metadata.sqlite3")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS issues (
+    repo        TEXT NOT NULL,
+    number      INTEGER NOT NULL,
+    state       TEXT,
+    title       TEXT,
+    body        TEXT,
+    created_at  TEXT,
+    updated_at  TEXT,
+    user        TEXT,
+    labels      TEXT,
+    PRIMARY KEY (repo, number)
+);
+CREATE TABLE IF NOT EXISTS pulls (
+    repo        TEXT NOT NULL,
+    number      INTEGER NOT NULL,
+    state       TEXT,
+    title       TEXT,
+    body        TEXT,
+    user        TEXT,
+    user_type   TEXT,
+    updated_at  TEXT,
+    PRIMARY KEY (repo, number)
+);
+CREATE INDEX IF NOT EXISTS pulls_updated ON pulls (repo, state, updated_at);
+CREATE TABLE IF NOT EXISTS commits (
+    repo        TEXT NOT NULL,
+    path        TEXT NOT NULL,
+    sha         TEXT NOT NULL,
+    login       TEXT,
+    name        TEXT,
+    date        TEXT,
+    message     TEXT,
+    PRIMARY KEY (repo, path, sha)
+);
+CREATE TABLE IF NOT EXISTS email_logins (
+    repo        TEXT NOT NULL,
+    email       TEXT NOT NULL,
+    login       TEXT,
+    PRIMARY KEY (repo, email)
+);
+CREATE TABLE IF NOT EXISTS sync_state (
+    repo        TEXT NOT NULL,
+    resource    TEXT NOT NULL,
+    high_water  TEXT,
+    depth       INTEGER DEFAULT 0,
+    PRIMARY KEY (repo, resource)
+);
+"""
+
+
+class MetadataStore:
+    """
+    Local SQLite copy of the issues, closed PRs and per-path commits of the
+    repositories we have looked at, plus a high-water mark per resource so the
+    next sync only asks GitHub for what changed since then.
+
+    Timestamps are kept as GitHub's ISO 8601 strings, which sort correctly as text.
+    """
+
+    def __init__(self, path=DEFAULT_STORE_PATH):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.executescript(SCHEMA)
+            # stores created before commit messages were kept
+            columns = {row['name'] for row in self._conn.execute("PRAGMA table_info(commits)")}
+            if 'message' not in columns:
+                self._conn.execute("ALTER TABLE commits ADD COLUMN message TEXT")
+
+    def close(self):
+        self._conn.close()
+
+    def _query(self, sql, args=()):
+        with self._lock:
+            return self._conn.execute(sql, args).fetchall()
+
+    def _write_many(self, sql, rows):
+        with self._lock, self._conn:
+            self._conn.executemany(sql, rows)
+
+    # sync state
+
+    def get_sync_state(self, repo, resource):
+        """Return `(high_water, depth)` for a resource, `(None, 0)` if never synced."""
+        rows = self._query(
+            "SELECT high_water, depth FROM sync_state WHERE repo = ? AND resource = ?",
+            (repo, resource))
+        if not rows:
+            return None, 0
+        return rows[0]["high_water"], rows[0]["depth"]
+
+    def set_sync_state(self, repo, resource, high_water, depth=0):
+        self._write_many(
+            "INSERT OR REPLACE INTO sync_state (repo, resource, high_water, depth) VALUES (?, ?, ?, ?)",
+            [(repo, resource, high_water, depth)])
+
+    # issues
+
+    def upsert_issues(self, repo, issues):
+        self._write_many(
+            "INSERT OR REPLACE INTO issues "
+            "(repo, number, state, title, body, created_at, updated_at, user, labels) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [(repo, i['number'], i['state'], i['title'], i.get('body'), i['created_at'],
+              i.get('updated_at'), i['user'], json.dumps(i.get('labels', [])))
+             for i in issues])
+
+    def get_issues(self, repo, state='open'):
+        sql = "SELECT * FROM issues WHERE repo = ?"
+        args = [repo]
+        if state != 'all':
+            sql += " AND state = ?"
+            args.append(state)
+        sql += " ORDER BY number DESC"
+        return [self._issue_from_row(row) for row in self._query(sql, args)]
+
+    def get_issue(self, repo, number):
+        """The stored issue `number`, or None if it was never fetched."""
+        rows = self._query("SELECT * FROM issues WHERE repo = ? AND number = ?", (repo, number))
+        return self._issue_from_row(rows[0]) if rows else None
+
+    def iter_issues(self, repo, state='open', batch_size=500):
+        """Like `get_issues`, but reads and yields the issues `batch_size` rows at a time."""
+        sql = "SELECT * FROM issues WHERE repo = ? AND number < ?"
+        states = []
+        if state != 'all':
+            sql += " AND state = ?"
+            states.append(state)
+        sql += " ORDER BY number DESC LIMIT ?"
+        below = float("inf")
+        while True:
+            rows = self._query(sql, [repo, below] + states + [batch_size])
+            for row in rows:
+                yield self._issue_from_row(row)
+            if len(rows) < batch_size:
+                return
+            below = rows[-1]['number']
+
+    @staticmethod
+    def _issue_from_row(row):
+        return {
+            'number': row['number'],
+            'state': row['state'],
+            'title': row['title'],
+            'body': row['body'],
+            'created_at': row['created_at'],
+            'updated_at': row['updated_at'],
+            'user': row['user'],
+            'labels': json.loads(row['labels'] or "[]"),
+        }
+
+    # pull requests
+
+    def upsert_pulls(self, repo, pulls):
+        self._write_many(
+            "INSERT OR REPLACE INTO pulls "
+            "(repo, number, state, title, body, user, user_type, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [(repo, p['number'], p['state'], p['title'], p.get('body'), p['user'],
+              p.get('user_type'), p['updated_at'])
+             for p in pulls])
+
+    def get_pulls(self, repo, state='closed', limit=None, since=None):
+        """Most recently updated PRs first, optionally only those updated at or after `since`."""
+        sql = "SELECT * FROM pulls WHERE repo = ? AND state = ?"
+        args = [repo, state]
+        if since is not None:
+            sql += " AND updated_at >= ?"
+            args.append(since)
+        sql += " ORDER BY updated_at DESC"
+        if limit is not None:
+            sql += " LIMIT ?"
+            args.append(limit)
+        return [dict(row) for row in self._query(sql, args)]
+
+    def iter_pulls(self, repo, state='closed', batch_size=2000):
+        """All PRs in `state`, by number, read `batch_size` at a time so they never all sit in memory."""
+        after = -1
+        while True:
+            batch = [dict(row) for row in self._query(
+                "SELECT * FROM pulls WHERE repo = ? AND state = ? AND number > ? ORDER BY number LIMIT ?",
+                (repo, state, after, batch_size))]
+            if not batch:
+                return
+            yield batch
+            after = batch[-1]['number']
+
+    def pull_stats(self, repo, state='closed'):
+        """`(count, latest updated_at)` of the stored PRs in `state`."""
+        row = self._query("SELECT COUNT(*), MAX(updated_at) FROM pulls WHERE repo = ? AND state = ?",
+                          (repo, state))[0]
+        return row[0], row[1]
+
+    def get_bot_logins(self, repo):
+        """Authors of stored PRs that the API reported as bots."""
+        return [row['user'] for row in self._query(
+            "SELECT DISTINCT user FROM pulls WHERE repo = ? AND user_type = 'Bot'", (repo,))]
+
+    # commits
+
+    def upsert_commits(self, repo, path, commits):
+        self._write_many(
+            "INSERT OR REPLACE INTO commits (repo, path, sha, login, name, date, message) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(repo, path, c['sha'], c['login'], c['name'], c['date'], c.get('message')) for c in commits])
+
+    def get_commits(self, repo, path, limit=None):
+        """Newest commits touching `path` first."""
+        sql = "SELECT sha, login, name, date FROM commits WHERE repo = ? AND path = ? ORDER BY date DESC"
+        args = [repo, path]
+        if limit is not None:
+            sql += " LIMIT ?"
+            args.append(limit)
+        return [dict(row) for row in self._query(sql, args)]
+
+    def get_email_logins(self, repo, emails):
+        """Logins looked up for commit author e-mails: email -> login, or None for no GitHub account."""
+        emails = list(emails)
+        found = {}
+        for start in range(0, len(emails), 500):
+            chunk = emails[start:start + 500]
+            marks = ",".join("?" * len(chunk))
+            for row in self._query(f"SELECT email, login FROM email_logins WHERE repo = ? AND email IN ({marks})",
+                                   [repo] + chunk):
+                found[row['email']] = row['login']
+        return found
+
+    def set_email_logins(self, repo, logins):
+        self._write_many("INSERT OR REPLACE INTO email_logins (repo, email, login) VALUES (?, ?, ?)",
+                         [(repo, email, login) for email, login in logins.items()])
+
+    def get_commits_after(self, repo, row=0, limit=None):
+        """
+        Commits of every path stored (or re-stored) after the commit with rowid
+        `row`, oldest write first, each with its `row` so the caller can resume
+        from the last one.
+        """
+        sql = ("SELECT rowid AS row, path, sha, login, name, date, message FROM commits "
+               "WHERE repo = ? AND rowid > ? ORDER BY rowid")
+        args = [repo, row]
+        if limit is not None:
+            sql += " LIMIT ?"
+            args.append(limit)
+        return [dict(row) for row in self._query(sql, args)]
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def get_default_store():
+    """Shared store used by the fetchers. The file location can be overridden with GIT_RECOMMEND_STORE."""
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = MetadataStore(os.getenv("GIT_RECOMMEND_STORE", DEFAULT_STORE_PATH))
+        return _default_store
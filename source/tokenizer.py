@@ -0,0 +1,187 @@
+import os
+import re
+import sqlite3
+import threading
+from array import array
+from functools import lru_cache
+
+DEFAULT_CACHE_PATH = os.path.join(os.getcwd(), "outputs", "token_cache.sqlite3")
+# bump when `code_tokens` changes, so cached token streams and indexes are rebuilt
+TOKENIZER_VERSION = 1
+
+_HTML_COMMENT = re.compile(r"<!--.*?-->", re.DOTALL)
+_FENCE = re.compile(r"^[ \t]*(?:```|~~~)[^\n]*$", re.MULTILINE)
+_MD_LINK = re.compile(r"!?\[([^\]]*)\]\([^)]*\)")
+_URL = re.compile(r"\bhttps?://\S+")
+_HTML_TAG = re.compile(r"</?[A-Za-z][^>]*>")
+_WORD = re.compile(r"[A-Za-z0-9]+(?:[._/\-][A-Za-z0-9]+)*")
+_SEPARATOR = re.compile(r"[._/\-]")
+_CAMEL = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|[0-9]+")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS vocab (
+    term_id  INTEGER PRIMARY KEY,
+    term     TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS streams (
+    repo        TEXT NOT NULL,
+    number      INTEGER NOT NULL,
+    updated_at  TEXT,
+    version     INTEGER NOT NULL,
+    ids         BLOB NOT NULL,
+    PRIMARY KEY (repo, number)
+);
+"""
+
+
+def strip_markdown(text):
+    """Drop HTML comments and tags, URLs, link targets and code-fence lines, keeping the prose and code."""
+    text = _HTML_COMMENT.sub(" ", text)
+    text = _FENCE.sub(" ", text)
+    text = _MD_LINK.sub(r"\1", text)
+    text = _URL.sub(" ", text)
+    return _HTML_TAG.sub(" ", text)
+
+
+@lru_cache(maxsize=65536)
+def split_identifier(word):
+    """
+    `word` lowercased, followed by its camelCase/snake_case/dotted/path parts
+    when it has more than one: "process_data" -> ("process_data", "process", "data").
+    """
+    parts = [part.lower() for piece in _SEPARATOR.split(word) for part in _CAMEL.findall(piece)]
+    if len(parts) > 1:
+        return (word.lower(), *parts)
+    return (word.lower(),)
+
+
+def code_tokens(text):
+    """Tokens of PR or issue text, with identifiers also split into their parts."""
+    tokens = []
+    for word in _WORD.findall(strip_markdown(text or "")):
+        tokens.extend(split_identifier(word))
+    return tokens
+
+
+class TokenCache:
+    """
+    Token streams of PRs, stored as arrays of interned term ids.
+
+    Each PR's stream is keyed by repository and number and only reused while
+    its `updated_at` and the tokenizer version are unchanged, so unchanged PRs
+    are never tokenized twice. Terms are interned into a vocabulary table
+    shared by all repositories, and by every process using the same file
+    (e.g. the daemon and a batch run): terms another process added are read
+    in when an id or term is not known here yet.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.executescript(SCHEMA)
+        self._ids = None
+        self._terms = None
+
+    def _load_vocab(self):
+        if self._ids is None:
+            self._ids = dict(self._conn.execute("SELECT term, term_id FROM vocab"))
+            self._terms = {term_id: term for term, term_id in self._ids.items()}
+
+    def _refresh_vocab(self):
+        """Read in the terms added (by other processes) since the vocabulary was loaded."""
+        newest = max(self._terms, default=0)
+        for term, term_id in self._conn.execute("SELECT term, term_id FROM vocab WHERE term_id > ?", (newest,)):
+            self._ids[term] = term_id
+            self._terms[term_id] = term
+
+    def _lookup(self, ids):
+        try:
+            return [self._terms[term_id] for term_id in ids]
+        except KeyError:
+            self._refresh_vocab()
+            return [self._terms[term_id] for term_id in ids]
+
+    def intern(self, tokens):
+        """Term ids of `tokens`, adding new terms to the vocabulary."""
+        with self._lock, self._conn:
+            self._load_vocab()
+            return self._intern(tokens)
+
+    def _intern(self, tokens):
+        ids = array("I")
+        for token in tokens:
+            term_id = self._ids.get(token)
+            if term_id is None:
+                # another process may have added it since the vocabulary was loaded
+                self._conn.execute("INSERT OR IGNORE INTO vocab (term) VALUES (?)", (token,))
+                term_id = self._conn.execute("SELECT term_id FROM vocab WHERE term = ?", (token,)).fetchone()[0]
+                self._ids[token] = term_id
+                self._terms[term_id] = token
+            ids.append(term_id)
+        return ids
+
+    def terms(self, ids):
+        with self._lock:
+            self._load_vocab()
+            return self._lookup(ids)
+
+    def vocabulary(self):
+        """Dict term id -> term."""
+        with self._lock:
+            self._load_vocab()
+            self._refresh_vocab()
+            return dict(self._terms)
+
+    def pull_token_ids(self, repo, pulls, text):
+        """
+        Token id arrays of PR records, tokenized only if not cached for their `updated_at`.
+
+        :param text: Function PR record -> text to tokenize on a cache miss
+        :return:     List of `array('I')`, in the order of `pulls`
+        """
+        pulls = list(pulls)
+        results = [None] * len(pulls)
+        with self._lock, self._conn:
+            self._load_vocab()
+            for i, pr in enumerate(pulls):
+                row = self._conn.execute(
+                    "SELECT ids FROM streams WHERE repo = ? AND number = ? AND updated_at IS ? AND version = ?",
+                    (repo, pr["number"], pr.get("updated_at"), TOKENIZER_VERSION)).fetchone()
+                if row is not None:
+                    results[i] = array("I", row[0])
+                    continue
+                ids = self._intern(code_tokens(text(pr)))
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO streams (repo, number, updated_at, version, ids) VALUES (?, ?, ?, ?, ?)",
+                    (repo, pr["number"], pr.get("updated_at"), TOKENIZER_VERSION, ids.tobytes()))
+                results[i] = ids
+        return results
+
+    def pull_tokens(self, repo, pulls, text):
+        """Like `pull_token_ids`, with the ids mapped back to terms."""
+        streams = self.pull_token_ids(repo, pulls, text)
+        with self._lock:
+            return [self._lookup(ids) for ids in streams]
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_default_token_cache():
+    """
+    Shared token cache. The location can be overridden with
+    GIT_RECOMMEND_TOKEN_CACHE; set GIT_RECOMMEND_TOKEN_CACHE=0 to disable it.
+    """
+    global _default_cache
+    location = os.getenv("GIT_RECOMMEND_TOKEN_CACHE", DEFAULT_CACHE_PATH)
+    if location == "0":
+        return None
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = TokenCache(location)
+        return _default_cache
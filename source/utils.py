@@ -1,9 +1,10 @@
 from urllib.parse import urlparse
 import json
 import re
-from prettytable import PrettyTable
 import textwrap
 
+from source.bot_classifier import BOT_PATTERNS, BotClassifier, get_default_classifier
+
 
 def parse_github_url(repo_url):
     parsed = urlparse(repo_url)
@@ -23,7 +24,9 @@ def parse_full_repo_name(full_repo_name: str):
                 "using letters, numbers, '_', '-' or '.'."
             )
         owner, repo = full_repo_name.split('/', 1)
-    except ValueError:
+        if {owner, repo} & {'.', '..'}:
+            raise ValueError("'.' and '..' are not repository names")
+    except (ValueError, TypeError):
         raise ValueError("Input must be in the format 'owner/repo'")
     url = f"https://www.github.com/{owner}/{repo}"
     return url, owner, repo
@@ -41,39 +44,33 @@ def extract_keywords_from_json_string(text):
         return data["keywords"], data["summary"]
     return []
 
+def extract_batch_results_from_json_string(text):
+    """
+    Parse the answer to a multi-issue prompt.
+
+    :return: Dict issue_number -> (keywords, summary)
+    """
+    match = re.search(r"```json\s*(\[.*\])\s*```", text, re.DOTALL)
+    json_str = match.group(1) if match else text[text.find("["):text.rfind("]") + 1]
+    results = {}
+    for entry in json.loads(json_str):
+        results[int(entry["issue_number"])] = (entry.get("keywords", []), entry.get("summary", ""))
+    return results
+
 
 def get_bot_patterns():
     """
     Returns a list of regex patterns matching common non-human GitHub usernames.
     """
-    return [
-        r".*bot$",            # ends with “bot”
-        r"^bot-.*",           # starts with “bot-”
-        r".*bot-.*",          # contains “bot-”
-        r".*\[bot\].*",          # contains “[bot]”
-        r"dependabot.*",      # GitHub Dependabot
-        r".*dependabot-.*",
-        r".*[-_.]ci([-_.].*)?$",  # ci, .ci, -ci, _ci
-        r".*actions?$",       # action or actions
-        r"^web-flow$",        # GitHub’s web-flow alias
-        r"^github-actions$",  # official GH Actions bot
-        r".*automation.*",    # generic automation
-        r"^pre-?commit$",     # pre-commit integrations
-        r".*travis.*",        # Travis CI
-        r".*circleci.*",      # CircleCI
-        r".*mergify.*",       # Mergify
-    ]
+    return list(BOT_PATTERNS)
 
 def is_bot_user(username, patterns=None):
     """
     Returns True if `username` matches any known bot/non-human pattern.
     """
     if patterns is None:
-        patterns = get_bot_patterns()
-    for pat in patterns:
-        if re.match(pat, username, re.IGNORECASE):
-            return True
-    return False
+        return get_default_classifier().is_bot(username)
+    return BotClassifier(patterns).is_bot(username)
 
 def filter_human_users(user_list, patterns=None):
     """
@@ -83,7 +80,13 @@ def filter_human_users(user_list, patterns=None):
     :param patterns:   Optional override list of regex patterns
     :return:           List[str] containing only likely human usernames
     """
-    return [u for u in user_list if not is_bot_user(u, patterns)]
+    if patterns is not None:
+        return BotClassifier(patterns).filter_humans(user_list)
+    classifier = get_default_classifier()
+    humans = classifier.filter_humans(user_list)
+    # atexit does not run on every exit (os._exit after a --deadline run, a crashed daemon)
+    classifier.save()
+    return humans
 
 def create_link_in_print(uri, label=None):
     if label is None:
@@ -105,6 +108,8 @@ def print_issue_pretty(issue, wrap_width=60):
       - summary (str)
     wrap_width: max characters per line in the Value column
     """
+    from prettytable import PrettyTable
+
     # 1. Prepare the table
     table = PrettyTable()
     table.field_names = ["Field", "Value"]
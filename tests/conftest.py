@@ -0,0 +1,50 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "benchmarks")]
+
+
+@pytest.fixture
+def stand_in():
+    """Start a `StandInGitHub` for a fixture; stopped after the test."""
+    from stand_in import StandInGitHub
+
+    servers = []
+
+    def start(fixture, **kwargs):
+        server = StandInGitHub(fixture, **kwargs).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.stop()
+
+
+@pytest.fixture
+def client_for():
+    """A `GitHubClient` talking to a stand-in, without the on-disk cache."""
+    from source.github_client import GitHubClient
+
+    def make(server, token="test-token"):
+        return GitHubClient(token, api_url=server.url)
+
+    return make
+
+
+@pytest.fixture
+def use_client(client_for, monkeypatch):
+    """Route `source.github` (and the GraphQL helpers) through a client of the given stand-in."""
+    import source.github as github
+    import source.github_graphql as github_graphql
+
+    def use(server):
+        client = client_for(server)
+        for module in (github, github_graphql):
+            monkeypatch.setattr(module, "get_client", lambda token=None: client)
+        return client
+
+    return use
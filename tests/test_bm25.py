@@ -0,0 +1,67 @@
+import pytest
+
+from source.batch_scoring import BatchScorer
+from source.bm25_index import BM25Index, tokenize, update_index_from_store
+from source.store import MetadataStore
+
+
+def pull(number, user, title, body, updated_at):
+    return {"number": number, "state": "closed", "title": title, "body": body, "user": user,
+            "user_type": "User", "updated_at": updated_at}
+
+
+FIRST = [pull(1, "alice", "Fix parser crash", "ConfigLoader.load raises KeyError", "2025-01-01T00:00:00Z"),
+         pull(2, "bob", "Speed up lexer", "tokenize in one pass", "2025-01-02T00:00:00Z"),
+         pull(3, "carol", "Docs for parser", "", "2025-01-03T00:00:00Z")]
+LATER = [pull(2, "bob", "Fix lexer crash", "lexer crashed on empty input", "2025-02-01T00:00:00Z"),
+         pull(4, "alice", "Parser docs", "document ConfigLoader", "2025-02-02T00:00:00Z"),
+         pull(5, "dave", "Crash in tokenize", "", "2025-02-03T00:00:00Z")]
+
+QUERIES = [tokenize(q) for q in ("parser crash", "lexer tokenize", "ConfigLoader docs", "unrelated")]
+
+
+@pytest.fixture(autouse=True)
+def no_token_cache(monkeypatch):
+    monkeypatch.setenv("GIT_RECOMMEND_TOKEN_CACHE", "0")
+
+
+def index_of(store):
+    index = BM25Index(":memory:")
+    update_index_from_store(index, store, "o/r")
+    return index
+
+
+def test_incremental_update_matches_a_rebuild():
+    store = MetadataStore(":memory:")
+    store.upsert_pulls("o/r", FIRST)
+    incremental = index_of(store)
+    store.upsert_pulls("o/r", LATER)
+    update_index_from_store(incremental, store, "o/r")
+    rebuilt = index_of(store)
+
+    # same N and total length, so the same avgdl, and the same document frequencies, so the same idf
+    assert incremental.stats("o/r") == rebuilt.stats("o/r")
+    assert incremental.export("o/r") == rebuilt.export("o/r")
+    for query in QUERIES:
+        assert incremental.score("o/r", query) == pytest.approx(rebuilt.score("o/r", query))
+
+
+def test_batch_scores_match_the_index():
+    store = MetadataStore(":memory:")
+    store.upsert_pulls("o/r", FIRST + LATER)
+    index = index_of(store)
+    scorer = BatchScorer.from_index(index, "o/r")
+    matrix = scorer.score(QUERIES).toarray()
+    author_matrix = (scorer.A @ scorer.score(QUERIES)).toarray()
+
+    for j, query in enumerate(QUERIES):
+        expected = {doc_id: score for doc_id, (score, _) in index.score("o/r", query).items()}
+        batch = {doc_id: matrix[i, j] for i, doc_id in enumerate(scorer.doc_ids) if matrix[i, j]}
+        assert batch == pytest.approx(expected)
+
+        totals = {}
+        for score, author in index.score("o/r", query).values():
+            totals[author] = totals.get(author, 0.0) + score
+        by_author = {author: author_matrix[i, j] for i, author in enumerate(scorer.authors) if author_matrix[i, j]}
+        assert by_author == pytest.approx(totals)
+        assert set(scorer.top_authors([query], top_n=10)[0]) == set(totals)
@@ -0,0 +1,37 @@
+import sqlite3
+
+import pytest
+
+import source.bot_classifier as bot_classifier
+from source.bot_classifier import BotClassifier, get_default_classifier, save_default_classifier
+from source.utils import filter_human_users
+
+
+@pytest.fixture
+def cache_path(tmp_path, monkeypatch):
+    path = str(tmp_path / "bots.sqlite3")
+    monkeypatch.setenv("GIT_RECOMMEND_BOT_CACHE", path)
+    monkeypatch.setattr(bot_classifier, "_default_classifier", None)
+    return path
+
+
+def saved(path):
+    with sqlite3.connect(path) as conn:
+        return dict(conn.execute("SELECT login, source FROM verdicts"))
+
+
+def test_filter_human_users_saves_without_waiting_for_exit(cache_path):
+    assert filter_human_users(["alice", "renovate-bot", "github-actions"]) == ["alice"]
+    verdicts = saved(cache_path)
+    assert set(verdicts) == {"alice", "renovate-bot", "github-actions"}
+
+    reopened = BotClassifier(path=cache_path)
+    assert reopened.filter_humans(["alice", "renovate-bot"]) == ["alice"]
+
+
+def test_api_reported_bots_are_saved_on_request(cache_path):
+    save_default_classifier()  # never used: nothing to do
+    get_default_classifier().add_bots(["snyk-helper"])
+    save_default_classifier()
+    assert saved(cache_path) == {"snyk-helper": "type"}
+    assert BotClassifier(path=cache_path).is_bot("snyk-helper")
@@ -0,0 +1,69 @@
+import hashlib
+
+from source.code_search import CodeIndex, parse_query, plan_queries
+
+
+class FakeMirror:
+    """The part of `GitMirror` the index reads: a head and the files at it."""
+
+    def __init__(self, files):
+        self.files = files
+
+    def update(self):
+        pass
+
+    def head(self):
+        return hashlib.sha1(repr(sorted(self.files.items())).encode()).hexdigest()
+
+    def list_files(self, head):
+        return [(path, self._sha(data), len(data)) for path, data in self.files.items()]
+
+    def read_blobs(self, paths_by_blob):
+        blobs = {self._sha(data): data for data in self.files.values()}
+        return [(sha, blobs[sha]) for sha in paths_by_blob]
+
+    @staticmethod
+    def _sha(data):
+        return hashlib.sha1(data).hexdigest()
+
+
+def paths(result):
+    return [item["path"] for item in result["items"]]
+
+
+def test_terms_match_paths_through_the_path_trigrams():
+    mirror = FakeMirror({"src/tokenizer.py": b"def split(text):\n    return text.split()\n",
+                         "src/parser.py": b"def parse(tokens):\n    return tokens\n",
+                         "docs/notes.py": b"# nothing here\n"})
+    index = CodeIndex(":memory:", mirror)
+
+    assert paths(index.search("tokenizer in:file,path")) == ["src/tokenizer.py"]
+    assert paths(index.search("parse")) == ["src/parser.py"]
+    assert paths(index.search("notes OR tokens")) == ["docs/notes.py", "src/parser.py"]
+
+    del mirror.files["src/tokenizer.py"]
+    mirror.files["lib/tokenizer_v2.py"] = b"x = 1\n"
+    index.update()
+    assert paths(index.search("tokenizer")) == ["lib/tokenizer_v2.py"]
+
+
+def test_short_terms_do_not_select_every_file():
+    mirror = FakeMirror({f"src/module_{i}.py": b"x = 1\n" for i in range(50)})
+    mirror.files["src/cache.py"] = b"def get(key):\n    return store[key]\n"
+    index = CodeIndex(":memory:", mirror)
+
+    assert index.search("x") == {"total_count": 0, "items": []}
+    assert paths(index.search("key x")) == []
+    assert paths(index.search("store get")) == ["src/cache.py"]
+
+
+def test_plan_queries_packs_keywords_into_or_groups():
+    queries = plan_queries(["parser", "token stream", "lexer"])
+    assert queries == ['parser OR "token stream" OR lexer']
+    assert parse_query(queries[0]) == [["parser"], ["token stream"], ["lexer"]]
+
+
+def test_plan_queries_quotes_keywords_that_read_as_syntax():
+    queries = plan_queries(["repo:evil/x", "-verbose", "OR", "tab\tseparated", 'say "hi"', "plain"])
+    assert queries == ['"repo:evil/x" OR "-verbose" OR "OR" OR "tab separated" OR "say hi" OR plain']
+    assert parse_query(queries[0]) == [["repo:evil/x"], ["-verbose"], ["or"], ["tab separated"], ["say hi"], ["plain"]]
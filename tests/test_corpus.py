@@ -0,0 +1,99 @@
+import numpy as np
+
+import source.corpus as corpus_module
+from source.batch_scoring import BatchScorer
+from source.corpus import load_corpus
+from source.store import MetadataStore
+from source.tokenizer import TokenCache
+
+
+def pull(number, user, title, updated_at, state="closed"):
+    return {"number": number, "state": state, "title": title, "body": "", "user": user,
+            "user_type": "User", "updated_at": updated_at}
+
+
+def scores(corpus, queries):
+    scorer = BatchScorer.from_corpus(corpus)
+    matrix = scorer.score(queries).toarray()
+    return {number: tuple(row) for number, row in zip(scorer.doc_ids, matrix)}, scorer.top_authors(queries)
+
+
+def fresh(store, tmp_path, name):
+    corpus_module._corpora.clear()
+    return load_corpus(store, "o/r", TokenCache(":memory:"), base_dir=str(tmp_path / name))
+
+
+QUERIES = [["parser"], ["lexer", "crash"], ["docs"]]
+
+
+def test_changes_are_appended_and_score_like_a_rebuild(tmp_path, monkeypatch):
+    store = MetadataStore(":memory:")
+    store.upsert_pulls("o/r", [pull(1, "alice", "Fix parser crash", "2025-01-01T00:00:00Z"),
+                               pull(2, "bob", "Speed up lexer", "2025-01-02T00:00:00Z"),
+                               pull(3, "carol", "Docs for parser", "2025-01-03T00:00:00Z")])
+    token_cache = TokenCache(":memory:")
+    base_dir = str(tmp_path / "incremental")
+    first = load_corpus(store, "o/r", token_cache, base_dir=base_dir)
+    assert len(first) == 3
+
+    store.upsert_pulls("o/r", [pull(2, "bob", "Fix lexer crash", "2025-02-01T00:00:00Z"),
+                               pull(4, "dave", "Parser docs", "2025-02-02T00:00:00Z")])
+    reads = []
+    monkeypatch.setattr(store, "iter_pulls", lambda *a, **kw: reads.append(a) or iter(()))
+    updated = load_corpus(store, "o/r", token_cache, base_dir=base_dir)
+    assert not reads  # appended, not rebuilt
+    assert len(updated) == 5 and updated.dead.tolist() == [1]
+    assert updated.numbers[:3].tolist() == first.numbers.tolist()
+    assert load_corpus(store, "o/r", token_cache, base_dir=base_dir) is updated
+
+    monkeypatch.undo()
+    assert scores(updated, QUERIES) == scores(fresh(store, tmp_path, "rebuilt"), QUERIES)
+
+
+def test_rebuilt_when_a_pull_leaves_the_closed_set(tmp_path):
+    store = MetadataStore(":memory:")
+    store.upsert_pulls("o/r", [pull(n, "alice", f"Change {n}", f"2025-01-0{n}T00:00:00Z") for n in (1, 2, 3)])
+    base_dir = str(tmp_path / "corpus")
+    token_cache = TokenCache(":memory:")
+    load_corpus(store, "o/r", token_cache, base_dir=base_dir)
+
+    store.upsert_pulls("o/r", [pull(2, "alice", "Change 2", "2025-03-01T00:00:00Z", state="open")])
+    corpus = load_corpus(store, "o/r", token_cache, base_dir=base_dir)
+    assert sorted(corpus.numbers.tolist()) == [1, 3] and len(corpus.dead) == 0
+
+
+def test_half_written_append_is_discarded(tmp_path):
+    store = MetadataStore(":memory:")
+    store.upsert_pulls("o/r", [pull(1, "alice", "Fix parser", "2025-01-01T00:00:00Z")])
+    base_dir = str(tmp_path / "corpus")
+    token_cache = TokenCache(":memory:")
+    corpus = load_corpus(store, "o/r", token_cache, base_dir=base_dir)
+    with open(f"{corpus.directory}/numbers.bin", "ab") as f:
+        f.write(np.int64(99).tobytes())  # a crash after writing some of the files
+
+    store.upsert_pulls("o/r", [pull(2, "bob", "Fix lexer", "2025-01-02T00:00:00Z")])
+    corpus = load_corpus(store, "o/r", token_cache, base_dir=base_dir)
+    assert corpus.numbers.tolist() == [1, 2]
+    assert list(corpus.authors) == ["alice", "bob"]
+
+
+def test_appends_from_another_process_are_kept(tmp_path, monkeypatch):
+    store = MetadataStore(":memory:")
+    store.upsert_pulls("o/r", [pull(1, "alice", "Fix parser", "2025-01-01T00:00:00Z")])
+    base_dir = str(tmp_path / "corpus")
+    token_cache = TokenCache(":memory:")
+    load_corpus(store, "o/r", token_cache, base_dir=base_dir)
+
+    # another process (with its own in-memory state) appends a PR by a new author
+    mine = corpus_module._corpora
+    monkeypatch.setattr(corpus_module, "_corpora", {})
+    store.upsert_pulls("o/r", [pull(2, "bob", "Fix lexer", "2025-01-02T00:00:00Z")])
+    load_corpus(store, "o/r", TokenCache(":memory:"), base_dir=base_dir)
+    monkeypatch.setattr(corpus_module, "_corpora", mine)
+
+    store.upsert_pulls("o/r", [pull(3, "carol", "Fix docs", "2025-01-03T00:00:00Z")])
+    corpus = load_corpus(store, "o/r", token_cache, base_dir=base_dir)
+    assert corpus.numbers.tolist() == [1, 2, 3]
+    assert [corpus.authors[i] for i in corpus.author_ids] == ["alice", "bob", "carol"]
+    assert [[corpus.terms[t] for t in corpus.token_ids[corpus.token_offsets[i]:corpus.token_offsets[i + 1]]]
+            for i in range(3)] == [["fix", "parser"], ["fix", "lexer"], ["fix", "docs"]]
@@ -0,0 +1,133 @@
+from stand_in import StubModel
+
+from source.extraction_engine import ExtractionEngine, RequestLimiter
+from source.issue_file import IssueFile, write_issues_jsonl
+from source.llm_cache import ExtractionCache
+
+
+def issue(number):
+    return {"number": number, "title": f"Crash in parse_config_{number}",
+            "body": f"Calling ConfigLoader.load_{number} raises KeyError", "labels": ["bug"]}
+
+
+class FakeClock:
+    """Clock and sleep for `RequestLimiter`: sleeping only moves the clock."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def engine(model, batch_size=1, limiter=None, cache=None, max_workers=2):
+    return ExtractionEngine(client=model, batch_size=batch_size, max_workers=max_workers,
+                            limiter=limiter or RequestLimiter(rpm=1000, tpm=10 ** 9),
+                            cache=cache or ExtractionCache(":memory:"))
+
+
+def test_issues_are_packed_into_batches():
+    model = StubModel()
+    results = engine(model, batch_size=4).extract_many([issue(n) for n in range(1, 11)])
+
+    assert model.calls == 3
+    assert sorted(results) == list(range(1, 11))
+    for number, (keywords, summary, _) in results.items():
+        assert f"parse_config_{number}" in keywords
+        assert summary == "Synthetic summary."
+
+
+def test_cached_issues_never_reach_the_model():
+    cache = ExtractionCache(":memory:")
+    first = StubModel()
+    engine(first, batch_size=5, cache=cache).extract_many([issue(n) for n in range(1, 6)])
+
+    second = StubModel()
+    results = engine(second, batch_size=5, cache=cache).extract_many([issue(n) for n in range(1, 8)])
+    assert second.calls == 1  # only issues 6 and 7, in one batch
+    assert sorted(results) == list(range(1, 8))
+
+
+class ForgetfulModel(StubModel):
+    """Leaves the last issue out of every multi-issue answer."""
+
+    def generate_content(self, prompt):
+        response = super().generate_content(prompt)
+        if prompt.count("### Issue") > 1:
+            text = response.text
+            response.text = text[:text.rindex(", {")] + "]\n```"
+        return response
+
+
+def test_issues_missing_from_a_batch_answer_are_retried_alone():
+    model = ForgetfulModel()
+    results = engine(model, batch_size=3).extract_many([issue(n) for n in (1, 2, 3)])
+
+    assert model.calls == 2
+    assert all(result for result in results.values())
+
+
+def test_limiter_spaces_requests_to_the_rpm():
+    clock = FakeClock()
+    limiter = RequestLimiter(rpm=2, tpm=10 ** 9, sleep=clock.sleep, clock=clock)
+    limiter.acquire(10)
+    limiter.acquire(10)
+    assert clock.sleeps == []
+    limiter.acquire(10)
+    assert clock.now >= 60
+
+
+def test_limiter_holds_requests_over_the_tpm():
+    clock = FakeClock()
+    limiter = RequestLimiter(rpm=100, tpm=1000, sleep=clock.sleep, clock=clock)
+    limiter.acquire(600)
+    clock.now = 30
+    limiter.acquire(300)
+    assert clock.sleeps == []
+    limiter.acquire(300)  # 1200 tokens in the minute: wait until the first request leaves the window
+    assert clock.now >= 60
+    limiter.acquire(5000)  # larger than the budget on its own: capped, so it still goes through
+    assert clock.now >= 90
+
+
+def test_engine_requests_go_through_the_limiter():
+    clock = FakeClock()
+    model = StubModel()
+    limiter = RequestLimiter(rpm=2, tpm=10 ** 9, sleep=clock.sleep, clock=clock)
+    # one worker: the fake clock is not meant to be shared between threads
+    engine(model, limiter=limiter, max_workers=1).extract_many([issue(n) for n in (1, 2, 3, 4)])
+
+    assert model.calls == 4
+    assert clock.now >= 60  # four requests at two per minute
+
+
+def test_issues_are_read_lazily(tmp_path):
+    filename = str(tmp_path / "issues.jsonl")
+    write_issues_jsonl((issue(n) for n in range(1, 101)), filename)
+    issues = IssueFile(filename)
+
+    read = []
+
+    def reading():
+        for i in issues:
+            read.append(i["number"])
+            yield i
+
+    extraction = engine(StubModel(), max_workers=2).iter_extract(reading())
+    next(extraction)
+    assert len(read) <= 2 * 2 + 1  # one window of chunks in flight, not the whole file
+    assert len(list(extraction)) == 99
+
+
+def test_selection_reads_only_the_selected_issues(tmp_path):
+    filename = str(tmp_path / "issues.jsonl")
+    write_issues_jsonl((issue(n) for n in range(1, 11)), filename)
+    selection = IssueFile(filename).select([7, 3, 42])
+
+    assert len(selection) == 2
+    assert [i["number"] for i in selection] == [7, 3]
@@ -0,0 +1,51 @@
+import source.get_contributor_from_file_changes as file_changes
+from source.get_contributor_from_file_changes import rank_contributors, search_keywords
+
+
+class BudgetClient:
+    """`get_client` stand-in with a fixed code search budget left."""
+
+    def __init__(self, remaining):
+        self._remaining = remaining
+
+    def remaining(self, resource="core"):
+        assert resource == "code_search"
+        return self._remaining
+
+    def map(self, fn, items):
+        return [fn(item) for item in items]
+
+
+KEYWORDS = [f"keyword_{i}_{'x' * 40}" for i in range(18)]  # more than MAX_SEARCH_QUERIES queries' worth
+
+
+def run(monkeypatch, remaining):
+    monkeypatch.setattr(file_changes, "get_client", lambda token=None: BudgetClient(remaining))
+    queries = []
+
+    def search(token, query, owner, repo):
+        queries.append(query)
+        return {"items": [{"path": f"src/{len(queries)}.py"}]}
+
+    search_keywords("token", KEYWORDS, "o", "r", search=search)
+    return queries
+
+
+def test_fan_out_follows_the_search_budget(monkeypatch):
+    assert len(run(monkeypatch, 100)) == 3
+    assert len(run(monkeypatch, None)) == 3  # budget not known yet
+    low = run(monkeypatch, 2)
+    assert len(low) == 2 and KEYWORDS[0] in low[0]
+    assert len(run(monkeypatch, 0)) == 1
+
+
+def test_authors_without_a_login_are_ranked_by_name(monkeypatch):
+    monkeypatch.setattr(file_changes, "filter_human_users", lambda users: users)
+
+    def list_commits(owner, repo, paths, token=None, commit_limit=100):
+        return [[{"login": None, "name": "Jane Doe", "date": "2024-05-02T00:00:00Z"},
+                 {"login": None, "name": "Jane Doe", "date": "2024-05-01T00:00:00Z"},
+                 {"login": "alice", "name": "Alice", "date": "2024-04-01T00:00:00Z"}]]
+
+    ranked = rank_contributors("token", "o", "r", ["src/parser.py"], list_commits=list_commits)
+    assert ranked == ["Jane Doe", "alice"]
@@ -0,0 +1,118 @@
+import os
+import subprocess
+
+import pytest
+
+import source.git_mirror as git_mirror
+import source.github as github
+from source.git_mirror import GitMirror
+from source.store import MetadataStore
+
+
+def git(cwd, *args, email="1234+alice@users.noreply.github.com", name="Alice"):
+    env = {"GIT_AUTHOR_NAME": name, "GIT_AUTHOR_EMAIL": email, "GIT_COMMITTER_NAME": name,
+           "GIT_COMMITTER_EMAIL": email, "HOME": str(cwd), "PATH": os.environ["PATH"]}
+    return subprocess.run(["git", *args], cwd=cwd, env=env, check=True, capture_output=True, text=True).stdout
+
+
+def commit(repo, path, content, message, **author):
+    file = repo / path
+    file.parent.mkdir(parents=True, exist_ok=True)
+    file.write_text(content)
+    git(repo, "add", path, **author)
+    git(repo, "commit", "-q", "-m", message, **author)
+    return git(repo, "rev-parse", "HEAD").strip()
+
+
+@pytest.fixture
+def origin(tmp_path):
+    repo = tmp_path / "origin"
+    repo.mkdir()
+    git(repo, "init", "-q", "-b", "main")
+    first = commit(repo, "src/parser.py", "x = 1\n", "Add parser\n\nlong body")
+    second = commit(repo, "src/lexer.py", "y = 2\n", "Add lexer", email="jane@example.com", name="Jane Doe")
+    third = commit(repo, "src/parser.py", "x = 3\n", "Speed up parser", email="jane@example.com", name="Jane Doe")
+    return repo, [first, second, third]
+
+
+@pytest.fixture
+def mirror(origin, tmp_path):
+    return GitMirror("o", "r", url=str(origin[0]), base_dir=str(tmp_path / "mirrors"))
+
+
+def test_path_commits_newest_first_with_login_from_noreply(origin, mirror):
+    _, (first, _, third) = origin
+    commits = mirror.path_commits("src/parser.py")
+    assert [c["sha"] for c in commits] == [third, first]
+    assert commits[0]["login"] is None and commits[0]["email"] == "jane@example.com"
+    assert commits[0]["name"] == "Jane Doe" and commits[0]["message"] == "Speed up parser"
+    assert commits[1]["login"] == "alice" and commits[1]["message"] == "Add parser"
+    assert mirror.path_commits("src/parser.py", limit=1)[0]["sha"] == third
+
+
+def test_history_lists_touched_paths_and_resumes_after_a_commit(origin, mirror):
+    _, (first, second, third) = origin
+    history = mirror.history()
+    assert [(c["sha"], c["paths"]) for c in history] == [
+        (third, ["src/parser.py"]), (second, ["src/lexer.py"]), (first, ["src/parser.py"])]
+    assert [c["sha"] for c in mirror.history(since=second)] == [third]
+
+
+def test_mirror_holds_branches_but_not_pull_request_refs(origin, mirror):
+    repo, (_, _, third) = origin
+    git(repo, "update-ref", "refs/pull/1/head", third)
+    mirror.update()
+    assert git(mirror.path, "for-each-ref", "--format=%(refname)").split() == ["refs/heads/main"]
+
+    fourth = commit(repo, "src/lexer.py", "y = 4\n", "Fix lexer")
+    git(repo, "update-ref", "refs/pull/2/head", fourth)
+    mirror.update(force=True)
+    assert git(mirror.path, "config", "remote.origin.fetch").strip() == "+refs/heads/*:refs/heads/*"
+    assert git(mirror.path, "for-each-ref", "--format=%(refname)").split() == ["refs/heads/main"]
+    assert mirror.head() == fourth
+
+
+def test_token_only_reaches_clone_and_fetch_through_the_environment(monkeypatch, tmp_path):
+    calls = []
+
+    def run(cmd, cwd=None, capture_output=None, text=None, env=None):
+        calls.append((cmd, env))
+        return subprocess.CompletedProcess(cmd, 0, "", "")
+
+    monkeypatch.setattr(git_mirror.subprocess, "run", run)
+    mirror = GitMirror("o", "r", token="secret-token", base_dir=str(tmp_path))
+    mirror._git("log", "HEAD")
+    mirror._git("fetch", "origin", auth=True)
+
+    (log_cmd, log_env), (fetch_cmd, fetch_env) = calls
+    assert log_env is None
+    assert not any("secret" in arg or "Authorization" in arg for arg in log_cmd + fetch_cmd)
+    assert fetch_env["GIT_CONFIG_KEY_0"] == "http.extraHeader"
+    assert fetch_env["GIT_CONFIG_VALUE_0"].startswith("Authorization: Basic ")
+
+
+def test_resolve_commit_logins_asks_once_per_email(stand_in, client_for, monkeypatch):
+    fixture = {"repo": "o/r", "issues": [], "pulls": [], "files": {}, "commits": {"src/a.py": [
+        {"sha": "aa11", "author": {"login": "jane"},
+         "commit": {"author": {"name": "Jane Doe", "date": "2024-01-01T00:00:00Z"}, "message": "x"}},
+        {"sha": "bb22", "author": None,
+         "commit": {"author": {"name": "Nobody", "date": "2024-01-02T00:00:00Z"}, "message": "y"}},
+    ]}}
+    server = stand_in(fixture)
+    client = client_for(server)
+    monkeypatch.setattr(github, "get_client", lambda token=None: client)
+    store = MetadataStore(":memory:")
+
+    def records():
+        return [{"sha": "aa11", "login": None, "name": "Jane Doe", "email": "jane@example.com"},
+                {"sha": "aa11", "login": None, "name": "Jane Doe", "email": "jane@example.com"},
+                {"sha": "bb22", "login": None, "name": "Nobody", "email": "nobody@example.com"},
+                {"sha": "cc33", "login": "alice", "name": "Alice", "email": "1+alice@users.noreply.github.com"}]
+
+    resolved = github.resolve_commit_logins("o", "r", records(), store=store)
+    assert [c["login"] for c in resolved] == ["jane", "jane", None, "alice"]
+    assert server.stats()["commit"]["requests"] == 2
+
+    again = github.resolve_commit_logins("o", "r", records(), store=store)
+    assert [c["login"] for c in again] == ["jane", "jane", None, "alice"]
+    assert server.stats()["commit"]["requests"] == 2
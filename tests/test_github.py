@@ -0,0 +1,117 @@
+import pytest
+
+import source.github as github
+from source.store import MetadataStore
+
+
+def history(path, count, start_day=1):
+    commits = []
+    for j in range(count):
+        day, hour = divmod(j, 24)
+        commits.append({
+            "sha": f"{path}-{j}", "author": {"login": f"dev{j % 5}"},
+            "commit": {"author": {"name": f"Developer {j % 5}",
+                                  "date": f"2024-{1 + (start_day + day) // 28:02d}-{1 + (start_day + day) % 28:02d}"
+                                          f"T{hour:02d}:00:00Z"},
+                       "message": f"Change {j}"},
+        })
+    return sorted(commits, key=lambda c: c["commit"]["author"]["date"], reverse=True)
+
+
+def test_incremental_path_sync_follows_every_page(stand_in, use_client):
+    fixture = {"repo": "o/r", "issues": [], "pulls": [], "files": {},
+               "commits": {"src/a.py": history("src/a.py", 250)}}
+    server = stand_in(fixture)
+    use_client(server)
+    store = MetadataStore(":memory:")
+    store.set_sync_state("o/r", "commits:src/a.py", "2023-12-31T00:00:00Z", 100)
+
+    github.sync_path_commits("o", "r", "src/a.py", store=store)
+
+    assert len(store.get_commits("o/r", "src/a.py")) == 250
+    assert server.stats()["commits"]["requests"] == 3
+    assert store.get_sync_state("o/r", "commits:src/a.py")[0] == fixture["commits"]["src/a.py"][0]["commit"]["author"]["date"]
+
+
+def test_first_path_sync_fetches_one_page(stand_in, use_client):
+    fixture = {"repo": "o/r", "issues": [], "pulls": [], "files": {},
+               "commits": {"src/a.py": history("src/a.py", 250)}}
+    server = stand_in(fixture)
+    use_client(server)
+    store = MetadataStore(":memory:")
+
+    github.sync_path_commits("o", "r", "src/a.py", commit_limit=100, store=store)
+
+    assert len(store.get_commits("o/r", "src/a.py")) == 100
+    assert server.stats()["commits"]["requests"] == 1
+
+
+class NoBots:
+    def add_bots(self, logins):
+        pass
+
+
+def test_graphql_pulls_are_paged_then_synced_incrementally(stand_in, use_client, monkeypatch):
+    from stand_in import synthetic_fixture
+
+    monkeypatch.setattr(github, "BACKEND", "graphql")
+    monkeypatch.setattr(github, "get_default_classifier", lambda: NoBots())
+    fixture = synthetic_fixture(300, issue_count=1, repo="o/r")
+    server = stand_in(fixture)
+    use_client(server)
+    store = MetadataStore(":memory:")
+
+    github.sync_closed_pulls("o", "r", token="test-token", pr_count=250, store=store)
+    stored = store.get_pulls("o/r", state="closed")
+    assert len(stored) >= 250
+    assert {pr["number"] for pr in stored} >= {pr["number"] for pr in server.pulls[:250]}
+    assert server.stats()["graphql:pulls"]["requests"] == 3
+    assert "pulls" not in server.stats()  # no REST fallback
+
+    github.sync_closed_pulls("o", "r", token="test-token", pr_count=250, store=store)
+    assert server.stats()["graphql:pulls"]["requests"] == 4  # nothing newer: one page settles it
+
+
+def test_graphql_path_histories_are_batched(stand_in, use_client, monkeypatch):
+    from stand_in import synthetic_fixture
+
+    monkeypatch.setattr(github, "BACKEND", "graphql")
+    monkeypatch.setattr(github, "COMMITS_BACKEND", "api")
+    fixture = synthetic_fixture(50, issue_count=1, repo="o/r")
+    paths = sorted(fixture["commits"])[:25]
+    server = stand_in(fixture)
+    use_client(server)
+    store = MetadataStore(":memory:")
+
+    histories = github.list_paths_commits("o", "r", paths, token="test-token", commit_limit=10, store=store)
+    assert server.stats()["graphql:history"]["requests"] == 3  # 10 paths per query
+    assert "commits" not in server.stats()
+    for path, commits in zip(paths, histories):
+        assert [c["sha"] for c in commits] == [c["sha"] for c in fixture["commits"][path][:10]]
+
+    again = github.list_paths_commits("o", "r", paths, token="test-token", commit_limit=10, store=store)
+    assert again == histories
+    assert server.stats()["graphql:history"]["requests"] == 6
+
+
+def test_rest_pull_pages_are_stored_as_they_arrive(stand_in, use_client, monkeypatch):
+    from stand_in import synthetic_fixture
+
+    monkeypatch.setattr(github, "BACKEND", "rest")
+    monkeypatch.setattr(github, "get_default_classifier", lambda: NoBots())
+    client = use_client(stand_in(synthetic_fixture(300, issue_count=1, repo="o/r")))
+    get = client.get
+
+    def failing_third_page(path, params=None, **kwargs):
+        if path.endswith("/pulls") and params.get("page") == 3:
+            raise ConnectionError("connection reset")
+        return get(path, params=params, **kwargs)
+
+    monkeypatch.setattr(client, "get", failing_third_page)
+    store = MetadataStore(":memory:")
+    with pytest.raises(ConnectionError):
+        github.sync_closed_pulls("o", "r", token="test-token", pr_count=300, store=store)
+
+    # the pages before the failure are kept; the sync itself is not marked done
+    assert len(store.get_pulls("o/r", state="closed")) == 200
+    assert store.get_sync_state("o/r", "pulls:closed")[1] == 0
@@ -0,0 +1,66 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from source.github_client import GitHubClient
+from source.http_cache import ResponseCache
+
+
+def sender(body):
+    def send(url, headers=None, params=None):
+        response = requests.Response()
+        response.status_code = 200
+        response._content = body
+        response.headers["ETag"] = '"v1"'
+        response.url = url
+        return response
+    return send
+
+
+def body_bytes(cache_dir):
+    return sum(os.path.getsize(os.path.join(cache_dir, name))
+               for name in os.listdir(cache_dir) if name.endswith(".body"))
+
+
+def test_entries_are_per_token(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    alice, bob = GitHubClient("alice-token", cache=cache), GitHubClient("bob-token", cache=cache)
+    assert alice.identity != bob.identity
+    assert "alice-token" not in alice.identity
+
+    cache.get("https://api.github.com/repos/o/r", send=sender(b"private"), identity=alice.identity)
+    response = cache.get("https://api.github.com/repos/o/r", send=sender(b"public"), identity=bob.identity)
+    assert response.content == b"public"
+    assert (cache.hits, cache.misses) == (0, 2)
+
+
+def test_running_size_evicts_least_recently_used(tmp_path):
+    cache = ResponseCache(str(tmp_path), max_bytes=1000)
+    cache.get("https://x/a", send=sender(b"a" * 400))
+    os.utime(os.path.join(str(tmp_path), cache.key("https://x/a") + ".body"), (1, 1))
+    cache.get("https://x/b", send=sender(b"b" * 400))
+    cache.get("https://x/b", send=sender(b"c" * 450), params={"page": 2})
+
+    assert cache.lookup("https://x/a") is None
+    assert cache.lookup("https://x/b") is not None
+    assert cache._size == body_bytes(str(tmp_path)) == 850
+
+
+def test_concurrent_stores_and_lookups(tmp_path):
+    cache = ResponseCache(str(tmp_path), ttls=[], default_ttl=0)
+    bodies = [bytes([ord("a") + i]) * 200_000 for i in range(4)]
+    seen = []
+
+    def work(i):
+        for _ in range(25):
+            cache.get("https://x/a", send=sender(bodies[i]))
+            cached = cache.lookup("https://x/a")
+            seen.append(cached[1] if cached else None)
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        list(pool.map(work, range(4)))
+
+    assert all(body in bodies for body in seen)  # never a half-written body
+    assert cache.stats()["misses"] == 100
+    assert not [name for name in os.listdir(str(tmp_path)) if name.endswith(".tmp")]
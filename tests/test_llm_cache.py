@@ -0,0 +1,48 @@
+import itertools
+from types import SimpleNamespace
+
+import source.llm_cache as llm_cache
+from source.llm_cache import ExtractionCache
+
+ISSUE = {"number": 7, "title": "Crash in parse_config", "body": "ConfigLoader.load raises KeyError",
+         "labels": ["bug", "parser"]}
+RESULT = (["parse_config", "ConfigLoader"], "Config loading crashes.", "raw answer")
+
+
+def test_label_order_does_not_change_the_key():
+    cache = ExtractionCache(":memory:")
+    cache.put(ISSUE, "model-a", RESULT)
+    reordered = {**ISSUE, "number": 8, "labels": ["parser", "bug"]}
+
+    assert cache.get(reordered, "model-a") == RESULT
+    assert cache.get({**ISSUE, "labels": ["bug"]}, "model-a") is None
+
+
+def test_model_or_template_change_is_a_miss(tmp_path, monkeypatch):
+    path = str(tmp_path / "llm_cache.sqlite3")
+    cache = ExtractionCache(path)
+    cache.put(ISSUE, "model-a", RESULT)
+    assert ExtractionCache(path).get(ISSUE, "model-a") == RESULT
+    assert ExtractionCache(path).get(ISSUE, "model-b") is None
+
+    original = llm_cache.contruct_prompt
+    monkeypatch.setattr(llm_cache, "contruct_prompt", lambda issue: original(issue) + "\nBe brief.")
+    edited = ExtractionCache(path)
+    assert edited.template_version != cache.template_version
+    assert edited.get(ISSUE, "model-a") is None
+
+
+def test_least_recently_used_entries_are_evicted(monkeypatch):
+    ticks = itertools.count()
+    monkeypatch.setattr(llm_cache, "time", SimpleNamespace(time=lambda: float(next(ticks))))
+    cache = ExtractionCache(":memory:", max_entries=2)
+    issues = [{**ISSUE, "number": n, "title": f"Issue {n}"} for n in (1, 2, 3)]
+
+    cache.put(issues[0], "m", RESULT)
+    cache.put(issues[1], "m", RESULT)
+    assert cache.get(issues[0], "m") == RESULT  # 1 is now more recent than 2
+    cache.put(issues[2], "m", RESULT)
+
+    assert cache.get(issues[1], "m") is None
+    assert cache.get(issues[0], "m") == RESULT and cache.get(issues[2], "m") == RESULT
+    assert cache.stats()["hits"] == 3 and cache.stats()["misses"] == 1
@@ -0,0 +1,100 @@
+import threading
+import time
+
+import pytest
+
+from source.pipeline import Pipeline, SingleFlight
+
+
+def test_steps_overlap_and_fall_back_on_deadline():
+    pipeline = Pipeline()
+    pipeline.add("fast", lambda: 1)
+    pipeline.add("slow", lambda: time.sleep(5), budget=0.1, fallback=lambda: "fallback")
+    pipeline.add("both", lambda fast, slow: (fast, slow), deps=["fast", "slow"])
+
+    start = time.monotonic()
+    results = pipeline.run(deadline=1)
+    assert results["both"] == (1, "fallback")
+    assert pipeline.degraded == ["slow"]
+    assert time.monotonic() - start < 1
+
+
+def test_single_flight_joins_the_call_in_flight():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def sync():
+        calls.append(1)
+        started.set()
+        release.wait()
+        return "synced"
+
+    results = []
+    first = threading.Thread(target=lambda: results.append(flight.do("o/r", sync)))
+    first.start()
+    started.wait()
+    joiner = threading.Thread(target=lambda: results.append(flight.do("o/r", sync)))
+    joiner.start()
+    assert flight.do("other/repo", lambda: "other") == "other"
+    release.set()
+    first.join()
+    joiner.join()
+
+    assert results == ["synced", "synced"]
+    assert len(calls) == 1
+    assert flight.do("o/r", sync) == "synced" and len(calls) == 2  # done: the next call runs again
+
+
+def test_single_flight_shares_errors():
+    flight = SingleFlight()
+    release = threading.Event()
+
+    def fail():
+        release.wait()
+        raise RuntimeError("sync failed")
+
+    errors = []
+
+    def call():
+        try:
+            flight.do("o/r", fail)
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    threads = [threading.Thread(target=call) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.05)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert errors == ["sync failed"] * 3
+
+
+def test_timed_out_sync_is_joined_by_the_next_run():
+    flight = SingleFlight()
+    calls = []
+    release = threading.Event()
+
+    def sync():
+        calls.append(1)
+        release.wait()
+        return True
+
+    def run():
+        pipeline = Pipeline()
+        pipeline.add("pr_index", lambda: flight.do("o/r", sync), budget=0.05, fallback=lambda: False)
+        return pipeline.run()["pr_index"]
+
+    assert run() is False
+    assert run() is False
+    release.set()
+    assert len(calls) == 1
+
+
+def test_step_without_fallback_stops_the_run():
+    pipeline = Pipeline()
+    pipeline.add("broken", lambda: 1 / 0)
+    with pytest.raises(ZeroDivisionError):
+        pipeline.run()
@@ -0,0 +1,59 @@
+import pytest
+
+from source.profiles import ProfileIndex, update_profiles_from_store
+
+DAY = 86400
+
+
+def commit(sha, login, message, date, path="src/parser.py"):
+    return {"sha": sha, "login": login, "name": "Some Name", "email": f"{sha}@example.com",
+            "date": date, "message": message, "paths": [path]}
+
+
+def test_short_half_life_does_not_overflow():
+    profiles = ProfileIndex(":memory:", half_life_days=1)
+    profiles.add_commits("o/r", [commit("a1", "alice", "fix parser", "2008-01-02T00:00:00Z")])
+    profiles.add_commits("o/r", [commit("b2", "bob", "fix parser", "2026-01-01T00:00:00Z")])
+
+    scores = profiles.score("o/r", ["parser"], now=1767225600 + 10 * DAY)
+    assert max(scores, key=scores.get) == "bob"
+    assert all(score >= 0 for score in scores.values())
+
+
+def test_recent_contributions_count_more():
+    profiles = ProfileIndex(":memory:", half_life_days=30)
+    profiles.add_commits("o/r", [commit("a1", "alice", "lexer work", "2025-01-01T00:00:00Z", "src/lexer.py"),
+                                 commit("a2", "alice", "lexer work", "2025-01-02T00:00:00Z", "src/lexer.py"),
+                                 commit("b1", "bob", "lexer work", "2025-12-01T00:00:00Z", "src/lexer.py")])
+    assert profiles.top_authors("o/r", ["lexer"]) == ["bob", "alice"]
+
+
+@pytest.mark.parametrize("half_life", [0, -5, float("nan"), float("inf")])
+def test_half_life_must_be_positive(half_life):
+    with pytest.raises(ValueError, match="GIT_RECOMMEND_PROFILE_HALF_LIFE_DAYS"):
+        ProfileIndex(":memory:", half_life_days=half_life)
+
+
+class FakeMirror:
+    def __init__(self, commits):
+        self.commits = commits
+
+    def history(self, since=None):
+        return self.commits
+
+
+class FakeStore:
+    def get_pulls(self, repo, state=None, since=None):
+        return []
+
+
+def test_unresolved_mirror_authors_are_skipped():
+    profiles = ProfileIndex(":memory:")
+    commits = [commit("c1", None, "parser", "2025-01-01T00:00:00Z"),
+               commit("c2", None, "parser", "2025-01-01T00:00:00Z")]
+
+    def resolve(records):
+        records[0]["login"] = "carol"
+
+    update_profiles_from_store(profiles, FakeStore(), "o/r", mirror=FakeMirror(commits), resolve_logins=resolve)
+    assert set(profiles.score("o/r", ["parser"])) == {"carol"}
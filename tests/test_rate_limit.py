@@ -0,0 +1,106 @@
+import pytest
+
+from source.rate_limit import SECONDARY_LIMIT_BACKOFF, RateLimitExceeded, RateLimitScheduler
+
+
+class FakeClock:
+    """Clock and sleep for `RateLimitScheduler`: sleeping only moves the clock."""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class Response:
+    def __init__(self, status_code=200, text="", **headers):
+        self.status_code = status_code
+        self.text = text
+        self.headers = {name.replace("_", "-"): str(value) for name, value in headers.items()}
+
+
+def scheduler(tokens, max_wait=900):
+    clock = FakeClock()
+    return RateLimitScheduler(tokens, max_wait=max_wait, sleep=clock.sleep, clock=clock), clock
+
+
+def test_retry_after_blocks_the_token_for_that_long():
+    limits, clock = scheduler(["a"])
+    token = limits.acquire("core")
+    assert limits.record(token, "core", Response(403, "You have exceeded a secondary rate limit",
+                                                 Retry_After=30)) == 30
+
+    assert limits.wait_time("core") == 30
+    assert limits.acquire("core") == "a"
+    assert clock.sleeps == [30]
+
+
+def test_secondary_limit_without_retry_after_backs_off_exponentially():
+    limits, clock = scheduler(["a"], max_wait=10 ** 6)
+    rejected = Response(403, "You have exceeded a secondary rate limit")
+
+    waits = []
+    for _ in range(3):
+        waits.append(limits.record(limits.acquire("core"), "core", rejected))
+    assert waits == [SECONDARY_LIMIT_BACKOFF, 2 * SECONDARY_LIMIT_BACKOFF, 4 * SECONDARY_LIMIT_BACKOFF]
+    assert clock.sleeps == waits[:2]
+
+    # a successful response resets the backoff
+    limits.record(limits.acquire("core"), "core", Response(200))
+    assert limits.record(limits.acquire("core"), "core", rejected) == SECONDARY_LIMIT_BACKOFF
+
+
+def test_permission_errors_are_not_rate_limits():
+    limits, _ = scheduler(["a"])
+    assert limits.record("a", "core", Response(403, "Resource not accessible by integration")) is None
+    assert limits.wait_time("core") == 0
+
+
+def test_acquire_gives_up_past_max_wait():
+    limits, clock = scheduler(["a", "b"], max_wait=60)
+    reset = clock.now + 3600
+    for token in ("a", "b"):
+        limits.record(token, "core", Response(X_RateLimit_Remaining=0, X_RateLimit_Reset=reset))
+
+    with pytest.raises(RateLimitExceeded):
+        limits.acquire("core")
+    assert clock.sleeps == []
+
+
+def test_acquire_waits_for_the_earliest_reset_within_max_wait():
+    limits, clock = scheduler(["a", "b"], max_wait=600)
+    limits.record("a", "core", Response(X_RateLimit_Remaining=0, X_RateLimit_Reset=clock.now + 500))
+    limits.record("b", "core", Response(X_RateLimit_Remaining=0, X_RateLimit_Reset=clock.now + 200))
+
+    assert limits.acquire("core") == "b"
+    assert clock.sleeps == [200]
+
+
+def test_acquire_picks_the_token_with_the_most_budget_left():
+    limits, _ = scheduler(["a", "b", "c"])
+    for token, remaining in (("a", 10), ("b", 300), ("c", 40)):
+        limits.record(token, "core", Response(X_RateLimit_Remaining=remaining, X_RateLimit_Reset=0))
+
+    assert limits.acquire("core") == "b"
+    limits.record("b", "core", Response(X_RateLimit_Remaining=5, X_RateLimit_Reset=0))
+    assert limits.acquire("core") == "c"
+
+
+def test_remaining_sums_over_tokens():
+    limits, _ = scheduler(["a", "b"])
+    assert limits.remaining("core") == 2 * 5000  # defaults until GitHub says otherwise
+
+    limits.record("a", "core", Response(X_RateLimit_Remaining=120, X_RateLimit_Reset=0))
+    limits.record("b", "search", Response(X_RateLimit_Remaining=7, X_RateLimit_Reset=0,
+                                          X_RateLimit_Resource="search"))
+    assert limits.remaining("core") == 120 + 5000
+    assert limits.remaining("search") == 30 + 7
+
+    limits.acquire("core")
+    assert limits.remaining("core") == 120 + 4999
@@ -0,0 +1,53 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+from source.server import _Handler
+
+
+class RecordingService:
+    def __init__(self):
+        self.calls = []
+
+    def recommend(self, owner, repo, issue_number, deadline=None):
+        self.calls.append((owner, repo, issue_number, deadline))
+        return {"recommended": ["alice"]}
+
+
+@pytest.fixture
+def daemon():
+    service = RecordingService()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), type("Handler", (_Handler,), {
+        "service": service, "log_message": lambda self, *args: None}))
+    threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}", service
+    server.shutdown()
+    server.server_close()
+
+
+def post(url, payload):
+    request = urllib.request.Request(f"{url}/recommend", data=json.dumps(payload).encode(),
+                                     headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(request, timeout=5) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def test_recommend(daemon):
+    url, service = daemon
+    assert post(url, {"repo": "octo-org/hello.world", "issue_number": 7}) == (200, {"recommended": ["alice"]})
+    assert service.calls == [("octo-org", "hello.world", 7, None)]
+
+
+@pytest.mark.parametrize("repo", ["../../x/y", "../x", "owner/..", "owner", "a/b/c", "own er/repo", 42])
+def test_malformed_repo_names_are_rejected(daemon, repo):
+    url, service = daemon
+    status, body = post(url, {"repo": repo, "issue_number": 1})
+    assert status == 400 and "bad request" in body["error"]
+    assert service.calls == []
@@ -0,0 +1,54 @@
+import json
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from source.server_client import request_recommendation
+
+
+def daemon(delay):
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers["Content-Length"]))
+            time.sleep(delay)
+            data = json.dumps({"recommended": ["alice"]}).encode()
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True).start()
+    return server
+
+
+def test_answer_from_the_daemon():
+    server = daemon(0)
+    try:
+        result = request_recommendation("o/r", 1, address=f"127.0.0.1:{server.server_port}")
+        assert result == {"recommended": ["alice"]}
+    finally:
+        server.shutdown()
+
+
+def test_slow_daemon_raises_a_clear_error():
+    server = daemon(2)
+    try:
+        with pytest.raises(Exception, match="did not answer within 0.2 seconds"):
+            request_recommendation("o/r", 1, address=f"127.0.0.1:{server.server_port}", timeout=0.2)
+    finally:
+        server.shutdown()
+
+
+def test_no_daemon_means_in_process():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    assert request_recommendation("o/r", 1, address=f"127.0.0.1:{port}") is None
@@ -0,0 +1,9 @@
+import pytest
+from startup import HEAVY_MODULES, SCENARIOS, import_profile
+
+
+@pytest.mark.parametrize("scenario", sorted(SCENARIOS))
+def test_startup_does_not_import_stage_dependencies(scenario):
+    _, modules = import_profile(SCENARIOS[scenario])
+    assert "source.print_colors" in modules  # main.py itself was imported
+    assert [m for m in HEAVY_MODULES if m in modules] == []
@@ -0,0 +1,26 @@
+from source.tokenizer import TokenCache, code_tokens
+
+
+def pr(number, title, updated_at="2025-01-01T00:00:00Z"):
+    return {"number": number, "title": title, "body": "", "updated_at": updated_at}
+
+
+def text(pull):
+    return pull["title"]
+
+
+def test_two_processes_share_one_vocabulary(tmp_path):
+    path = str(tmp_path / "tokens.sqlite3")
+    daemon, batch = TokenCache(path), TokenCache(path)
+    daemon.intern(["parser"])
+    batch.intern(["parser"])  # both have loaded the vocabulary now
+
+    daemon.intern(["lexer"])
+    assert batch.terms(batch.intern(["lexer", "parser"])) == ["lexer", "parser"]
+    assert daemon.intern(["lexer"]) == batch.intern(["lexer"])
+
+    # streams cached by the other process carry ids this one has not seen yet
+    daemon.pull_token_ids("o/r", [pr(1, "Fix TokenStream overflow")], text)
+    assert batch.pull_tokens("o/r", [pr(1, "Fix TokenStream overflow")], text) == [
+        code_tokens("Fix TokenStream overflow")]
+    assert set(batch.vocabulary().values()) >= {"overflow", "tokenstream"}